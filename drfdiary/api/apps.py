@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        # Connect the receivers and register the checks that do not belong
+        # to a model
+        from . import changes, connections, throttling
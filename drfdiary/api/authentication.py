@@ -0,0 +1,105 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+from .cache import bump_version, get_version
+
+
+class TTLCache(object):
+    """
+    A thread-safe in-process mapping holding at most maxsize items, each for
+    at most timeout seconds, evicting the least recently used item first.
+    """
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0 or self.timeout <= 0:
+            return
+        with self.lock:
+            self.items[key] = (time.monotonic() + self.timeout, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+    def delete_matching(self, predicate):
+        with self.lock:
+            for key in [key for key, (expires, value) in self.items.items()
+                        if predicate(value)]:
+                del self.items[key]
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+token_cache = TTLCache(getattr(settings, 'API_TOKEN_CACHE_SIZE', 1000),
+                       getattr(settings, 'API_TOKEN_CACHE_TIMEOUT', 60))
+
+
+def get_token_version_key(user_id):
+    return "api:token-version:{}".format(user_id)
+
+
+def forget_user_tokens(user_id):
+    """
+    Stop authenticating the given user from cached tokens, in every process:
+    their copies are checked against a version of the user's tokens in the
+    shared cache, moved on right away and again once the transaction
+    commits, so a lookup that raced the change cannot stay cached
+    """
+    key = get_token_version_key(user_id)
+    bump_version(key)
+    transaction.on_commit(lambda: bump_version(key))
+    token_cache.delete_matching(lambda item: item[0].pk == user_id)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that remembers the user of each token for
+    API_TOKEN_CACHE_TIMEOUT seconds instead of querying for it on every
+    request. Each hit is checked against the version of the user's tokens
+    in the shared cache, which deleting or replacing a token, as logging
+    out does, or saving its user moves on, so every process sharing the
+    cache stops accepting it at once.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None and cached[2] != get_version(
+                get_token_version_key(cached[0].pk)):
+            cached = None
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            cached = (user, token,
+                      get_version(get_token_version_key(user.pk)))
+            token_cache.set(key, cached)
+        user, token, version = cached
+        # Each request gets its own copy, so nothing a view sets on
+        # request.user leaks into the next request
+        return copy.copy(user), token
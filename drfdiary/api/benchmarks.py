@@ -0,0 +1,84 @@
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+
+
+class Rollback(Exception):
+    """
+    Raised to roll back the benchmark data once a run is over
+    """
+
+
+@contextmanager
+def rolled_back():
+    """
+    Run the block in a transaction that is always rolled back, so benchmarks
+    can seed data without leaving it behind
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def rebuild_seeded_data():
+    """
+    Recompute the category counters and daily statistics that the bulk
+    inserts of seeded rows skip, with the commands repairing them, so that
+    benchmarks read what the API would have written
+    """
+    call_command('recount_categories', stdout=StringIO())
+    call_command('rebuild_stats', stdout=StringIO())
+
+
+def percentile(timings, fraction):
+    """
+    Return the value below which the given fraction of timings fall
+    """
+    ordered = sorted(timings)
+    return ordered[int(round(fraction * (len(ordered) - 1)))]
+
+
+def best_time(function, repeat):
+    """
+    Return the fastest of repeat runs of function, in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def summarize(timings, queries, sizes, errors, elapsed):
+    """
+    Return the figures reported for a batch of requests, with the timings
+    in milliseconds and elapsed in seconds
+    """
+    count = len(timings)
+    return OrderedDict([
+        ('requests', count),
+        ('errors', errors),
+        ('throughput', count / elapsed if elapsed else 0.0),
+        ('p50', percentile(timings, 0.5)),
+        ('p95', percentile(timings, 0.95)),
+        ('p99', percentile(timings, 0.99)),
+        ('queries', sum(queries) / count),
+        ('bytes', sum(sizes) / count),
+    ])
+
+
+def change(value, baseline):
+    """
+    Return how value compares with baseline, e.g. "+12.5%"
+    """
+    if not baseline:
+        return "n/a"
+    return "{:+.1f}%".format((value - baseline) * 100.0 / baseline)
@@ -0,0 +1,97 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+
+def get_version_key(user_id):
+    return "api:list-version:{}".format(user_id)
+
+
+def get_version(key):
+    """
+    Return the version stored under key in the shared cache. A missing
+    version starts from the clock rather than from 1 so that anything kept
+    under a version that was evicted can never be served again.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """
+    Move the version stored under key on, orphaning everything kept under
+    the old one.
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        # No version yet, so nothing is kept under one
+        pass
+
+
+def get_list_version(user_id):
+    """
+    Return the version the user's cached lists are currently stored under
+    """
+    return get_version(get_version_key(user_id))
+
+
+def bump_list_version(user_id):
+    """
+    Move the user's lists to a new version, orphaning everything cached
+    under the old one.
+    """
+    bump_version(get_version_key(user_id))
+
+
+def invalidate_lists(user_id):
+    """
+    Invalidate the user's cached lists right away, so the writing request
+    sees its own change, and again once the transaction commits, so a read
+    that raced the write cannot leave the old rows cached.
+    """
+    bump_list_version(user_id)
+    transaction.on_commit(lambda: bump_list_version(user_id))
+
+
+def cache_for_user(request, name, compute):
+    """
+    Return the result of compute() cached under name for the requesting user
+    and URL until one of the user's entries, categories or articles changes.
+    """
+    timeout = getattr(settings, 'API_LIST_CACHE_TIMEOUT', 300)
+    if not timeout:
+        return compute()
+
+    user_id = request.user.pk
+    # The URL is hashed, as cursors can make it longer than memcached keys
+    # may be
+    url = hashlib.md5(request.build_absolute_uri().encode("utf-8"))
+    key = "api:{}:{}:{}:{}".format(name, user_id, get_list_version(user_id),
+                                   url.hexdigest())
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+class CachedListMixin(object):
+    """
+    Mixin for list views that caches the listed data per user and per URL
+    until one of the user's entries, categories or articles changes.
+    """
+
+    def list(self, request, *args, **kwargs):
+        def compute():
+            return super(CachedListMixin, self).list(
+                request, *args, **kwargs).data
+
+        return Response(cache_for_user(request, 'list', compute))
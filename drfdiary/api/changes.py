@@ -0,0 +1,74 @@
+from django.db import connections
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+
+# The tables whose rows a sync sends, each with a change_seq column the
+# triggers below stamp on every insert and update
+SYNCED_TABLES = ('api_entry', 'api_category', 'api_article', 'api_tombstone')
+
+# On Postgres a row is stamped with the id of the transaction writing it, so
+# that a sync can tell which rows may still be joined by others committing
+# later: those of transactions at or past the oldest one still running
+POSTGRES_FUNCTION = """
+CREATE OR REPLACE FUNCTION api_set_change_seq() RETURNS trigger AS $$
+BEGIN
+    NEW.change_seq := txid_current();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+POSTGRES_TRIGGER = """
+CREATE TRIGGER {table}_change_seq BEFORE INSERT OR UPDATE ON {table}
+FOR EACH ROW EXECUTE PROCEDURE api_set_change_seq()
+"""
+
+# SQLite runs one writing transaction at a time, so a counter shared by the
+# tables numbers the changes in the order they commit
+SQLITE_COUNTER = (
+    "CREATE TABLE IF NOT EXISTS api_change_counter (value INTEGER NOT NULL)",
+    "INSERT INTO api_change_counter SELECT 0 WHERE NOT EXISTS "
+    "(SELECT 1 FROM api_change_counter)",
+)
+
+SQLITE_TRIGGER = """
+CREATE TRIGGER {table}_change_seq_{event} AFTER {event} ON {table}
+BEGIN
+    UPDATE api_change_counter SET value = value + 1;
+    UPDATE {table} SET change_seq = (SELECT value FROM api_change_counter)
+    WHERE id = NEW.id;
+END
+"""
+
+
+def install_change_triggers(using):
+    """
+    Create, or recreate, the triggers stamping the change_seq of the synced
+    tables, whatever path writes the rows: save(), update(), bulk_create()
+    and bulk_update() alike
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(POSTGRES_FUNCTION)
+            for table in SYNCED_TABLES:
+                cursor.execute("DROP TRIGGER IF EXISTS {table}_change_seq "
+                               "ON {table}".format(table=table))
+                cursor.execute(POSTGRES_TRIGGER.format(table=table))
+        elif connection.vendor == 'sqlite':
+            for statement in SQLITE_COUNTER:
+                cursor.execute(statement)
+            for table in SYNCED_TABLES:
+                for event in ('insert', 'update'):
+                    cursor.execute(
+                        "DROP TRIGGER IF EXISTS {}_change_seq_{}".format(
+                            table, event))
+                    cursor.execute(SQLITE_TRIGGER.format(table=table,
+                                                         event=event))
+
+
+@receiver(post_migrate)
+def create_change_triggers(sender, using='default', **kwargs):
+    if sender.name == 'api':
+        install_change_triggers(using)
@@ -0,0 +1,187 @@
+import gzip
+import io
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def parse_accept_encoding(header):
+    """
+    Return the codings of an Accept-Encoding header mapped to their quality
+    """
+    qualities = {}
+    for part in header.split(','):
+        coding, *params = [item.strip() for item in part.split(';')]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    return qualities
+
+
+def get_encodings():
+    """
+    Return the encodings the server offers, most preferred first
+    """
+    return [encoding for encoding in
+            getattr(settings, 'API_COMPRESSION_ENCODINGS', ('br', 'gzip'))
+            if encoding != 'br' or brotli is not None]
+
+
+def choose_encoding(header):
+    """
+    Return the most preferred encoding the client accepts, or None if it
+    accepts none of them
+    """
+    qualities = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for encoding in get_encodings():
+        quality = qualities.get(encoding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class GzipCompressor(object):
+    """
+    Incremental gzip compressor with the interface of brotli.Compressor
+    """
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.file = gzip.GzipFile(
+            mode='wb', fileobj=self.buffer, mtime=0,
+            compresslevel=getattr(settings, 'API_GZIP_LEVEL', 6))
+
+    def read(self):
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+    def process(self, data):
+        self.file.write(data)
+        return self.read()
+
+    def flush(self):
+        self.file.flush()
+        return self.read()
+
+    def finish(self):
+        self.file.close()
+        return self.read()
+
+
+def get_compressor(encoding):
+    if encoding == 'br':
+        return brotli.Compressor(
+            quality=getattr(settings, 'API_BROTLI_QUALITY', 4))
+    return GzipCompressor()
+
+
+def compress(encoding, content):
+    compressor = get_compressor(encoding)
+    return compressor.process(content) + compressor.finish()
+
+
+def compress_sequence(encoding, sequence):
+    """
+    Compress a streamed body, flushing after every chunk so that each one
+    reaches the client as soon as it is ready
+    """
+    compressor = get_compressor(encoding)
+    for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def encode_etag(etag, encoding):
+    """
+    Return the ETag of the response encoded with encoding, which differs
+    from that of the plain one byte for byte, so needs an ETag of its own
+    """
+    return '{}-{}"'.format(etag[:-1], encoding)
+
+
+class CompressionMiddleware(object):
+    """
+    Compress responses with brotli or gzip, whichever of the
+    API_COMPRESSION_ENCODINGS the client accepts first, when they are at
+    least API_COMPRESSION_MIN_BYTES long. Streamed responses are always
+    compressed. Brotli needs the brotli package installed.
+
+    A compressed response keeps a strong ETag, with the encoding appended.
+    The views only know the plain ETags, so the suffix is taken off those
+    the client sends back, and put on again when the view answers that the
+    one it matched is not modified.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        min_bytes = getattr(settings, 'API_COMPRESSION_MIN_BYTES', 1024)
+        if min_bytes is None:
+            return self.get_response(request)
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+
+        # Plain ETags the client sent with the suffix of the encoding it is
+        # about to get, mapped to the ETags it sent
+        sent = {}
+        if encoding is not None and 'HTTP_IF_NONE_MATCH' in request.META:
+            suffix = '-{}"'.format(encoding)
+            tags = []
+            for etag in parse_etags(request.META['HTTP_IF_NONE_MATCH']):
+                if etag.endswith(suffix):
+                    plain = etag[:-len(suffix)] + '"'
+                    sent[plain] = etag
+                    etag = plain
+                tags.append(etag)
+            request.META['HTTP_IF_NONE_MATCH'] = ', '.join(tags)
+
+        response = self.get_response(request)
+        if response.has_header('Content-Encoding'):
+            return response
+        # Whatever its status or size, the response varies on the encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.status_code == 304:
+            etag = response.get('ETag')
+            if etag in sent:
+                response['ETag'] = sent[etag]
+            return response
+        if encoding is None:
+            return response
+        if not response.streaming and len(response.content) < min_bytes:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_sequence(
+                encoding, response.streaming_content)
+            del response['Content-Length']
+        else:
+            content = compress(encoding, response.content)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+
+        if response.has_header('ETag'):
+            response['ETag'] = encode_etag(response['ETag'], encoding)
+        response['Content-Encoding'] = encoding
+        return response
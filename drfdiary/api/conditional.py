@@ -0,0 +1,81 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from .cache import cache_for_user
+
+
+def make_etag(request, *parts):
+    """
+    Build a strong ETag from the URL, the format the response is rendered
+    in, the username shown in the owner field and the given parts describing
+    the state of the rows.
+    """
+    state = [request.build_absolute_uri(), request.accepted_renderer.format,
+             request.user.get_username()]
+    state.extend(str(part) for part in parts)
+    digest = hashlib.md5("\n".join(state).encode("utf-8")).hexdigest()
+    return quote_etag(digest)
+
+
+def conditional_response(request, etag, last_modified, render):
+    """
+    Answer a conditional GET with a 304 when the validators match and only
+    call render() for the body otherwise. Both carry the validators; without
+    a last_modified there is only the ETag.
+    """
+    # HTTP dates have a resolution of one second
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = render()
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+class ConditionalListMixin(object):
+    """
+    Mixin for list views that adds an ETag header, worked out from the
+    newest date_modified and the number of rows listed so that the body only
+    needs to be rendered when it has changed.
+
+    Lists carry no Last-Modified: deleting a row, or changing it so that it
+    leaves a filtered list, can make the newest date_modified older, which
+    If-Modified-Since would answer with a stale 304.
+    """
+
+    def get_list_state(self):
+        """
+        Return the newest date_modified and the number of the listed rows
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        return queryset.aggregate(last_modified=Max('date_modified'),
+                                  count=Count('id'))
+
+    def list(self, request, *args, **kwargs):
+        state = cache_for_user(request, 'list-state', self.get_list_state)
+        etag = make_etag(request, state['last_modified'], state['count'])
+        return conditional_response(
+            request, etag, None,
+            lambda: super(ConditionalListMixin, self).list(
+                request, *args, **kwargs))
+
+
+class ConditionalDetailMixin(object):
+    """
+    Mixin for detail views that adds ETag and Last-Modified headers from the
+    date_modified of the object, skipping serialization on a 304.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = make_etag(request, instance.pk, instance.date_modified)
+        return conditional_response(
+            request, etag, instance.date_modified,
+            lambda: Response(self.get_serializer(instance).data))
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.dispatch import receiver
+
+
+# Persistent connections can be dropped by the server, a restart or a pooler
+# while idle, which would fail the next request that reuses them. Django 2.2
+# only notices after an error, so check them before each request instead.
+@receiver(request_started)
+def close_unusable_connections(sender, **kwargs):
+    if not getattr(settings, 'API_DB_HEALTH_CHECKS', False):
+        return
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
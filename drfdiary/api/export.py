@@ -0,0 +1,72 @@
+import json
+from collections import OrderedDict
+from itertools import islice
+
+from .serializers import EntrySerializer, CategorySerializer, \
+    ArticleSerializer, get_values_serializer
+
+
+# What an export holds, in order: the type of each row, the key of its list
+# in a JSON export and the serializer giving its fields. Categories come
+# before the articles that refer to them.
+EXPORTED_TYPES = (
+    ('category', 'categories', CategorySerializer),
+    ('entry', 'entries', EntrySerializer),
+    ('article', 'articles', ArticleSerializer),
+)
+
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def with_type(row_type, item):
+    """
+    Return the serialized row with its type as the first key
+    """
+    row = OrderedDict([('type', row_type)])
+    row.update(item)
+    return row
+
+
+def iter_batches(user, serializer_class, chunk_size):
+    """
+    Yield the serialized rows of the user in lists of chunk_size, reading
+    them through a server-side cursor so only one chunk is held at a time
+    """
+    serializer = get_values_serializer(serializer_class)
+    rows = serializer_class.Meta.model.objects.owned_by(user).order_by(
+        'id').values(*serializer.columns).iterator(chunk_size=chunk_size)
+    while True:
+        batch = list(islice(rows, chunk_size))
+        if not batch:
+            return
+        yield serializer.to_representation(batch)
+
+
+def export_ndjson(user, chunk_size):
+    """
+    Yield the diary of the user as newline-delimited JSON, one object per
+    line with its type first
+    """
+    for row_type, key, serializer_class in EXPORTED_TYPES:
+        for batch in iter_batches(user, serializer_class, chunk_size):
+            yield ''.join(
+                dumps(with_type(row_type, item)) + '\n' for item in batch)
+
+
+def export_json(user, chunk_size):
+    """
+    Yield the diary of the user as a single JSON object holding a list of
+    each type of row
+    """
+    yield '{'
+    for index, (row_type, key, serializer_class) in enumerate(
+            EXPORTED_TYPES):
+        yield '{}{}:['.format(',' if index else '', dumps(key))
+        separator = ''
+        for batch in iter_batches(user, serializer_class, chunk_size):
+            yield separator + ','.join(dumps(item) for item in batch)
+            separator = ','
+        yield ']'
+    yield '}'
@@ -0,0 +1,163 @@
+import datetime
+import re
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class QueryFilter(object):
+    """
+    A query parameter narrowing down a list to the rows where field matches
+    the value with lookup
+    """
+
+    def __init__(self, field, lookup='exact'):
+        self.field = field
+        self.lookup = lookup
+
+    def parse(self, value):
+        """
+        Return the value of the query parameter, raising ValueError with a
+        message for the client if it is invalid
+        """
+        return value
+
+    def get_condition(self, value):
+        return Q(**{'{}__{}'.format(self.field, self.lookup): value})
+
+
+class DateTimeFilter(QueryFilter):
+    """
+    Filter on a date and time, or a date meaning its midnight in the current
+    time zone
+    """
+
+    def parse(self, value):
+        try:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                date = parse_date(value)
+                if date is not None:
+                    parsed = datetime.datetime.combine(date, datetime.time())
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValueError("Expected an ISO 8601 date or date and time.")
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+
+class BooleanFilter(QueryFilter):
+    """
+    Filter on true or false
+    """
+    VALUES = {'true': True, '1': True, 'false': False, '0': False}
+
+    def parse(self, value):
+        try:
+            return self.VALUES[value.lower()]
+        except KeyError:
+            raise ValueError("Expected true or false.")
+
+
+class DomainFilter(QueryFilter):
+    """
+    Filter on the domain of a URL field. The condition only compares the
+    start of the URLs, so that an index on the field with pattern operators
+    serves it.
+    """
+    DOMAIN = re.compile(r'^[a-z0-9]([a-z0-9-]*\.)*[a-z0-9-]+$')
+
+    def parse(self, value):
+        value = value.lower()
+        if not self.DOMAIN.match(value):
+            raise ValueError("Expected a domain name.")
+        return value
+
+    def get_condition(self, value):
+        condition = Q()
+        for scheme in ('http', 'https'):
+            prefix = '{}://{}'.format(scheme, value)
+            condition |= Q(**{self.field: prefix})
+            # The domain ends at a path, a port or a query
+            for separator in ('/', ':', '?'):
+                condition |= Q(**{self.field + '__startswith':
+                                  prefix + separator})
+        return condition
+
+
+# The date filters every list takes
+DATE_FILTERS = {
+    'created_after': DateTimeFilter('date_created', 'gte'),
+    'created_before': DateTimeFilter('date_created', 'lt'),
+    'modified_since': DateTimeFilter('date_modified', 'gte'),
+}
+
+
+class QueryFilterBackend(BaseFilterBackend):
+    """
+    Filter backend applying the query_filters of the view, a dict mapping
+    query parameters to the QueryFilter they apply. Invalid values are
+    refused rather than ignored.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        errors = {}
+        for param, query_filter in getattr(view, 'query_filters', {}).items():
+            if param not in request.query_params:
+                continue
+            try:
+                value = query_filter.parse(request.query_params[param])
+            except ValueError as exc:
+                errors[param] = [str(exc)]
+                continue
+            queryset = queryset.filter(query_filter.get_condition(value))
+        if errors:
+            raise ValidationError(errors)
+        return queryset
+
+
+class OrderingFilter(BaseFilterBackend):
+    """
+    Filter backend ordering a list by ?ordering=, a comma separated list of
+    the view's ordering_fields, each prefixed with - for descending order.
+    The cursor paginator takes its ordering from here; without ?ordering=
+    it is that of the next filter backend giving one, such as the search
+    rank, or else the paginator's own.
+    """
+    ordering_param = 'ordering'
+
+    def get_requested_ordering(self, request, view):
+        value = request.query_params.get(self.ordering_param)
+        if not value:
+            return None
+        terms = [term.strip() for term in value.split(',') if term.strip()]
+        allowed = getattr(view, 'ordering_fields', ())
+        invalid = [term for term in terms if term.lstrip('-') not in allowed]
+        if invalid or not terms:
+            raise ValidationError({self.ordering_param: [
+                "Expected a comma separated list of: {}.".format(
+                    ", ".join(allowed))]})
+        # The id breaks ties, so that equal values come in a stable order
+        if not any(term.lstrip('-') == 'id' for term in terms):
+            terms.append('-id' if terms[0].startswith('-') else 'id')
+        return tuple(terms)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = self.get_requested_ordering(request, view)
+        if ordering:
+            return ordering
+        for backend in view.filter_backends:
+            if backend is not type(self) and hasattr(backend, 'get_ordering'):
+                return backend().get_ordering(request, queryset, view)
+        return view.pagination_class.ordering
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_requested_ordering(request, view)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
@@ -0,0 +1,238 @@
+import csv
+import json
+
+from django.db import transaction
+
+from .cache import invalidate_lists
+from .models import Entry, Category, Article, add_stats, \
+    count_article_change, deferred_article_counts
+from .serializers import EntryImportSerializer, CategoryImportSerializer, \
+    ArticleSerializer
+
+
+def read_ndjson(lines):
+    """
+    Yield (row number, row) for each non-blank line of newline-delimited
+    JSON. A line that is not a JSON object gives an error message instead.
+    """
+    for number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            row = "Invalid JSON: {}".format(error)
+        if not isinstance(row, (dict, str)):
+            row = "Expected a JSON object."
+        yield number, row
+
+
+def read_csv(lines):
+    """
+    Yield (row number, row) for each record of a CSV file with a header row.
+    Blank cells are left out so that the fields take their defaults.
+    """
+    text = (line.decode('utf-8') if isinstance(line, bytes) else line
+            for line in lines)
+    reader = csv.DictReader(text)
+    for row in reader:
+        yield reader.line_num, dict(
+            (key, value) for key, value in row.items() if value != '')
+
+
+READERS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+
+class DiaryImporter(object):
+    """
+    Imports a stream of entries, categories and articles for a user, a batch
+    of rows at a time. Rows are validated with the serializers, and each
+    batch is written with one bulk insert per type in its own transaction.
+
+    Articles refer to their category by id: either the id a category had in
+    the imported data, as in an export, or the id of one of the user's
+    categories.
+    """
+
+    def __init__(self, user, batch_size=1000, default_type=None):
+        self.user = user
+        self.batch_size = batch_size
+        self.default_type = default_type
+        self.category_ids = {}
+        self.rows = self.created = self.skipped = self.failed = 0
+
+    def progress(self):
+        return {"rows": self.rows, "created": self.created,
+                "skipped": self.skipped, "failed": self.failed}
+
+    def run(self, rows):
+        """
+        Import the (row number, row) pairs, yielding a report for each row
+        that is skipped or fails, the progress after every batch and the
+        totals at the end
+        """
+        batch = []
+        for number, row in rows:
+            batch.append((number, row))
+            if len(batch) >= self.batch_size:
+                yield from self.import_batch(batch)
+                batch = []
+        if batch:
+            yield from self.import_batch(batch)
+        yield {"done": self.progress()}
+
+    def fail(self, number, errors):
+        self.failed += 1
+        return {"row": number, "errors": errors}
+
+    def skip(self, number, reason):
+        self.skipped += 1
+        return {"row": number, "skipped": reason}
+
+    def import_batch(self, batch):
+        self.rows += len(batch)
+        by_type = {'category': [], 'entry': [], 'article': []}
+        for number, row in batch:
+            if not isinstance(row, dict):
+                yield self.fail(number, {"non_field_errors": [row]})
+                continue
+            row_type = row.pop('type', self.default_type)
+            if not isinstance(row_type, str) or row_type not in by_type:
+                yield self.fail(number, {"type": [
+                    "Expected one of: article, category, entry."]})
+                continue
+            by_type[row_type].append((number, row))
+
+        with transaction.atomic():
+            # Categories go first so that articles in the same batch can
+            # refer to them
+            yield from self.import_categories(by_type['category'])
+            yield from self.import_entries(by_type['entry'])
+            yield from self.import_articles(by_type['article'])
+            invalidate_lists(self.user.pk)
+        yield {"progress": self.progress()}
+
+    def validate(self, serializer_class, rows):
+        """
+        Validate each row, yielding a report for each invalid row and keeping
+        (row number, row, validated data) of the valid ones in self.valid
+        """
+        self.valid = []
+        for number, row in rows:
+            serializer = serializer_class(data=row)
+            if serializer.is_valid():
+                self.valid.append((number, row, serializer.validated_data))
+            else:
+                yield self.fail(number, serializer.errors)
+
+    def drop_duplicates(self, model, field, message):
+        """
+        Skip the valid rows whose unique field is already taken, or repeats
+        that of an earlier row, yielding a report for each and keeping the
+        others in self.valid
+        """
+        values = [data[field] for number, row, data in self.valid]
+        seen = set(model.objects.filter(**{field + '__in': values})
+                   .values_list(field, flat=True))
+        kept = []
+        for number, row, data in self.valid:
+            if data[field] in seen:
+                yield self.skip(number, message)
+            else:
+                seen.add(data[field])
+                kept.append((number, row, data))
+        self.valid = kept
+
+    def insert(self, model, objects, field=None):
+        """
+        Insert the objects, ignoring any that lost a race for the unique
+        field, and return those actually inserted
+        """
+        for instance in objects:
+            if hasattr(instance, 'set_search_vector'):
+                instance.set_search_vector()
+        model.objects.bulk_create(objects, ignore_conflicts=True)
+        if field is not None:
+            # The rows found under the values of those that lost the race
+            # were created by someone else, at another time
+            found = set(model.objects.filter(**{
+                field + '__in': [getattr(instance, field)
+                                 for instance in objects]}).values_list(
+                                     field, 'date_created'))
+            objects = [instance for instance in objects
+                       if (getattr(instance, field),
+                           instance.date_created) in found]
+        self.created += len(objects)
+        return objects
+
+    def import_categories(self, rows):
+        if not rows:
+            return
+        yield from self.validate(CategoryImportSerializer, rows)
+        validated = self.valid
+        yield from self.drop_duplicates(
+            Category, 'name', "A category with this name already exists.")
+        self.insert(Category, [Category(owner=self.user, **data)
+                               for number, row, data in self.valid], 'name')
+
+        # Map the ids the valid categories had in the imported data to the
+        # ids they have now, including those the user already had
+        ids = dict(Category.objects.owned_by(self.user).filter(
+            name__in=[data['name'] for number, row, data in validated])
+            .values_list('name', 'id'))
+        for number, row, data in validated:
+            if 'id' in row and data['name'] in ids:
+                self.category_ids[str(row['id'])] = ids[data['name']]
+
+    def import_entries(self, rows):
+        if not rows:
+            return
+        yield from self.validate(EntryImportSerializer, rows)
+        yield from self.drop_duplicates(
+            Entry, 'content', "An entry with this content already exists.")
+        entries = self.insert(Entry, [Entry(owner=self.user, **data)
+                                      for number, row, data in self.valid],
+                              'content')
+        # The bulk insert skips the signal counting entries
+        with deferred_article_counts():
+            for entry in entries:
+                add_stats(self.user.pk, entry.date_created, entries=1)
+
+    def import_articles(self, rows):
+        if not rows:
+            return
+        references = set(str(row.get('category')) for number, row in rows)
+        own_ids = set(str(category_id) for category_id in
+                      Category.objects.owned_by(self.user).filter(
+                          id__in=[reference for reference in references
+                                  if reference.isdigit()]
+                      ).values_list('id', flat=True))
+
+        resolved = []
+        for number, row in rows:
+            reference = str(row.get('category'))
+            if reference in self.category_ids:
+                resolved.append((number, row, self.category_ids[reference]))
+            elif reference in own_ids:
+                resolved.append((number, row, int(reference)))
+            else:
+                yield self.fail(number, {"category": ["No such category."]})
+
+        category_ids = dict((number, category_id)
+                            for number, row, category_id in resolved)
+        yield from self.validate(
+            ArticleSerializer,
+            [(number, row) for number, row, category_id in resolved])
+        articles = [
+            Article(owner=self.user, category_id=category_ids[number], **data)
+            for number, row, data in self.valid]
+        self.insert(Article, articles)
+        # The bulk insert skips the signals counting articles
+        with deferred_article_counts():
+            for article in articles:
+                count_article_change(article, created=True)
@@ -0,0 +1,230 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger('api.slow_requests')
+
+# Figures of the request being handled by the current thread
+_local = threading.local()
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Methods counted under their own name; clients can send any other token
+# as a method, so those are counted together rather than each adding
+# histograms
+METHODS = frozenset(('GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD',
+                     'OPTIONS'))
+
+# Name, help text, buckets and the RequestMetrics attribute of each
+# histogram kept per view and method
+HISTOGRAMS = (
+    ('drfdiary_request_duration_seconds', "Time spent handling requests.",
+     SECONDS_BUCKETS, 'total'),
+    ('drfdiary_request_db_seconds', "Time spent running database queries.",
+     SECONDS_BUCKETS, 'db'),
+    ('drfdiary_request_serialize_seconds', "Time spent serializing data.",
+     SECONDS_BUCKETS, 'serialize'),
+    ('drfdiary_request_render_seconds', "Time spent rendering responses.",
+     SECONDS_BUCKETS, 'render'),
+    ('drfdiary_request_db_queries', "Database queries run per request.",
+     QUERIES_BUCKETS, 'queries'),
+)
+
+
+class Histogram(object):
+    """
+    Counts of observed values per bucket, along with their sum and count
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        Yield (upper bound, count of values up to it) for each bucket
+        """
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+def format_labels(names, values, **extra):
+    pairs = list(zip(names, values)) + sorted(extra.items())
+    return ",".join('{}="{}"'.format(
+        name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in pairs)
+
+
+class Registry(object):
+    """
+    The request histograms and counters of this process. With several
+    worker processes, each one keeps and serves its own.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = dict((name, {}) for name, *rest in HISTOGRAMS)
+        self.requests = {}
+
+    def observe(self, view, method, status, metrics):
+        with self.lock:
+            for name, description, buckets, attribute in HISTOGRAMS:
+                histograms = self.histograms[name]
+                if (view, method) not in histograms:
+                    histograms[view, method] = Histogram(buckets)
+                histograms[view, method].observe(getattr(metrics, attribute))
+            key = (view, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def render(self):
+        """
+        Return the metrics in the Prometheus text format
+        """
+        lines = []
+        with self.lock:
+            for name, description, buckets, attribute in HISTOGRAMS:
+                lines.append("# HELP {} {}".format(name, description))
+                lines.append("# TYPE {} histogram".format(name))
+                for labels, histogram in sorted(self.histograms[name].items()):
+                    for bound, count in histogram.cumulative():
+                        lines.append("{}_bucket{{{}}} {}".format(
+                            name, format_labels(('view', 'method'), labels,
+                                                le=bound), count))
+                    lines.append("{}_sum{{{}}} {}".format(
+                        name, format_labels(('view', 'method'), labels),
+                        histogram.sum))
+                    lines.append("{}_count{{{}}} {}".format(
+                        name, format_labels(('view', 'method'), labels),
+                        histogram.count))
+            lines.append("# HELP drfdiary_requests_total Requests handled.")
+            lines.append("# TYPE drfdiary_requests_total counter")
+            for labels, count in sorted(self.requests.items()):
+                lines.append("drfdiary_requests_total{{{}}} {}".format(
+                    format_labels(('view', 'method', 'status'), labels),
+                    count))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class RequestMetrics(object):
+    """
+    Where the time of a request goes, in seconds. It is installed as the
+    execute wrapper of the database connections to count the queries.
+    """
+
+    def __init__(self, record_sql=False):
+        self.start = time.perf_counter()
+        self.total = self.db = self.serialize = self.render = 0.0
+        self.queries = 0
+        self.sql = [] if record_sql else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.db += duration
+            if self.sql is not None:
+                self.sql.append((duration, sql))
+
+    def server_timing(self):
+        return ", ".join([
+            'db;dur={:.2f};desc="{} queries"'.format(self.db * 1000,
+                                                     self.queries),
+            'serialize;dur={:.2f}'.format(self.serialize * 1000),
+            'render;dur={:.2f}'.format(self.render * 1000),
+            'total;dur={:.2f}'.format(self.total * 1000),
+        ])
+
+
+@contextmanager
+def timer(name):
+    """
+    Add the time spent in the block to the named figure of the current
+    request, if any
+    """
+    metrics = getattr(_local, 'metrics', None)
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(metrics, name,
+                getattr(metrics, name) + time.perf_counter() - start)
+
+
+class InstrumentationMiddleware(object):
+    """
+    Measure the queries, serialization, rendering and total time of each
+    request. The figures go into the Server-Timing header and the histograms
+    of the view, and requests slower than API_SLOW_REQUEST_MS are logged
+    with their SQL. A streamed body is sent after the request is measured,
+    so its queries are not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        slow_ms = getattr(settings, 'API_SLOW_REQUEST_MS', None)
+        metrics = RequestMetrics(record_sql=slow_ms is not None)
+        _local.metrics = metrics
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        metrics.total = time.perf_counter() - metrics.start
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        method = request.method if request.method in METHODS else 'other'
+        registry.observe(view, method, response.status_code, metrics)
+        if getattr(settings, 'API_SERVER_TIMING', True):
+            response['Server-Timing'] = metrics.server_timing()
+        if slow_ms is not None and metrics.total * 1000 >= slow_ms:
+            logger.warning(
+                "Slow request: %s %s (%s) took %.2f ms with %d queries in "
+                "%.2f ms\n%s", request.method, request.get_full_path(), view,
+                metrics.total * 1000, metrics.queries, metrics.db * 1000,
+                "\n".join("{:.2f} ms: {}".format(duration * 1000, sql)
+                          for duration, sql in metrics.sql))
+        return response
+
+    def process_template_response(self, request, response):
+        # Responses are rendered right after this hook returns
+        metrics = getattr(_local, 'metrics', None)
+        if metrics is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                metrics.render += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
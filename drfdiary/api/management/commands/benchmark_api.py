@@ -0,0 +1,397 @@
+import json
+import threading
+import time
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.benchmarks import change, rebuild_seeded_data, summarize
+from api.models import Entry, Category, Article, Tombstone, DailyStats, \
+    CategoryDailyStats, QueuedTask, create_user_token
+from api.search import column_search_vector
+
+
+PREFIX = "benchmark_api_"
+
+
+def unique(text):
+    return "{} {}".format(text, uuid.uuid4().hex)
+
+
+class Context(object):
+    """
+    The seeded rows of one benchmark user that the requests refer to, and
+    the rows set aside for the requests that delete them
+    """
+
+    def __init__(self, user, password):
+        self.user = user
+        self.password = password
+        # The token of a new user is created by a background task, which may
+        # not have run yet
+        self.token = Token.objects.get_or_create(user=user)[0].key
+        self.category = Category.objects.owned_by(user).order_by('id').first()
+        self.entry = Entry.objects.owned_by(user).order_by('id').first()
+        self.article_ids = list(Article.objects.owned_by(user).filter(
+            category=self.category).order_by('id').values_list(
+                'id', flat=True)[:10])
+        self.article = self.article_ids[0]
+        self.items = {}
+
+
+def make_rows(model, field, context, count, **fields):
+    """
+    Create count rows of the user whose field starts with a fresh marker and
+    return their ids, which bulk_create only sets on some databases
+    """
+    marker = unique("Deleted")
+    model.objects.bulk_create(
+        model(owner=context.user, **dict(fields, **{
+            field: "{} {}".format(marker, i)}))
+        for i in range(count))
+    return list(model.objects.filter(**{field + '__startswith': marker})
+                .order_by('id').values_list('id', flat=True))
+
+
+def make_entries(context, count):
+    return make_rows(Entry, 'content', context, count)
+
+
+def make_categories(context, count):
+    return make_rows(Category, 'name', context, count)
+
+
+def make_articles(context, count):
+    return make_rows(Article, 'title', context, count,
+                     url="http://example.com", category=context.category)
+
+
+def make_article_lists(context, count):
+    ids = make_articles(context, count * 10)
+    return [ids[i:i + 10] for i in range(0, len(ids), 10)]
+
+
+def import_file(context, item):
+    lines = [json.dumps({"type": "entry", "content": unique("Imported")})
+             for _ in range(10)]
+    return {"file": SimpleUploadedFile(
+        "diary.ndjson", "\n".join(lines).encode("utf-8"))}
+
+
+class Route(object):
+    """
+    A request to benchmark. path and data are functions of the context and,
+    for routes with prepare, of the item set aside for the request.
+    """
+
+    def __init__(self, name, method, path, data=None, prepare=None,
+                 format='json'):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.prepare = prepare
+        self.format = format
+
+
+def article_path(context, item):
+    return '/api/v2/categories/{}/articles/'.format(context.category.pk)
+
+
+# Logging out is left out as it revokes the token the other requests use,
+# and registering as the users it creates cannot be deleted afterwards: the
+# registration serializers load allauth's SocialAccount model without its
+# app being installed, which breaks deleting users
+ROUTES = [
+    Route("entries list", 'get', lambda c, i: '/api/v2/entries/'),
+    Route("entries search", 'get', lambda c, i: '/api/v2/entries/?q=entry'),
+    Route("entry create", 'post', lambda c, i: '/api/v2/entries/',
+          lambda c, i: {"content": unique("Created entry")}),
+    Route("entry detail", 'get',
+          lambda c, i: '/api/v2/entries/{}/'.format(c.entry.pk)),
+    Route("entry update", 'put',
+          lambda c, i: '/api/v2/entries/{}/'.format(c.entry.pk),
+          lambda c, i: {"content": unique("Updated entry")}),
+    Route("entry delete", 'delete',
+          lambda c, i: '/api/v2/entries/{}/'.format(i),
+          prepare=make_entries),
+    Route("categories list", 'get', lambda c, i: '/api/v2/categories/'),
+    Route("category create", 'post', lambda c, i: '/api/v2/categories/',
+          lambda c, i: {"name": unique("Created category")}),
+    Route("category detail", 'get',
+          lambda c, i: '/api/v2/categories/{}/'.format(c.category.pk)),
+    Route("category update", 'put',
+          lambda c, i: '/api/v2/categories/{}/'.format(c.category.pk),
+          lambda c, i: {"name": unique("Updated category")}),
+    Route("category delete", 'delete',
+          lambda c, i: '/api/v2/categories/{}/'.format(i),
+          prepare=make_categories),
+    Route("articles list", 'get', article_path),
+    Route("articles search", 'get',
+          lambda c, i: article_path(c, i) + '?q=article'),
+    Route("articles list sparse", 'get',
+          lambda c, i: article_path(c, i) + '?fields=id,title'),
+    Route("articles list compact", 'get',
+          lambda c, i: article_path(c, i) + '?fields=id,title&compact=true'),
+    Route("article create", 'post', article_path,
+          lambda c, i: {"title": "Created article",
+                        "url": "http://example.com"}),
+    Route("article detail", 'get',
+          lambda c, i: article_path(c, i) + '{}/'.format(c.article)),
+    Route("article update", 'put',
+          lambda c, i: article_path(c, i) + '{}/'.format(c.article),
+          lambda c, i: {"title": "Updated article",
+                        "url": "http://example.com"}),
+    Route("article delete", 'delete',
+          lambda c, i: article_path(c, i) + '{}/'.format(i),
+          prepare=make_articles),
+    Route("articles bulk create", 'post',
+          lambda c, i: article_path(c, i) + 'bulk/',
+          lambda c, i: [{"title": "Bulk article",
+                         "url": "http://example.com"}] * 10),
+    Route("articles bulk update", 'patch',
+          lambda c, i: article_path(c, i) + 'bulk/',
+          lambda c, i: [{"id": article_id, "read_status": True}
+                        for article_id in c.article_ids]),
+    Route("articles bulk delete", 'delete',
+          lambda c, i: article_path(c, i) + 'bulk/', lambda c, i: i,
+          prepare=make_article_lists),
+    Route("articles mark read", 'post', lambda c, i: '/api/v2/articles/read/',
+          lambda c, i: {"ids": c.article_ids}),
+    Route("sync", 'get', lambda c, i: '/api/v2/sync/'),
+    Route("export", 'get', lambda c, i: '/api/v2/export/'),
+    Route("import", 'post', lambda c, i: '/api/v2/import/', import_file,
+          format='multipart'),
+    Route("users list", 'get', lambda c, i: '/api/v2/users/'),
+    Route("user detail", 'get',
+          lambda c, i: '/api/v2/users/{}/'.format(c.user.pk)),
+    Route("get token", 'post', lambda c, i: '/api/v2/get-token/',
+          lambda c, i: {"username": c.user.username,
+                        "password": c.password}),
+    Route("login", 'post', lambda c, i: '/api/v2/accounts/login/',
+          lambda c, i: {"username": c.user.username,
+                        "password": c.password}),
+    Route("account user", 'get', lambda c, i: '/api/v2/accounts/user/'),
+]
+
+
+class Command(BaseCommand):
+    help = ("Seed users with entries, categories and articles, send requests "
+            "to every API route in process at the given concurrency and "
+            "report throughput, latency percentiles, queries and bytes per "
+            "request. The seeded users are kept for later runs, but their "
+            "rows are deleted afterwards and their passwords, random for "
+            "each run, made unusable.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=4)
+        parser.add_argument('--entries', type=int, default=200,
+                            help="Entries of each user")
+        parser.add_argument('--categories', type=int, default=10,
+                            help="Categories of each user")
+        parser.add_argument('--articles', type=int, default=50,
+                            help="Articles in each category")
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Requests to send to each route")
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help="Requests in flight at a time")
+        parser.add_argument('--routes', nargs='*',
+                            help="Names of the routes to run, by default all")
+        parser.add_argument('--no-list-cache', action='store_true',
+                            help="Turn the list cache off, so lists are read "
+                                 "from the database every time")
+        parser.add_argument('--output', help="Write the results to this file")
+        parser.add_argument('--baseline',
+                            help="Compare with the results in this file")
+
+    def handle(self, *args, **options):
+        routes = [route for route in ROUTES if not options['routes']
+                  or route.name in options['routes']]
+        if not routes:
+            raise CommandError("No route named {}.".format(
+                ", ".join(options['routes'])))
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as results:
+                baseline = json.load(results)['routes']
+
+        self.cleanup()
+        try:
+            contexts = self.seed(options)
+            # The benchmark users send requests far faster than the
+            # throttles let any client
+            overrides = {'API_THROTTLE_RATES': {}}
+            if options['no_list_cache']:
+                overrides['API_LIST_CACHE_TIMEOUT'] = 0
+            with override_settings(**overrides):
+                results = dict(
+                    (route.name, self.run(route, contexts, options))
+                    for route in routes)
+        finally:
+            self.cleanup()
+
+        for route in routes:
+            self.report(route.name, results[route.name],
+                        baseline.get(route.name) if baseline else None)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({
+                    "database": connection.vendor,
+                    "options": dict((key, options[key]) for key in (
+                        'users', 'entries', 'categories', 'articles',
+                        'requests', 'concurrency', 'no_list_cache')),
+                    "routes": results,
+                }, output, indent=2)
+
+    def cleanup(self):
+        """
+        Delete the rows, statistics, tombstones, tokens and pending token
+        tasks of the benchmark users and lock them out, so that nobody can
+        log in as them between runs
+        """
+        for model in (Entry, Category, Article, Tombstone, DailyStats,
+                      CategoryDailyStats):
+            model.objects.filter(owner__username__startswith=PREFIX).delete()
+        user_ids = User.objects.filter(
+            username__startswith=PREFIX).values_list('pk', flat=True)
+        QueuedTask.objects.filter(
+            name=create_user_token.name,
+            args__in=[json.dumps([user_id]) for user_id in user_ids]).delete()
+        Token.objects.filter(user__username__startswith=PREFIX).delete()
+        User.objects.filter(username__startswith=PREFIX).update(
+            password=make_password(None))
+
+    def seed(self, options):
+        """
+        Create the users and their rows, returning a context for each user
+        """
+        # A password of its own for each run, as the login routes need one,
+        # hashed once for all of the users
+        password = User.objects.make_random_password(32)
+        hashed = make_password(password)
+        contexts = []
+        for i in range(options['users']):
+            user, created = User.objects.update_or_create(
+                username="{}{}".format(PREFIX, i),
+                defaults={'password': hashed})
+            Entry.objects.bulk_create(
+                Entry(content="Benchmark entry {} {}".format(i, j),
+                      owner=user)
+                for j in range(options['entries']))
+            Category.objects.bulk_create(
+                Category(name="Benchmark category {} {}".format(i, j),
+                         owner=user)
+                for j in range(max(options['categories'], 1)))
+            categories = Category.objects.owned_by(user)
+            Article.objects.bulk_create(
+                Article(title="Benchmark article {}".format(j),
+                        url="http://example.com/{}".format(j),
+                        category=category, owner=user)
+                for category in categories
+                for j in range(max(options['articles'], 10)))
+            contexts.append(Context(user, password))
+
+        if connection.vendor == 'postgresql':
+            # Bulk inserts skip save(), which stores the search vectors
+            for model in (Entry, Article):
+                model.objects.filter(owner__username__startswith=PREFIX) \
+                    .update(search_vector=column_search_vector(model))
+        rebuild_seeded_data()
+        return contexts
+
+    def run(self, route, contexts, options):
+        """
+        Send the requests of a route from concurrency threads, each using
+        a client of its own, and return the summary of their figures
+        """
+        requests = options['requests']
+        concurrency = max(min(options['concurrency'], requests), 1)
+        if route.prepare:
+            for number, context in enumerate(contexts):
+                share = len(range(number, requests, len(contexts)))
+                context.items[route.name] = route.prepare(context, share)
+
+        timings, queries, sizes, errors = [], [], [], []
+        lock = threading.Lock()
+        counter = iter(range(requests))
+
+        def work():
+            client = APIClient(SERVER_NAME='localhost')
+            try:
+                while True:
+                    with lock:
+                        number = next(counter, None)
+                    if number is None:
+                        return
+                    context = contexts[number % len(contexts)]
+                    item = context.items[route.name].pop() \
+                        if route.prepare else None
+                    figures = self.send(client, route, context, item)
+                    with lock:
+                        for figure, values in zip(figures, (
+                                timings, queries, sizes, errors)):
+                            values.append(figure)
+            finally:
+                if threading.current_thread() is not main:
+                    connection.close()
+
+        main = threading.current_thread()
+        start = time.perf_counter()
+        if concurrency == 1:
+            work()
+        else:
+            threads = [threading.Thread(target=work)
+                       for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - start
+        return summarize(timings, queries, sizes, sum(errors), elapsed)
+
+    def send(self, client, route, context, item):
+        """
+        Send one request and return its time in milliseconds, its queries,
+        the size of its body and whether it failed
+        """
+        client.credentials(HTTP_AUTHORIZATION="Token {}".format(
+            context.token))
+        kwargs = {}
+        if route.data is not None:
+            kwargs = {'data': route.data(context, item),
+                      'format': route.format}
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            try:
+                response = getattr(client, route.method)(
+                    route.path(context, item), **kwargs)
+                if response.streaming:
+                    size = len(b"".join(response.streaming_content))
+                else:
+                    size = len(response.content)
+                failed = response.status_code >= 400
+            except Exception:
+                size, failed = 0, True
+            elapsed = (time.perf_counter() - start) * 1000
+        return elapsed, len(captured.captured_queries), size, failed
+
+    def report(self, name, result, baseline):
+        line = ("{:<22} {:>8.1f} req/s  p50 {:>7.2f}  p95 {:>7.2f}  "
+                "p99 {:>7.2f} ms  {:>5.1f} queries  {:>8.0f} bytes".format(
+                    name, result['throughput'], result['p50'], result['p95'],
+                    result['p99'], result['queries'], result['bytes']))
+        if result['errors']:
+            line += "  {} errors".format(result['errors'])
+        if baseline:
+            line += "  ({} req/s, {} p95, {} queries)".format(
+                change(result['throughput'], baseline['throughput']),
+                change(result['p95'], baseline['p95']),
+                change(result['queries'], baseline['queries']))
+        self.stdout.write(line)
@@ -0,0 +1,64 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from api.benchmarks import percentile, rolled_back
+from api.models import Category, Article
+
+
+class Command(BaseCommand):
+    help = ("Measure the queries per request and latency of listing and "
+            "creating articles. The data is rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=1000,
+                            help="Articles to seed the category with")
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Requests to send to each endpoint")
+
+    def handle(self, *args, **options):
+        # The same list is requested over and over, which would otherwise
+        # measure the list cache rather than the queries, and be throttled
+        with rolled_back(), override_settings(API_LIST_CACHE_TIMEOUT=0,
+                                              API_THROTTLE_RATES={}):
+            self.run(options['articles'], options['requests'])
+
+    def run(self, articles, requests):
+        user = User.objects.create(username="benchmark_articles")
+        category = Category.objects.create(name="benchmark_articles",
+                                           owner=user)
+        Article.objects.bulk_create(
+            Article(title="Article {}".format(i), url="http://example.com",
+                    category=category, owner=user)
+            for i in range(articles))
+
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user=user)
+        url = '/api/v2/categories/{}/articles/'.format(category.id)
+        data = {"title": "Benchmark", "url": "http://example.com"}
+
+        self.measure("GET  " + url, requests,
+                     lambda: client.get(url))
+        self.measure("POST " + url, requests,
+                     lambda: client.post(url, data, format="json"))
+
+    def measure(self, label, requests, send):
+        """
+        Send requests through send and report queries and latency
+        """
+        timings = []
+        queries = 0
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                send()
+                timings.append((time.perf_counter() - start) * 1000)
+            queries += len(context.captured_queries)
+        self.stdout.write(
+            "{}: {:.2f} queries/request, p50 {:.2f} ms, p99 {:.2f} ms".format(
+                label, queries / requests, percentile(timings, 0.5),
+                percentile(timings, 0.99)))
@@ -0,0 +1,91 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+
+from api import compression, renderers
+from api.benchmarks import best_time, rolled_back
+from api.models import Entry, Category, Article
+from api.serializers import EntrySerializer, ArticleSerializer, \
+    get_values_serializer
+
+
+class Command(BaseCommand):
+    help = ("Compare the time taken to render and compress large entry and "
+            "article lists, and the bytes sent, with each JSON library and "
+            "MessagePack, in full and compact form. The data is rolled back "
+            "afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000,
+                            help="Rows of each kind to render")
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="Runs to take the best time of")
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.run(options['rows'], options['repeat'])
+
+    def run(self, rows, repeat):
+        user = User.objects.create(username="benchmark_renderers")
+        category = Category.objects.create(name="benchmark_renderers",
+                                           owner=user)
+        Entry.objects.bulk_create(
+            Entry(content="Benchmark entry {} with café".format(i),
+                  owner=user)
+            for i in range(rows))
+        Article.objects.bulk_create(
+            Article(title="Article {}".format(i),
+                    description="An article to render",
+                    url="http://example.com/articles/{}".format(i),
+                    category=category, owner=user)
+            for i in range(rows))
+
+        for label, serializer_class in (('Entries', EntrySerializer),
+                                        ('Articles', ArticleSerializer)):
+            model = serializer_class.Meta.model
+            serializer = get_values_serializer(serializer_class)
+            values = list(model.objects.owned_by(user).values(
+                *serializer.columns))
+            for form, represent in (('full', serializer.to_representation),
+                                    ('compact', serializer.to_compact)):
+                self.stdout.write("{} {} ({:,} rows):".format(
+                    label, form, rows))
+                self.compare(represent(values), repeat)
+
+    def get_renderers(self):
+        """
+        Yield the name and render function of each renderer installed
+        """
+        yield 'drf json', JSONRenderer().render
+        for backend in ('orjson', 'ujson'):
+            if getattr(renderers, backend) is not None:
+                renderer = renderers.FastJSONRenderer()
+                yield backend, (lambda data, backend=backend: self.render(
+                    renderer, data, backend))
+        if renderers.msgpack is not None:
+            yield 'msgpack', renderers.MessagePackRenderer().render
+
+    def render(self, renderer, data, backend):
+        with override_settings(API_JSON_BACKEND=backend):
+            return renderer.render(data)
+
+    def compare(self, data, repeat):
+        """
+        Time rendering the data with each renderer, then compressing it with
+        each encoding
+        """
+        for name, render in self.get_renderers():
+            content = render(data)
+            timing = best_time(lambda: render(data), repeat)
+            self.report(name, 'identity', timing, len(content))
+            for encoding in compression.get_encodings():
+                compressed = compression.compress(encoding, content)
+                timing = best_time(
+                    lambda: compression.compress(encoding, render(data)),
+                    repeat)
+                self.report(name, encoding, timing, len(compressed))
+
+    def report(self, renderer, encoding, timing, size):
+        self.stdout.write("  {:10} {:9} {:9.2f} ms {:>13,} bytes".format(
+            renderer, encoding, timing * 1000, size))
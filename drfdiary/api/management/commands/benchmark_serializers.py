@@ -0,0 +1,74 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from api.benchmarks import best_time, rolled_back
+from api.models import Entry, Category, Article
+from api.serializers import EntrySerializer, CategorySerializer, \
+    ArticleSerializer, get_values_serializer
+
+
+class Command(BaseCommand):
+    help = ("Compare the rows per second of the model serializers and of "
+            "the values serializers used by the list endpoints. The data is "
+            "rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000,
+                            help="Rows of each kind to serialize")
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="Runs to take the best time of")
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.run(options['rows'], options['repeat'])
+
+    def run(self, rows, repeat):
+        user = User.objects.create(username="benchmark_serializers")
+        category = Category.objects.create(name="benchmark_serializers",
+                                           owner=user)
+        Entry.objects.bulk_create(
+            Entry(content="Benchmark entry {}".format(i), owner=user)
+            for i in range(rows))
+        Category.objects.bulk_create(
+            Category(name="Benchmark category {}".format(i), owner=user)
+            for i in range(rows - 1))
+        Article.objects.bulk_create(
+            Article(title="Article {}".format(i), url="http://example.com",
+                    category=category, owner=user)
+            for i in range(rows))
+
+        for serializer_class in (EntrySerializer, CategorySerializer,
+                                 ArticleSerializer):
+            self.compare(serializer_class, user, rows, repeat)
+
+    def compare(self, serializer_class, user, rows, repeat):
+        """
+        Time both serializers with and without fetching the rows
+        """
+        model = serializer_class.Meta.model
+        queryset = model.objects.owned_by(user).select_related('owner')
+        values_serializer = get_values_serializer(serializer_class)
+        columns = values_serializer.columns
+
+        def model_list():
+            return serializer_class(list(queryset.all()), many=True).data
+
+        def values_list():
+            return values_serializer.to_representation(
+                list(queryset.values(*columns)))
+
+        instances = list(queryset.all())
+        values = list(queryset.values(*columns))
+        timings = [
+            best_time(model_list, repeat),
+            best_time(values_list, repeat),
+            best_time(lambda: serializer_class(instances, many=True).data,
+                      repeat),
+            best_time(lambda: values_serializer.to_representation(values),
+                      repeat),
+        ]
+        rates = ["{:,.0f}".format(rows / timing) for timing in timings]
+        self.stdout.write(
+            "{}: fetch and serialize {} -> {} rows/s, "
+            "serialize only {} -> {} rows/s".format(
+                model.__name__, *rates))
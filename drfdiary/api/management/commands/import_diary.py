@@ -0,0 +1,45 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importer import DiaryImporter, READERS
+
+
+class Command(BaseCommand):
+    help = ("Import entries, categories and articles for a user from a "
+            "newline-delimited JSON file, such as an export, or a CSV file.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument('--input', choices=sorted(READERS),
+                            help="Format of the file, by default guessed "
+                                 "from its extension.")
+        parser.add_argument('--type', choices=('article', 'category', 'entry'),
+                            help="Type of the rows that do not give one.")
+        parser.add_argument('--batch-size', type=int,
+                            default=getattr(settings,
+                                            'API_IMPORT_BATCH_SIZE', 1000))
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError("No user named {}.".format(
+                options['username']))
+        input_format = options['input'] or (
+            'csv' if options['path'].endswith('.csv') else 'ndjson')
+
+        importer = DiaryImporter(user, batch_size=options['batch_size'],
+                                 default_type=options['type'])
+        with open(options['path'], 'rb') as lines:
+            for report in importer.run(READERS[input_format](lines)):
+                if 'row' in report:
+                    self.stderr.write(json.dumps(report))
+                elif 'progress' in report:
+                    self.stdout.write("Imported {rows} rows: {created} "
+                                      "created, {skipped} skipped, {failed} "
+                                      "failed.".format(**report['progress']))
+        self.stdout.write("Done.")
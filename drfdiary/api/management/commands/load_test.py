@@ -0,0 +1,93 @@
+import http.client
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.authtoken.models import Token
+
+from api.benchmarks import percentile, rebuild_seeded_data
+from api.models import Entry, Category, Article
+
+
+class Command(BaseCommand):
+    help = ("Send concurrent requests to the list and detail endpoints of a "
+            "running server and report its throughput and latency. A user "
+            "with seeded data is created on the first run and kept.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000',
+                            help="Address of the server under test")
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help="Requests in flight at a time")
+        parser.add_argument('--requests', type=int, default=2000,
+                            help="Requests to send in total")
+        parser.add_argument('--rows', type=int, default=1000,
+                            help="Entries and articles to seed the user with")
+
+    def handle(self, *args, **options):
+        user, created = User.objects.get_or_create(username="load_test")
+        if created:
+            self.seed(user, options['rows'])
+        category = Category.objects.owned_by(user).first()
+        entry = Entry.objects.owned_by(user).first()
+        paths = [
+            '/api/v2/entries/',
+            '/api/v2/entries/{}/'.format(entry.pk),
+            '/api/v2/categories/',
+            '/api/v2/categories/{}/articles/'.format(category.pk),
+        ]
+        headers = {"Authorization": "Token {}".format(
+            Token.objects.get_or_create(user=user)[0].key)}
+
+        address = urlsplit(options['url'])
+        local = threading.local()
+
+        def send(path):
+            # Each thread keeps its own connection open between requests
+            if getattr(local, 'connection', None) is None:
+                local.connection = http.client.HTTPConnection(
+                    address.hostname, address.port or 80, timeout=30)
+            start = time.perf_counter()
+            try:
+                local.connection.request('GET', path, headers=headers)
+                response = local.connection.getresponse()
+                response.read()
+                status = response.status
+                if response.getheader('Connection', '').lower() == 'close':
+                    local.connection.close()
+                    local.connection = None
+            except (OSError, http.client.HTTPException):
+                local.connection.close()
+                local.connection = None
+                status = None
+            return path, status, (time.perf_counter() - start) * 1000
+
+        requests = [paths[i % len(paths)] for i in range(options['requests'])]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            results = list(pool.map(send, requests))
+        elapsed = time.perf_counter() - start
+
+        for path in paths:
+            timings = [timing for sent, status, timing in results
+                       if sent == path]
+            self.stdout.write("GET {}: p50 {:.2f} ms, p99 {:.2f} ms".format(
+                path, percentile(timings, 0.5), percentile(timings, 0.99)))
+        errors = sum(1 for sent, status, timing in results if status != 200)
+        self.stdout.write(
+            "{} requests in {:.2f} s: {:.1f} requests/s, {} errors".format(
+                len(results), elapsed, len(results) / elapsed, errors))
+
+    def seed(self, user, rows):
+        category = Category.objects.create(name="load_test", owner=user)
+        Entry.objects.bulk_create(
+            Entry(content="Load test entry {}".format(i), owner=user)
+            for i in range(rows))
+        Article.objects.bulk_create(
+            Article(title="Article {}".format(i), url="http://example.com",
+                    category=category, owner=user)
+            for i in range(rows))
+        rebuild_seeded_data()
@@ -0,0 +1,19 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = ("Delete the tombstones older than API_SYNC_TOMBSTONE_DAYS. "
+            "Clients with an older sync token have to sync from scratch.")
+
+    def handle(self, *args, **options):
+        days = getattr(settings, 'API_SYNC_TOMBSTONE_DAYS', 30)
+        count, deleted = Tombstone.objects.filter(
+            date_deleted__lt=timezone.now() - datetime.timedelta(days=days)
+        ).delete()
+        self.stdout.write("Deleted {} tombstones.".format(count))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.models import Entry, Article
+from api.search import column_search_vector
+
+
+class Command(BaseCommand):
+    help = ("Recompute the stored search vectors of every entry and article, "
+            "for instance after loading data that bypassed save().")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Search vectors are only stored on Postgres.")
+        for model in (Entry, Article):
+            count = model.objects.update(
+                search_vector=column_search_vector(model))
+            self.stdout.write("Updated {} {} search vectors.".format(
+                count, model._meta.verbose_name))
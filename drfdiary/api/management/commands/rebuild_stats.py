@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+from api.models import Entry, Article, DailyStats, CategoryDailyStats
+
+
+class Command(BaseCommand):
+    help = ("Recompute the daily statistics of every user from their entries "
+            "and articles, for instance after loading data that bypassed the "
+            "API or when first adding the statistics to existing data.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Lock the rows so that statistics changes made meanwhile wait
+            # for, and add to, the recomputed ones
+            days = self.rebuild(
+                DailyStats, ('owner_id', 'day'),
+                ('entries', 'articles', 'read'), self.count_days())
+            categories = self.rebuild(
+                CategoryDailyStats, ('owner_id', 'category_id', 'day'),
+                ('articles', 'read'), self.count_category_days())
+        self.stdout.write(
+            "Checked {} days and {} category days, repaired {} and {}.".format(
+                days[0], categories[0], days[1], categories[1]))
+
+    def count_days(self):
+        """
+        Return the (entries, articles, read) counts of each (owner id, day)
+        """
+        counts = {}
+        for key, entries in self.count(Entry.objects.all(), ('owner_id',),
+                                       entries=Count('id')):
+            counts[key] = (entries['entries'], 0, 0)
+        for key, articles in self.count_articles(('owner_id',)):
+            counts[key] = (counts.get(key, (0,))[0], articles['articles'],
+                           articles['read'])
+        return counts
+
+    def count_category_days(self):
+        """
+        Return the (articles, read) counts of each (owner id, category id,
+        day)
+        """
+        return dict((key, (articles['articles'], articles['read']))
+                    for key, articles in self.count_articles(
+                        ('owner_id', 'category_id'),
+                        category__isnull=False))
+
+    def count_articles(self, fields, **filters):
+        return self.count(Article.objects.filter(**filters), fields,
+                          articles=Count('id'),
+                          read=Count('id', filter=Q(read_status=True)))
+
+    def count(self, queryset, fields, **aggregates):
+        """
+        Yield the fields and day of each group of the queryset, by the day
+        each row was created, with the aggregates of the group
+        """
+        rows = queryset.order_by().annotate(
+            stats_day=TruncDate('date_created')).values(
+                *fields, 'stats_day').annotate(**aggregates)
+        for row in rows:
+            key = tuple(row[field] for field in fields) + (row['stats_day'],)
+            yield key, row
+
+    def rebuild(self, model, keys, counts, actual):
+        """
+        Bring the counts of the rows of model, identified by their keys, in
+        line with the actual ones, and return how many rows there should be
+        and how many were repaired
+        """
+        current = {}
+        for row in model.objects.select_for_update().values(
+                'pk', *keys, *counts):
+            current[tuple(row[key] for key in keys)] = (
+                row['pk'], tuple(row[count] for count in counts))
+        repaired = 0
+        for key in sorted(set(current) | set(actual)):
+            values = actual.get(key)
+            if key not in current:
+                model.objects.create(**dict(zip(keys + counts, key + values)))
+            elif values is None:
+                model.objects.filter(pk=current[key][0]).delete()
+            elif current[key][1] != values:
+                model.objects.filter(pk=current[key][0]).update(
+                    **dict(zip(counts, values)))
+            else:
+                continue
+            repaired += 1
+        return len(actual), repaired
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from api.models import Category, Article
+
+
+class Command(BaseCommand):
+    help = ("Recompute the article and unread counters of every category, "
+            "for instance after loading articles that bypassed the API.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Lock the categories so that counter changes made meanwhile
+            # wait for, and add to, the recomputed counts
+            current = dict(
+                (pk, (articles, unread)) for pk, articles, unread in
+                Category.objects.select_for_update().values_list(
+                    'pk', 'article_count', 'unread_count'))
+            actual = dict(
+                (category_id, (articles, unread))
+                for category_id, articles, unread in
+                Article.objects.filter(category__isnull=False).order_by()
+                .values('category_id').annotate(
+                    articles=Count('id'),
+                    unread=Count('id', filter=Q(read_status=False)))
+                .values_list('category_id', 'articles', 'unread'))
+            now = timezone.now()
+            repaired = 0
+            for pk in sorted(current):
+                articles, unread = actual.get(pk, (0, 0))
+                if current[pk] != (articles, unread):
+                    Category.objects.filter(pk=pk).update(
+                        article_count=articles, unread_count=unread,
+                        date_modified=now)
+                    repaired += 1
+        self.stdout.write("Checked {} categories, repaired {}.".format(
+            len(current), repaired))
@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.tasks import DatabaseBackend
+
+
+class Command(BaseCommand):
+    help = ("Run the background tasks queued in the database, as they come "
+            "due, when API_TASK_BACKEND is the database backend. Several "
+            "workers can run side by side.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Run the tasks due now, then stop")
+        parser.add_argument('--batch', type=int, default=10,
+                            help="Tasks claimed at a time")
+        parser.add_argument(
+            '--poll', type=float,
+            default=getattr(settings, 'API_TASK_POLL_SECONDS', 1),
+            help="Seconds to wait for new tasks when none are due")
+
+    def handle(self, *args, **options):
+        backend = DatabaseBackend()
+        succeeded = failed = 0
+        while True:
+            claimed = backend.claim(options['batch'])
+            for queued in claimed:
+                if backend.run(queued):
+                    succeeded += 1
+                else:
+                    failed += 1
+            if not claimed:
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+        self.stdout.write("Ran {} tasks, {} failed.".format(
+            succeeded + failed, failed))
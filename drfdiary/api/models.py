@@ -1,13 +1,70 @@
+import threading
+from contextlib import contextmanager
+
 from django.utils import timezone
-from django.db import models
-from django.db.models.signals import post_save
+from django.contrib.postgres.search import SearchVectorField
+from django.db import IntegrityError, connections, models, router, \
+    transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.db.models.sql import UpdateQuery
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.models import User
 from rest_framework.authtoken.models import Token
 from django.dispatch import receiver
 
+from .authentication import forget_user_tokens
+from .cache import invalidate_lists
+from .search import SearchVectorIndex, instance_search_vector
+from .tasks import task
+
+
+class OwnedQuerySet(models.QuerySet):
+    """
+    QuerySet for the models that belong to a user.
+    """
+
+    def owned_by(self, user):
+        """
+        Restrict the queryset to the rows owned by the given user. The owner
+        leads every composite index below, so these lookups stay index scans.
+        """
+        return self.filter(owner=user)
+
+
+class SearchableModel(models.Model):
+    """
+    Abstract model storing a search vector over its search_fields, a tuple
+    of (field, weight) pairs, which is recomputed whenever they are saved.
+    """
+    search_fields = ()
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def set_search_vector(self, using=None):
+        """
+        Set the search vector from the current field values. Only Postgres
+        stores one; other databases fall back to searching the fields.
+        """
+        using = using or router.db_for_write(type(self), instance=self)
+        if connections[using].vendor == 'postgresql':
+            self.search_vector = instance_search_vector(self)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        search_fields = set(field for field, weight in self.search_fields)
+        if update_fields is None or search_fields.intersection(update_fields):
+            self.set_search_vector(kwargs.get('using'))
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {
+                    'search_vector'}
+        super().save(*args, **kwargs)
+
 
 # Create your models here.
-class Entry(models.Model):
+class Entry(SearchableModel):
     """
     This class represents the entry model.
     """
@@ -17,6 +74,23 @@ class Entry(models.Model):
                               on_delete=models.CASCADE)
     date_created = models.DateTimeField(auto_now_add=True)
     date_modified = models.DateTimeField(auto_now=True)
+    # Stamped by a database trigger on every write, see api.changes
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    objects = OwnedQuerySet.as_manager()
+    search_fields = (('content', 'A'),)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'date_created', 'id'],
+                         name='entry_owner_created_idx'),
+            models.Index(fields=['owner', 'date_modified', 'id'],
+                         name='entry_owner_modified_idx'),
+            models.Index(fields=['owner', 'change_seq', 'id'],
+                         name='entry_owner_change_idx'),
+            SearchVectorIndex(fields=['search_vector'],
+                              name='entry_search_idx'),
+        ]
 
     def __str__(self):
         """
@@ -27,7 +101,9 @@ class Entry(models.Model):
 
 class Category(models.Model):
     """
-    This class represents the Category model
+    This class represents the Category model. It carries the number of its
+    articles and of those unread, which are kept up to date as articles are
+    created, deleted, moved or marked as read.
     """
     name = models.CharField(max_length=255, blank=False, unique=True)
     description = models.CharField(max_length=255, blank=True)
@@ -36,6 +112,31 @@ class Category(models.Model):
                               on_delete=models.CASCADE)
     date_created = models.DateTimeField(auto_now_add=True)
     date_modified = models.DateTimeField(auto_now=True)
+    article_count = models.IntegerField(default=0, editable=False)
+    unread_count = models.IntegerField(default=0, editable=False)
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    objects = OwnedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'date_created', 'id'],
+                         name='category_owner_created_idx'),
+            models.Index(fields=['owner', 'date_modified', 'id'],
+                         name='category_owner_modified_idx'),
+            models.Index(fields=['owner', 'change_seq', 'id'],
+                         name='category_owner_change_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The counters only ever change through UPDATEs adding to them, so
+        # saving a category read earlier must not write back stale counts
+        if (not self._state.adding and not kwargs.get('force_insert') and
+                kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTERS]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         """
@@ -44,7 +145,10 @@ class Category(models.Model):
         return "{}: {}".format(self.name, self.description)
 
 
-class Article(models.Model):
+COUNTERS = ('article_count', 'unread_count')
+
+
+class Article(SearchableModel):
     """
     Class to represent the articles
     """
@@ -60,10 +164,442 @@ class Article(models.Model):
         'auth.user', related_name="owner", on_delete=models.CASCADE)
     date_created = models.DateTimeField(auto_now_add=True)
     date_modified = models.DateTimeField(auto_now=True)
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    objects = OwnedQuerySet.as_manager()
+    search_fields = (('title', 'A'), ('description', 'B'), ('url', 'C'))
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'category', 'date_created', 'id'],
+                         name='article_owner_cat_created_idx'),
+            models.Index(fields=['owner', 'category', 'read_status'],
+                         name='article_owner_cat_read_idx'),
+            # Pattern operators let the ?domain= prefix match use the index
+            models.Index(fields=['owner', 'category', 'url'],
+                         name='article_owner_cat_url_idx',
+                         opclasses=['int4_ops', 'int4_ops',
+                                    'varchar_pattern_ops']),
+            models.Index(fields=['owner', 'date_modified', 'id'],
+                         name='article_owner_modified_idx'),
+            models.Index(fields=['owner', 'change_seq', 'id'],
+                         name='article_owner_change_idx'),
+            SearchVectorIndex(fields=['search_vector'],
+                              name='article_search_idx'),
+        ]
+
+    # The (category id, read status) the article is counted under in the
+    # counters of its category, when known
+    _counted = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'category_id' in instance.__dict__ and \
+                'read_status' in instance.__dict__:
+            instance._counted = (instance.category_id, instance.read_status)
+        return instance
+
+
+class Tombstone(models.Model):
+    """
+    This class records a deleted entry, category or article so that clients
+    syncing their copy of the diary learn about the deletion
+    """
+    ENTRY, CATEGORY, ARTICLE = 'entry', 'category', 'article'
+    KIND_CHOICES = ((ENTRY, 'Entry'), (CATEGORY, 'Category'),
+                    (ARTICLE, 'Article'))
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    # Not a constraint, as the tombstones of a deleted user are written
+    # while the user is being deleted
+    owner = models.ForeignKey('auth.user', related_name="+",
+                              on_delete=models.DO_NOTHING,
+                              db_constraint=False)
+    date_deleted = models.DateTimeField(default=timezone.now)
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    objects = OwnedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'change_seq', 'id'],
+                         name='tombstone_owner_change_idx'),
+            models.Index(fields=['date_deleted'],
+                         name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return "{} {} deleted {}".format(self.kind, self.object_id,
+                                         self.date_deleted)
+
+
+class DailyStats(models.Model):
+    """
+    This class holds, for a user and a day, the number of entries and of
+    articles created that day and how many of those articles are read. It is
+    kept up to date as they are saved and deleted, so that statistics over
+    any period read a row per day rather than every entry and article.
+    """
+    owner = models.ForeignKey('auth.user', related_name="+",
+                              on_delete=models.CASCADE)
+    day = models.DateField()
+    entries = models.IntegerField(default=0)
+    articles = models.IntegerField(default=0)
+    read = models.IntegerField(default=0)
+
+    objects = OwnedQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'day'],
+                                    name='dailystats_owner_day_uniq'),
+        ]
+
+    def __str__(self):
+        return "{}: {} entries, {} articles".format(self.day, self.entries,
+                                                    self.articles)
+
+
+class CategoryDailyStats(models.Model):
+    """
+    This class holds, for a category and a day, the number of its articles
+    created that day and how many of those are read
+    """
+    owner = models.ForeignKey('auth.user', related_name="+",
+                              on_delete=models.CASCADE)
+    category = models.ForeignKey('Category', related_name="+",
+                                 on_delete=models.CASCADE)
+    day = models.DateField()
+    articles = models.IntegerField(default=0)
+    read = models.IntegerField(default=0)
+
+    objects = OwnedQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'day'],
+                                    name='categorystats_cat_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', 'day'],
+                         name='categorystats_owner_day_idx'),
+        ]
+
+    def __str__(self):
+        return "{} {}: {} articles".format(self.category_id, self.day,
+                                           self.articles)
+
+
+class QueuedTask(models.Model):
+    """
+    This class holds a background task queued on the database backend until
+    the run_tasks command runs it successfully, or gives up on it
+    """
+    PENDING, FAILED = 'pending', 'failed'
+    STATUS_CHOICES = ((PENDING, 'Pending'), (FAILED, 'Failed'))
+
+    name = models.CharField(max_length=255)
+    args = models.TextField(default='[]')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES,
+                              default=PENDING)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField()
+    last_error = models.TextField(blank=True)
+    # When the task is due, or when the lease of the worker running it ends
+    run_at = models.DateTimeField(default=timezone.now)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at', 'id'],
+                         name='queuedtask_due_idx'),
+        ]
+
+    def __str__(self):
+        return "{} ({}, {} attempts)".format(self.name, self.status,
+                                             self.attempts)
+
 
+# The counter and statistics changes collected by deferred_article_counts()
+# in this thread
+_deferred = threading.local()
 
-# This receiver handles token creation immediately a new user is created
+
+def apply_article_counts(deltas):
+    """
+    Add the (articles, unread) deltas to the counters of each category id.
+    Categories are updated in id order so that concurrent transactions lock
+    them in the same order.
+    """
+    now = timezone.now()
+    for category_id in sorted(deltas):
+        articles, unread = deltas[category_id]
+        changes = {}
+        if articles:
+            changes['article_count'] = F('article_count') + articles
+        if unread:
+            changes['unread_count'] = F('unread_count') + unread
+        if changes:
+            Category.objects.filter(pk=category_id).update(
+                date_modified=now, **changes)
+
+
+STATS = ('entries', 'articles', 'read')
+
+
+def add_to_stats(model, lookup, changes):
+    """
+    Add the changes to the counts of the statistics row matching lookup,
+    creating it if there is none. A change taking away from a missing row
+    is dropped, as the row went along with its owner or category.
+    """
+    updates = dict((field, F(field) + delta)
+                   for field, delta in changes.items())
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    if any(delta < 0 for delta in changes.values()):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**dict(lookup, **changes))
+    except IntegrityError:
+        # A concurrent transaction created the row first
+        model.objects.filter(**lookup).update(**updates)
+
+
+def apply_stats(deltas):
+    """
+    Add the (entries, articles, read) deltas to the daily statistics, keyed
+    by (owner id, day, category id), with None as the category id of the
+    totals of the day. Rows are updated in key order so that concurrent
+    transactions lock them in the same order.
+    """
+    for key in sorted(deltas, key=lambda key: (key[0], key[1], key[2] or 0)):
+        owner_id, day, category_id = key
+        changes = dict((field, delta)
+                       for field, delta in zip(STATS, deltas[key]) if delta)
+        if not changes:
+            continue
+        if category_id is None:
+            add_to_stats(DailyStats, {'owner_id': owner_id, 'day': day},
+                         changes)
+        else:
+            add_to_stats(CategoryDailyStats,
+                         {'owner_id': owner_id, 'category_id': category_id,
+                          'day': day}, changes)
+
+
+@contextmanager
+def deferred_article_counts():
+    """
+    Collect the counter and statistics changes made in the block and apply
+    them when it exits without error, with one UPDATE per category and day
+    rather than one per article. Use it inside the transaction making the
+    changes.
+    """
+    if getattr(_deferred, 'deltas', None) is not None:
+        yield
+        return
+    deltas = _deferred.deltas = {}
+    stats = _deferred.stats = {}
+    try:
+        yield
+    finally:
+        _deferred.deltas = _deferred.stats = None
+    apply_article_counts(deltas)
+    apply_stats(stats)
+
+
+def add_stats(owner_id, date, category_id=None, entries=0, articles=0,
+              read=0):
+    """
+    Add to the statistics of the day of date, and of the category if any,
+    right away or when the enclosing deferred_article_counts() block exits
+    """
+    add_day_stats(owner_id, timezone.localdate(date), category_id, entries,
+                  articles, read)
+
+
+def add_day_stats(owner_id, day, category_id=None, entries=0, articles=0,
+                  read=0):
+    """
+    Add to the statistics of the given day, as add_stats() does
+    """
+    changes = {(owner_id, day, None): (entries, articles, read)}
+    if category_id is not None:
+        changes[(owner_id, day, category_id)] = (0, articles, read)
+    deltas = getattr(_deferred, 'stats', None)
+    if deltas is None:
+        apply_stats(changes)
+        return
+    for key, change in changes.items():
+        deltas[key] = tuple(total + delta for total, delta in
+                            zip(deltas.get(key, (0, 0, 0)), change))
+
+
+def add_article_count(category_id, articles, unread):
+    """
+    Add to the counters of a category, right away or when the enclosing
+    deferred_article_counts() block exits
+    """
+    if category_id is None:
+        return
+    deltas = getattr(_deferred, 'deltas', None)
+    if deltas is None:
+        apply_article_counts({category_id: (articles, unread)})
+    else:
+        total, total_unread = deltas.get(category_id, (0, 0))
+        deltas[category_id] = (total + articles, total_unread + unread)
+
+
+def mark_articles_read(queryset, read_status):
+    """
+    Set the read status of the articles of queryset that do not have it yet
+    with one UPDATE, and move them in the counters of their categories and
+    the statistics of the days they were created, taking the changes from
+    one query grouped by owner, category and day. Return how many articles
+    changed. Use it inside a transaction.
+    """
+    using = router.db_for_write(queryset.model)
+    queryset = queryset.using(using).exclude(read_status=read_status)
+    values = {'read_status': read_status, 'date_modified': timezone.now()}
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        # The UPDATE returns the rows it changed to the grouping query, so
+        # the changes are exactly those of the rows it locked
+        query = queryset.query.chain(UpdateQuery)
+        query.add_update_values(values)
+        update_sql, params = query.get_compiler(using).as_sql()
+        day_sql = connection.ops.datetime_cast_date_sql(
+            'date_created', timezone.get_current_timezone_name())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "WITH updated AS ({} RETURNING owner_id, category_id, "
+                "date_created) SELECT owner_id, category_id, {}, COUNT(*) "
+                "FROM updated GROUP BY 1, 2, 3".format(update_sql, day_sql),
+                params)
+            changed = cursor.fetchall()
+    else:
+        # Other databases run one writing transaction at a time
+        changed = list(queryset.annotate(
+            day=TruncDate('date_created')).order_by().values_list(
+                'owner_id', 'category_id', 'day').annotate(Count('id')))
+        queryset.update(**values)
+    sign = 1 if read_status else -1
+    for owner_id, category_id, day, count in changed:
+        add_article_count(category_id, 0, -sign * count)
+        add_day_stats(owner_id, day, category_id, read=sign * count)
+    return sum(count for owner_id, category_id, day, count in changed)
+
+
+def count_article(article, counted, sign):
+    """
+    Count an article in (sign 1) or out of (sign -1) the counters of the
+    category and the statistics of the day it is counted under, given as a
+    (category id, read status) pair
+    """
+    category_id, read_status = counted
+    add_article_count(category_id, sign, 0 if read_status else sign)
+    add_stats(article.owner_id, article.date_created, category_id,
+              articles=sign, read=sign if read_status else 0)
+
+
+def count_article_change(article, created=False):
+    """
+    Move the article from the counters it was counted under to those of its
+    current category and read status. Saving an article read without both
+    fields changes nothing, as what it was counted under is unknown.
+    """
+    current = (article.category_id, article.read_status)
+    if created:
+        count_article(article, current, 1)
+    elif article._counted is None or article._counted == current:
+        return
+    else:
+        count_article(article, article._counted, -1)
+        count_article(article, current, 1)
+    article._counted = current
+
+
+@task
+def create_user_token(user_id):
+    # Logging in creates the token too if it is still missing
+    Token.objects.get_or_create(user_id=user_id)
+
+
+# This receiver has the token of a new user created in the background
 @receiver(post_save, sender=User)
 def create_auth_token(sender, instance=None, created=False, **kwargs):
     if created:
-        Token.objects.create(user=instance)
+        create_user_token.delay(instance.pk)
+
+
+# These receivers drop the owner's cached lists whenever one of their
+# entries, categories or articles is saved or deleted
+@receiver([post_save, post_delete], sender=Entry)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Article)
+def invalidate_owner_lists(sender, instance=None, **kwargs):
+    invalidate_lists(instance.owner_id)
+
+
+# The lists show the owner's username, so a renamed user needs fresh lists
+@receiver(post_save, sender=User)
+def invalidate_user_lists(sender, instance=None, created=False, **kwargs):
+    if not created:
+        invalidate_lists(instance.pk)
+
+
+# Token authentication caches the user of each token, so a deleted or
+# replaced token, or a changed user, must not be served from the cache
+@receiver([post_save, post_delete], sender=Token)
+def forget_cached_token(sender, instance=None, **kwargs):
+    forget_user_tokens(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+def forget_cached_user_tokens(sender, instance=None, **kwargs):
+    forget_user_tokens(instance.pk)
+
+
+# These receivers keep the counters of categories in step with the articles
+# saved and deleted one at a time, including those deleted along with their
+# category. Bulk inserts and updates count their articles themselves.
+@receiver(post_save, sender=Article)
+def count_saved_article(sender, instance=None, created=False, raw=False,
+                        **kwargs):
+    if not raw:
+        count_article_change(instance, created)
+
+
+@receiver(post_delete, sender=Article)
+def count_deleted_article(sender, instance=None, **kwargs):
+    counted = instance._counted or (instance.category_id,
+                                    instance.read_status)
+    count_article(instance, counted, -1)
+
+
+# These receivers keep the daily statistics in step with the entries saved
+# and deleted. Articles are counted in them along with the counters above.
+@receiver(post_save, sender=Entry)
+def count_saved_entry(sender, instance=None, created=False, raw=False,
+                      **kwargs):
+    if created and not raw:
+        add_stats(instance.owner_id, instance.date_created, entries=1)
+
+
+@receiver(post_delete, sender=Entry)
+def count_deleted_entry(sender, instance=None, **kwargs):
+    add_stats(instance.owner_id, instance.date_created, entries=-1)
+
+
+# Deleting an entry, category or article, including the articles removed
+# along with their category, leaves a tombstone for syncing clients
+@receiver(post_delete, sender=Entry)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Article)
+def record_tombstone(sender, instance=None, **kwargs):
+    Tombstone.objects.create(kind=sender._meta.model_name,
+                             object_id=instance.pk, owner_id=instance.owner_id)
@@ -0,0 +1,113 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor, \
+    _reverse_ordering
+
+
+def after_position(ordering, values):
+    """
+    Return the filter for the rows coming after the given values of the
+    ordering columns, each in its own direction. The leading column is also
+    bounded on its own, so that the bound is an index condition rather than
+    a filter over every row before the page.
+    """
+    condition = Q()
+    equal = {}
+    for term, value in zip(ordering, values):
+        field = term.lstrip('-')
+        lookup = '__lt' if term.startswith('-') else '__gt'
+        condition |= Q(**dict(equal, **{field + lookup: value}))
+        equal[field] = value
+    leading = ordering[0]
+    return Q(**{leading.lstrip('-') + ('__lte' if leading.startswith('-')
+                                       else '__gte'): values[0]}) & condition
+
+
+class DiaryCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (date_created, id) for the list endpoints, or
+    over the ordering the filter backends give, which always ends with id.
+
+    The cursor is opaque to clients and holds the value of every ordering
+    column of the row a page starts after, so fetching any page costs the
+    same however deep the client pages, and rows inserted while paging do
+    not shift the pages that follow. Unlike the position of DRF's cursors,
+    which is the leading column only with an offset past the rows sharing
+    it, this one stays exact when that column repeats or changes.
+    """
+    ordering = ('-date_created', '-id')
+    page_size = getattr(settings, 'API_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 500)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor else None
+
+        ordering = _reverse_ordering(self.ordering) if reverse \
+            else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            try:
+                values = json.loads(position)
+                if not isinstance(values, list) or \
+                        len(values) != len(ordering):
+                    raise ValueError(position)
+                queryset = queryset.filter(after_position(ordering, values))
+            except (ValueError, TypeError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        # One more row tells whether there is a page after this one
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = (position is not None,
+                                                has_following)
+        else:
+            self.has_next, self.has_previous = (has_following,
+                                                position is not None)
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self.cursor.position if not self.page else \
+            self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False,
+                                         position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self.cursor.position if not self.page else \
+            self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=True,
+                                         position=position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for term in ordering:
+            field = term.lstrip('-')
+            value = instance[field] if isinstance(instance, dict) \
+                else getattr(instance, field)
+            # Dates and times are written as Django reads them back, to the
+            # microsecond
+            values.append(value if isinstance(value, (int, float))
+                          else str(value))
+        return json.dumps(values)
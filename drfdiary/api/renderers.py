@@ -0,0 +1,122 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def get_json_backend():
+    """
+    Return the name of the JSON library named by API_JSON_BACKEND or, by
+    default, orjson when it is installed and the standard library json if
+    not. ujson, which requirements.txt pins, is only used when named.
+    """
+    name = getattr(settings, 'API_JSON_BACKEND', None)
+    installed = {'orjson': orjson, 'ujson': ujson, 'json': json}
+    if name is None:
+        return 'orjson' if orjson else 'json'
+    if installed.get(name) is None:
+        raise ImproperlyConfigured(
+            "API_JSON_BACKEND is {!r}, which is not installed.".format(name))
+    return name
+
+
+def orjson_dumps(data):
+    # Dates and times left in the data are output the way DRF does
+    return orjson.dumps(data, default=JSONEncoder().default,
+                        option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+def ujson_dumps(data):
+    return ujson.dumps(data, ensure_ascii=False,
+                       escape_forward_slashes=False).encode('utf-8')
+
+
+def orjson_loads(content):
+    return orjson.loads(content)
+
+
+def ujson_loads(content):
+    return ujson.loads(content.decode('utf-8'))
+
+
+# How each fast library encodes data to, and decodes it from, UTF-8 bytes
+DUMPS = {'orjson': orjson_dumps, 'ujson': ujson_dumps}
+LOADS = {'orjson': orjson_loads, 'ujson': ujson_loads}
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer using the library get_json_backend() picks, with the same
+    compact output as JSONRenderer. Indented output, and data the library
+    cannot encode, such as lazy translations, go through JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        backend = get_json_backend()
+        if (data is None or backend == 'json' or self.get_indent(
+                accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        try:
+            ret = DUMPS[backend](data)
+        except (TypeError, OverflowError):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        # As JSONRenderer does, escape the two characters JSON allows in
+        # strings but JavaScript does not
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSON parser using the library get_json_backend() picks
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        backend = get_json_backend()
+        if backend == 'json':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return LOADS[backend](stream.read())
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renderer of MessagePack, a binary format smaller and quicker to decode
+    than JSON, for the clients that ask for it. It needs msgpack installed.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if msgpack is None:
+            raise ImproperlyConfigured(
+                "MessagePackRenderer needs msgpack installed.")
+        return msgpack.packb(data, use_bin_type=True,
+                            default=JSONEncoder().default)
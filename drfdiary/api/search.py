@@ -0,0 +1,125 @@
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+    SearchVector
+from django.db import connection
+from django.db.models import F, FloatField, Index, Q, TextField, Value
+from django.db.models.functions import Cast
+from django.utils.module_loading import import_string
+from rest_framework.filters import BaseFilterBackend
+
+
+class SearchVectorIndex(GinIndex):
+    """
+    GIN index over a search vector on Postgres. Other databases, such as a
+    SQLite development setup, get a plain index so migrations still apply.
+    """
+
+    def create_sql(self, model, schema_editor, using=''):
+        if schema_editor.connection.vendor != 'postgresql':
+            return Index.create_sql(self, model, schema_editor, using)
+        return super().create_sql(model, schema_editor, using)
+
+
+def get_search_config():
+    return getattr(settings, 'API_SEARCH_CONFIG', 'english')
+
+
+def combine_search_vectors(weighted_expressions):
+    """
+    Return a single SearchVector over (expression, weight) pairs
+    """
+    config = get_search_config()
+    vector = None
+    for expression, weight in weighted_expressions:
+        part = SearchVector(expression, config=config, weight=weight)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def instance_search_vector(instance):
+    """
+    Return the search vector of a model instance, built from its current
+    values so it can be written along with the rest of the row.
+    """
+    return combine_search_vectors(
+        (Value(getattr(instance, field) or '', output_field=TextField()),
+         weight) for field, weight in instance.search_fields)
+
+
+def column_search_vector(model):
+    """
+    Return the search vector of a model built from its columns, for
+    recomputing the stored vectors with a single UPDATE.
+    """
+    return combine_search_vectors(
+        (F(field), weight) for field, weight in model.search_fields)
+
+
+class PostgresSearchBackend(object):
+    """
+    Search the stored search vectors through their GIN index and rank the
+    matches, best first.
+    """
+    ordering = ('-rank', '-date_created', '-id')
+
+    def search(self, queryset, query):
+        search_query = SearchQuery(query, config=get_search_config())
+        # The rank is a real, read back rounded; as a double it round-trips
+        # exactly through the position of a page cursor
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), search_query),
+                      FloatField()))
+
+
+class SimpleSearchBackend(object):
+    """
+    Fallback for databases without full-text search, such as SQLite. Every
+    word of the query must appear in one of the searched fields, and the
+    matches come newest first.
+    """
+    ordering = ('-date_created', '-id')
+
+    def search(self, queryset, query):
+        fields = [field for field, weight in queryset.model.search_fields]
+        for word in query.split():
+            condition = Q()
+            for field in fields:
+                condition |= Q(**{field + '__icontains': word})
+            queryset = queryset.filter(condition)
+        return queryset
+
+
+def get_search_backend():
+    """
+    Return the backend named by API_SEARCH_BACKEND, or the one that suits
+    the database in use.
+    """
+    path = getattr(settings, 'API_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return SimpleSearchBackend()
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    Filter backend for ?q= searches over the search_fields of the model.
+    It also tells the cursor pagination how search results are ordered.
+    """
+    search_param = 'q'
+
+    def get_query(self, request):
+        return request.query_params.get(self.search_param, '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        query = self.get_query(request)
+        if not query:
+            return queryset
+        return get_search_backend().search(queryset, query)
+
+    def get_ordering(self, request, queryset, view):
+        if self.get_query(request):
+            return get_search_backend().ordering
+        return view.pagination_class.ordering
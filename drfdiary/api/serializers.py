@@ -1,12 +1,90 @@
-from rest_framework import serializers
+import datetime
+from collections import OrderedDict
+from functools import lru_cache
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from api.instrumentation import timer
 from api.models import Entry, Category, Article
 
 
 UserModel = get_user_model()
 
 
-class EntrySerializer(serializers.ModelSerializer):
+class TimedSerializerMixin(object):
+    """
+    Mixin adding the time spent turning instances into data to the
+    serialization time of the current request
+    """
+
+    def to_representation(self, instance):
+        with timer('serialize'):
+            return super().to_representation(instance)
+
+
+def parse_field_names(value):
+    """
+    Return the names in a comma separated list
+    """
+    return [name for name in (part.strip() for part in value.split(','))
+            if name]
+
+
+@lru_cache(maxsize=None)
+def get_readable_field_names(serializer_class):
+    """
+    Return the names of the fields serializer_class outputs, in order
+    """
+    return tuple(name for name, field in serializer_class().fields.items()
+                 if not field.write_only)
+
+
+def select_field_names(serializer_class, request):
+    """
+    Return the names of the fields of serializer_class picked by the
+    ?fields= and ?exclude= parameters of a read request, in their declared
+    order, or None if the request does not pick any.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    params = request.query_params
+    if 'fields' not in params and 'exclude' not in params:
+        return None
+
+    names = get_readable_field_names(serializer_class)
+    picked = set(parse_field_names(params['fields'])) \
+        if 'fields' in params else set(names)
+    excluded = set(parse_field_names(params.get('exclude', '')))
+    unknown = (picked | excluded).difference(names)
+    if unknown:
+        raise serializers.ValidationError({"fields": [
+            "Unknown fields: {}.".format(", ".join(sorted(unknown)))]})
+    return tuple(name for name in names
+                 if name in picked and name not in excluded)
+
+
+class SparseFieldsMixin(object):
+    """
+    Mixin leaving out of the output the fields that the ?fields= and
+    ?exclude= parameters of a read request leave out. Writes always use
+    every field.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        names = select_field_names(type(self), self.context.get('request'))
+        if names is not None:
+            for name, field in list(fields.items()):
+                if name not in names and not field.write_only:
+                    del fields[name]
+        return fields
+
+
+class EntrySerializer(TimedSerializerMixin, SparseFieldsMixin,
+                      serializers.ModelSerializer):
     """
     Serializer to map the Model instance into the JSON format.
     """
@@ -21,7 +99,8 @@ class EntrySerializer(serializers.ModelSerializer):
         read_only_fields = ('date_created', 'date_modified')
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, SparseFieldsMixin,
+                     serializers.ModelSerializer):
     """
     Serializer class to handle user listing
     """
@@ -32,7 +111,8 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'username', 'email')
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedSerializerMixin, SparseFieldsMixin,
+                         serializers.ModelSerializer):
     """
     Serializer class to handle categories
     """
@@ -40,20 +120,182 @@ class CategorySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Category
-        fields = ('id', 'name', 'description', 'owner', 'date_created',
-                  'date_modified')
-        read_only_fields = ('date_created', 'date_modified')
+        fields = ('id', 'name', 'description', 'owner', 'article_count',
+                  'unread_count', 'date_created', 'date_modified')
+        read_only_fields = ('article_count', 'unread_count', 'date_created',
+                            'date_modified')
 
 
-class ArticleSerializer(serializers.ModelSerializer):
+class ArticleSerializer(TimedSerializerMixin, SparseFieldsMixin,
+                        serializers.ModelSerializer):
     """
     Serializer class to handle articles
     """
     owner = serializers.ReadOnlyField(source="owner.username")
-    category = serializers.ReadOnlyField(source="category.id")
+    category = serializers.ReadOnlyField(source="category_id")
 
     class Meta:
         model = Article
         fields = ('id', 'title', 'description', 'url', 'owner', 'category',
                   'read_status', 'date_created', 'date_modified')
         read_only_fields = ('date_created', 'date_modified')
+
+
+class MarkReadSerializer(serializers.Serializer):
+    """
+    Serializer class to validate the selection of articles to mark as read
+    or unread in bulk
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(),
+                                required=False)
+    category = serializers.IntegerField(required=False)
+    before = serializers.DateTimeField(required=False)
+    read_status = serializers.BooleanField(default=True)
+
+    def validate(self, data):
+        """
+        Refuse a request that does not narrow down the articles at all
+        """
+        if not any(key in data for key in ('ids', 'category', 'before')):
+            raise serializers.ValidationError(
+                "Provide ids, a category or a before date.")
+        return data
+
+
+class StatsQuerySerializer(serializers.Serializer):
+    """
+    Serializer class to validate the period and the number of categories of
+    a statistics request
+    """
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    top = serializers.IntegerField(min_value=1, max_value=50, default=5)
+
+    def validate(self, data):
+        """
+        Default to the 30 days up to today and refuse a period ending
+        before it starts
+        """
+        data.setdefault('end', timezone.localdate())
+        data.setdefault('start', data['end'] - datetime.timedelta(days=29))
+        if data['start'] > data['end']:
+            raise serializers.ValidationError(
+                "The start of the period is after its end.")
+        return data
+
+
+class EntryImportSerializer(EntrySerializer):
+    """
+    Serializer class to validate imported entries. Uniqueness of the content
+    is left to the bulk insert rather than checked with a query per row.
+    """
+
+    class Meta(EntrySerializer.Meta):
+        extra_kwargs = {'content': {'validators': []}}
+
+
+class CategoryImportSerializer(CategorySerializer):
+    """
+    Serializer class to validate imported categories. Uniqueness of the name
+    is left to the bulk insert rather than checked with a query per row.
+    """
+
+    class Meta(CategorySerializer.Meta):
+        extra_kwargs = {'name': {'validators': []}}
+
+
+def get_datetime_converter(field):
+    """
+    Return a function producing what field.to_representation() does for the
+    datetimes read from the database, skipping the time zone conversion when
+    they already are in the time zone of the field.
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = getattr(field, 'timezone', field.default_timezone())
+    if (output_format is None or output_format.lower() != ISO_8601 or
+            field_timezone is None):
+        return field.to_representation
+
+    def convert(value):
+        if value.tzinfo is not field_timezone:
+            value = field.enforce_timezone(value)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def get_converter(field):
+    """
+    Return the function turning a database value into the output of field,
+    or None when the value can be output as it is.
+    """
+    if isinstance(field, serializers.DateTimeField):
+        return get_datetime_converter(field)
+    if isinstance(field, (serializers.ReadOnlyField, serializers.IntegerField,
+                          serializers.CharField, serializers.BooleanField)):
+        return None
+    return field.to_representation
+
+
+class ValuesSerializer(object):
+    """
+    Read-only counterpart of a ModelSerializer for list responses. It works
+    on the dicts of queryset.values(*columns) rather than model instances and
+    gives the same output as the ModelSerializer without going through its
+    field machinery for every row.
+    """
+
+    def __init__(self, serializer_class, names=None):
+        fields = serializer_class().fields
+        self.fields = [(name, '__'.join(field.source_attrs), field)
+                       for name, field in fields.items()
+                       if not field.write_only and
+                       (names is None or name in names)]
+        self.columns = [column for name, column, field in self.fields]
+
+    def get_plan(self):
+        return [(name, column, get_converter(field))
+                for name, column, field in self.fields]
+
+    def to_representation(self, rows):
+        with timer('serialize'):
+            plan = self.get_plan()
+            data = []
+            for row in rows:
+                item = OrderedDict()
+                for name, column, convert in plan:
+                    value = row[column]
+                    if convert is not None and value is not None:
+                        value = convert(value)
+                    item[name] = value
+                data.append(item)
+        return data
+
+    def to_compact(self, rows):
+        """
+        Return the rows as a header row of field names followed by a list of
+        values for each row, which is smaller to send and quicker to build
+        """
+        with timer('serialize'):
+            plan = self.get_plan()
+            data = [[name for name, column, convert in plan]]
+            for row in rows:
+                values = []
+                for name, column, convert in plan:
+                    value = row[column]
+                    if convert is not None and value is not None:
+                        value = convert(value)
+                    values.append(value)
+                data.append(values)
+        return data
+
+
+@lru_cache(maxsize=None)
+def get_values_serializer(serializer_class, names=None):
+    """
+    Return the ValuesSerializer of serializer_class, or of the given tuple
+    of its field names, built once per class and names
+    """
+    return ValuesSerializer(serializer_class, names)
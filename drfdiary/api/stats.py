@@ -0,0 +1,64 @@
+import datetime
+from collections import OrderedDict
+
+from django.db.models import Sum
+
+from .models import DailyStats, CategoryDailyStats
+
+
+def week_of(day):
+    """
+    Return the Monday starting the week of day
+    """
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def get_stats(user, start, end, top=5):
+    """
+    Return the statistics of the diary of the user from start to end, both
+    included: the entries created each day, the articles added each week and
+    how many of them are read, and the categories most articles were added
+    to. They are read from the daily rollups, a row per day and per category
+    and day, whatever the number of entries and articles.
+    """
+    days = DailyStats.objects.owned_by(user).filter(
+        day__range=(start, end)).order_by('day').values_list(
+            'day', 'entries', 'articles', 'read')
+
+    entries, weeks = [], OrderedDict()
+    for day, day_entries, articles, read in days:
+        if day_entries:
+            entries.append(OrderedDict(
+                [("day", day), ("entries", day_entries)]))
+        if articles or read:
+            week = weeks.setdefault(week_of(day), [0, 0])
+            week[0] += articles
+            week[1] += read
+
+    categories = CategoryDailyStats.objects.owned_by(user).filter(
+        day__range=(start, end)).order_by().values(
+            'category_id', 'category__name').annotate(
+                articles=Sum('articles'), read=Sum('read')).filter(
+                    articles__gt=0).order_by(
+                        '-articles', '-read', 'category_id')[:top]
+
+    return OrderedDict([
+        ("start", start),
+        ("end", end),
+        ("entries", OrderedDict([
+            ("total", sum(day["entries"] for day in entries)),
+            ("days", entries),
+        ])),
+        ("articles", OrderedDict([
+            ("added", sum(added for added, read in weeks.values())),
+            ("read", sum(read for added, read in weeks.values())),
+            ("weeks", [OrderedDict([("week", week), ("added", added),
+                                    ("read", read)])
+                       for week, (added, read) in weeks.items()]),
+        ])),
+        ("top_categories", [
+            OrderedDict([("id", row['category_id']),
+                         ("name", row['category__name']),
+                         ("added", row['articles']), ("read", row['read'])])
+            for row in categories]),
+    ])
@@ -0,0 +1,167 @@
+import base64
+import datetime
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import Tombstone
+from .serializers import EntrySerializer, CategorySerializer, \
+    ArticleSerializer, get_values_serializer
+
+
+# What a sync returns: the key of each list of changed rows, in the order
+# clients should apply them, with the serializer of its rows and the kind of
+# its tombstones
+SYNCED_TYPES = (
+    ('categories', CategorySerializer, Tombstone.CATEGORY),
+    ('entries', EntrySerializer, Tombstone.ENTRY),
+    ('articles', ArticleSerializer, Tombstone.ARTICLE),
+)
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+class SyncTokenExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = ("The sync token is older than the deletions kept, sync "
+                      "again without one.")
+    default_code = 'sync_token_expired'
+
+
+def encode_token(positions, issued):
+    """
+    Return the token of the given (change_seq, id) position in each list,
+    issued at the given time
+    """
+    data = dict((key, list(position)) for key, position in positions.items())
+    data['issued'] = (issued - EPOCH) // MICROSECOND
+    return base64.urlsafe_b64encode(
+        json.dumps(data, sort_keys=True).encode('utf-8')).decode('ascii')
+
+
+def decode_token(token):
+    """
+    Return the positions held in a token and when it was issued, refusing
+    anything that was not made by encode_token
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(
+            token.encode('ascii')).decode('utf-8'))
+        keys = [key for key, *rest in SYNCED_TYPES] + ['deleted']
+        positions = dict((key, (int(data[key][0]), int(data[key][1])))
+                         for key in keys)
+        return positions, EPOCH + int(data['issued']) * MICROSECOND
+    except (ValueError, TypeError, KeyError, IndexError, OverflowError):
+        raise ValidationError({"since": ["Invalid sync token."]})
+
+
+def after(field, position):
+    """
+    Return the filter for the rows past position in (field, id) order
+    """
+    timestamp, pk = position
+    return Q(**{field + '__gt': timestamp}) | \
+        Q(**{field: timestamp, 'id__gt': pk})
+
+
+def get_settled_position():
+    """
+    Return the position before which no row can still appear. On Postgres
+    rows are stamped with the id of their transaction, and those at or past
+    the oldest transaction still running may yet be joined by rows of
+    transactions that commit later. SQLite numbers the changes in the order
+    they commit, so every row up to the last number is there.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT txid_snapshot_xmin(txid_current_snapshot())")
+            return (cursor.fetchone()[0], 0)
+        cursor.execute("SELECT value + 1 FROM api_change_counter")
+        return (cursor.fetchone()[0], 0)
+
+
+def next_position(rows, position, truncated, settled):
+    """
+    Return where the next sync carries on from: after the last row sent if
+    the list was cut short, else after every row, but never past the
+    settled position, so that rows still to be committed before it are not
+    skipped. Rows sent past it are sent again.
+    """
+    if truncated:
+        settled = min((rows[-1]['change_seq'], rows[-1]['id']), settled)
+    return max(position, settled)
+
+
+def sync(user, since=None):
+    """
+    Return the rows of the user created or updated past the positions in
+    the since token, the ids of those deleted since, and the token to send
+    next time. Each list holds at most API_SYNC_PAGE_SIZE rows; "more" says
+    whether another sync would return more right away.
+    """
+    limit = getattr(settings, 'API_SYNC_PAGE_SIZE', 500)
+    now = timezone.now()
+    retention = datetime.timedelta(
+        days=getattr(settings, 'API_SYNC_TOMBSTONE_DAYS', 30))
+    if since:
+        positions, issued = decode_token(since)
+        if issued < now - retention:
+            raise SyncTokenExpired()
+    else:
+        positions = dict((key, (0, 0)) for key, *rest in SYNCED_TYPES)
+    # Read before the rows, so that every row settled by then is among them
+    settled = get_settled_position()
+
+    data = OrderedDict()
+    new_positions = {}
+    more = False
+    for key, serializer_class, kind in SYNCED_TYPES:
+        serializer = get_values_serializer(serializer_class)
+        columns = OrderedDict.fromkeys(serializer.columns)
+        columns.update(OrderedDict.fromkeys(('change_seq', 'id')))
+        queryset = serializer_class.Meta.model.objects.owned_by(user).filter(
+            after('change_seq', positions[key]))
+        rows = list(queryset.order_by('change_seq', 'id').values(
+            *columns)[:limit + 1])
+        truncated = len(rows) > limit
+        rows = rows[:limit]
+        new_positions[key] = next_position(rows, positions[key], truncated,
+                                           settled)
+        # A list held back by a transaction still running has no more to
+        # give until it ends
+        more = more or (truncated and new_positions[key] != positions[key])
+        data[key] = serializer.to_representation(rows)
+
+    deleted = OrderedDict((key, []) for key, *rest in SYNCED_TYPES)
+    if since:
+        tombstones = list(Tombstone.objects.owned_by(user).filter(
+            after('change_seq', positions['deleted'])).order_by(
+                'change_seq', 'id').values(
+                    'id', 'kind', 'object_id', 'change_seq')[:limit + 1])
+        truncated = len(tombstones) > limit
+        tombstones = tombstones[:limit]
+        keys = dict((kind, key) for key, serializer_class, kind
+                    in SYNCED_TYPES)
+        for tombstone in tombstones:
+            deleted[keys[tombstone['kind']]].append(tombstone['object_id'])
+        new_positions['deleted'] = next_position(
+            tombstones, positions['deleted'], truncated, settled)
+        more = more or (truncated and
+                        new_positions['deleted'] != positions['deleted'])
+    else:
+        # A first sync has nothing to delete
+        new_positions['deleted'] = settled
+
+    data['deleted'] = deleted
+    data['token'] = encode_token(new_positions, now)
+    data['more'] = more
+    return data
@@ -0,0 +1,223 @@
+import datetime
+import functools
+import json
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('api.tasks')
+
+
+class BackgroundTask(object):
+    """
+    A function that can be run in the background with .delay(), made by the
+    task decorator. Its arguments must be JSON serializable, so that they
+    can be stored until it runs.
+    """
+
+    def __init__(self, func, max_attempts=None):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.name = '{}.{}'.format(func.__module__, func.__name__)
+        self._max_attempts = max_attempts
+
+    @property
+    def max_attempts(self):
+        if self._max_attempts is not None:
+            return self._max_attempts
+        return getattr(settings, 'API_TASK_MAX_ATTEMPTS', 5)
+
+    def __call__(self, *args):
+        return self.func(*args)
+
+    def delay(self, *args):
+        """
+        Queue the task to run with args on the backend API_TASK_BACKEND
+        names, once the current transaction commits
+        """
+        get_task_backend().enqueue(self, list(json.loads(json.dumps(args))))
+
+
+def task(func=None, max_attempts=None):
+    """
+    Decorator making a module-level function a BackgroundTask, tried up to
+    max_attempts times or API_TASK_MAX_ATTEMPTS
+    """
+    if func is None:
+        return functools.partial(task, max_attempts=max_attempts)
+    return BackgroundTask(func, max_attempts)
+
+
+def get_retry_delay(attempt):
+    """
+    Return the seconds to wait before trying again a task that failed the
+    given attempt, doubling each time
+    """
+    return getattr(settings, 'API_TASK_RETRY_DELAY', 10) * 2 ** (attempt - 1)
+
+
+def run_task(task, args):
+    """
+    Run the task in a transaction of its own, so a failed attempt leaves
+    nothing half done for the next one
+    """
+    with transaction.atomic():
+        task.func(*args)
+
+
+class ImmediateBackend(object):
+    """
+    Backend running tasks as soon as they are queued, in the caller, with
+    errors raised there. It suits tests and debugging.
+    """
+
+    def enqueue(self, task, args):
+        run_task(task, args)
+
+
+class ThreadPoolBackend(object):
+    """
+    Backend running tasks in a pool of API_TASK_WORKERS threads of the
+    process, after the transaction queueing them commits. Failed tasks are
+    tried again after a delay, in the pool as soon as it has room. At most
+    API_TASK_QUEUE_SIZE tasks wait for a thread; past that the caller runs
+    them itself, slowing it down rather than losing work. Tasks still
+    waiting when the process stops are lost, so work that must survive a
+    crash belongs on the DatabaseBackend.
+    """
+
+    def __init__(self):
+        workers = getattr(settings, 'API_TASK_WORKERS', 4)
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix='api-task')
+        self.slots = threading.BoundedSemaphore(
+            workers + getattr(settings, 'API_TASK_QUEUE_SIZE', 100))
+
+    def enqueue(self, task, args):
+        transaction.on_commit(lambda: self.submit(task, args))
+
+    def submit(self, task, args, attempt=1):
+        if not self.slots.acquire(blocking=False):
+            self.run(task, args, attempt)
+            return
+        self.start(task, args, attempt)
+
+    def retry(self, task, args, attempt):
+        # Retries come from a timer thread, which nothing looks after the
+        # database connection of, so they wait for a slot in the pool
+        # rather than run there
+        self.slots.acquire()
+        self.start(task, args, attempt)
+
+    def start(self, task, args, attempt):
+        future = self.executor.submit(self.run_in_thread, task, args,
+                                      attempt)
+        future.add_done_callback(lambda future: self.slots.release())
+
+    def run_in_thread(self, task, args, attempt):
+        # Threads of the pool outlive the tasks they run, so their database
+        # connections are looked after as Django does around requests
+        close_old_connections()
+        try:
+            self.run(task, args, attempt)
+        finally:
+            close_old_connections()
+
+    def run(self, task, args, attempt):
+        try:
+            run_task(task, args)
+        except Exception:
+            if attempt >= task.max_attempts:
+                logger.exception("Task %s failed %d times, giving up",
+                                 task.name, attempt)
+                return
+            logger.warning("Task %s failed, trying again", task.name,
+                           exc_info=True)
+            timer = threading.Timer(get_retry_delay(attempt), self.retry,
+                                    (task, args, attempt + 1))
+            timer.daemon = True
+            timer.start()
+
+
+class DatabaseBackend(object):
+    """
+    Backend storing tasks in the QueuedTask table, in the transaction
+    queueing them, for the run_tasks command to run. A task is only deleted
+    once it succeeded, and one claimed by a worker that died is claimed
+    again once its lease of API_TASK_LEASE_SECONDS runs out, so every task
+    runs at least once.
+    """
+
+    def enqueue(self, task, args):
+        # The model module queues tasks itself, so is imported late
+        from .models import QueuedTask
+        QueuedTask.objects.create(name=task.name, args=json.dumps(args),
+                                  max_attempts=task.max_attempts)
+
+    def claim(self, limit):
+        """
+        Return up to limit due tasks, leased to this worker. Tasks locked by
+        other workers are skipped rather than waited for.
+        """
+        from .models import QueuedTask
+        now = timezone.now()
+        lease = datetime.timedelta(
+            seconds=getattr(settings, 'API_TASK_LEASE_SECONDS', 300))
+        with transaction.atomic():
+            claimed = list(QueuedTask.objects.select_for_update(
+                skip_locked=True).filter(
+                    status=QueuedTask.PENDING, run_at__lte=now).order_by(
+                        'run_at', 'id')[:limit])
+            QueuedTask.objects.filter(
+                pk__in=[queued.pk for queued in claimed]).update(
+                    attempts=F('attempts') + 1, run_at=now + lease)
+        for queued in claimed:
+            queued.attempts += 1
+        return claimed
+
+    def run(self, queued):
+        """
+        Run a claimed task, deleting it if it succeeds and scheduling it
+        again, or marking it failed after its last attempt, if not. Return
+        whether it succeeded.
+        """
+        from .models import QueuedTask
+        try:
+            task = import_string(queued.name)
+            run_task(task, json.loads(queued.args))
+        except Exception:
+            error = traceback.format_exc()
+            logger.warning("Task %s failed", queued.name, exc_info=True)
+            changes = {'last_error': error}
+            if queued.attempts >= queued.max_attempts:
+                changes['status'] = QueuedTask.FAILED
+            else:
+                changes['run_at'] = timezone.now() + datetime.timedelta(
+                    seconds=get_retry_delay(queued.attempts))
+            QueuedTask.objects.filter(pk=queued.pk).update(**changes)
+            return False
+        QueuedTask.objects.filter(pk=queued.pk).delete()
+        return True
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_task_backend():
+    """
+    Return the backend named by API_TASK_BACKEND, made once per process so
+    that the thread pool is shared
+    """
+    path = getattr(settings, 'API_TASK_BACKEND', 'api.tasks.ThreadPoolBackend')
+    with _backends_lock:
+        if path not in _backends:
+            _backends[path] = import_string(path)()
+        return _backends[path]
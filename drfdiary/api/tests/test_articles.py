@@ -165,3 +165,219 @@ class ArticleViewTestCase(TestCase):
         response = client.patch(
             article_url, {"title": "I will not be updated"}, format="json")
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cannot_use_another_user_category(self):
+        """
+        Test that a user can neither list nor add articles in a category they
+        do not own
+        """
+        client = APIClient()
+        new_user = User.objects.create(username="another_nerd")
+        Category.objects.create(name="Theirs", owner=new_user)
+        client.force_authenticate(user=new_user)
+        category_url = '/api/v2/categories/{}/articles/'.format(
+            self.category.id)
+
+        response = client.get(category_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = client.post(category_url, self.article_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ArticleBulkViewTestCase(TestCase):
+    """
+    This class defines the tests for the bulk articles endpoint
+    """
+
+    def setUp(self):
+        """
+        Define the test client, a category and its bulk endpoint
+        """
+        self.user = User.objects.create(username="bulk_user")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.category = Category.objects.create(name="Bulk", owner=self.user)
+        self.bulk_url = '/api/v2/categories/{}/articles/bulk/'.format(
+            self.category.id)
+
+    def create_articles(self, count):
+        """
+        Create count articles in the category through the bulk endpoint
+        """
+        articles = [{"url": "http://www.dummy.com/{}".format(i),
+                     "title": "Article {}".format(i)} for i in range(count)]
+        return self.client.post(self.bulk_url, articles, format="json")
+
+    def test_bulk_creation(self):
+        """
+        Test that a list of articles is created and returned in order
+        """
+        response = self.create_articles(3)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([article["title"] for article in response.data],
+                         ["Article 0", "Article 1", "Article 2"])
+        self.assertTrue(all(article["id"] for article in response.data))
+        self.assertEqual(
+            Article.objects.filter(category=self.category).count(), 3)
+
+    def test_bulk_creation_is_all_or_nothing(self):
+        """
+        Test that one invalid article keeps the whole batch from being saved
+        """
+        articles = [{"url": "http://www.dummy.com", "title": "Fine"},
+                    {"url": "not a url", "title": "Broken"}]
+        response = self.client.post(self.bulk_url, articles, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("url", response.data[1])
+        self.assertEqual(Article.objects.count(), 0)
+
+    def test_bulk_creation_is_limited(self):
+        """
+        Test that a batch larger than the limit is refused
+        """
+        with self.settings(API_MAX_BULK_ARTICLES=2):
+            response = self.create_articles(3)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Article.objects.count(), 0)
+
+    def test_bulk_update(self):
+        """
+        Test that a list of articles is updated by id
+        """
+        created = self.create_articles(2).data
+        modified = Article.objects.get(id=created[1]["id"]).date_modified
+        updates = [{"id": created[0]["id"], "read_status": True},
+                   {"id": created[1]["id"], "title": "Renamed"}]
+        response = self.client.patch(self.bulk_url, updates, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first = Article.objects.get(id=created[0]["id"])
+        second = Article.objects.get(id=created[1]["id"])
+        self.assertTrue(first.read_status)
+        self.assertEqual(first.title, "Article 0")
+        self.assertEqual(second.title, "Renamed")
+        self.assertGreater(second.date_modified, modified)
+
+    def test_bulk_update_of_unknown_article(self):
+        """
+        Test that updating an article outside the category fails the batch
+        """
+        created = self.create_articles(1).data
+        updates = [{"id": created[0]["id"], "title": "Renamed"},
+                   {"id": 0, "title": "Ghost"}]
+        response = self.client.patch(self.bulk_url, updates, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("id", response.data[1])
+        self.assertEqual(Article.objects.get().title, "Article 0")
+
+    def test_bulk_deletion(self):
+        """
+        Test that articles are deleted by id with a result for each id
+        """
+        created = self.create_articles(2).data
+        ids = [created[0]["id"], 0]
+        response = self.client.delete(self.bulk_url, ids, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{"id": created[0]["id"],
+                                          "deleted": True},
+                                         {"id": 0, "deleted": False}])
+        self.assertEqual(Article.objects.count(), 1)
+
+    def test_cannot_bulk_edit_another_user_category(self):
+        """
+        Test that the bulk endpoint checks the category owner
+        """
+        client = APIClient()
+        client.force_authenticate(
+            user=User.objects.create(username="another_nerd"))
+        response = client.post(self.bulk_url, [], format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ArticleReadViewTestCase(TestCase):
+    """
+    This class defines the tests for marking articles as read in bulk
+    """
+
+    def setUp(self):
+        """
+        Define the test client and a couple of categories with articles
+        """
+        self.user = User.objects.create(username="reader")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.news = Category.objects.create(name="News", owner=self.user)
+        self.blogs = Category.objects.create(name="Blogs", owner=self.user)
+        self.articles = [
+            Article.objects.create(title="Article {}".format(i),
+                                   url="http://www.dummy.com",
+                                   category=category, owner=self.user)
+            for i, category in enumerate(
+                [self.news, self.news, self.blogs])]
+
+    def unread_titles(self):
+        return sorted(Article.objects.filter(
+            read_status=False).values_list("title", flat=True))
+
+    def test_mark_read_by_ids(self):
+        """
+        Test that the given articles are marked as read
+        """
+        ids = [self.articles[0].id, self.articles[2].id]
+        response = self.client.post(
+            '/api/v2/articles/read/', {"ids": ids}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"updated": 2})
+        self.assertEqual(self.unread_titles(), ["Article 1"])
+
+    def test_mark_read_by_category_and_date(self):
+        """
+        Test that the articles of a category created before a date are
+        marked as read
+        """
+        later = Article.objects.create(title="Later",
+                                       url="http://www.dummy.com",
+                                       category=self.news, owner=self.user)
+        response = self.client.post(
+            '/api/v2/articles/read/',
+            {"category": self.news.id, "before": later.date_created},
+            format="json")
+        self.assertEqual(response.data, {"updated": 2})
+        self.assertEqual(self.unread_titles(), ["Article 2", "Later"])
+
+    def test_mark_unread(self):
+        """
+        Test that articles can be marked as unread and that only articles
+        whose status changes are counted
+        """
+        self.client.post('/api/v2/articles/read/',
+                         {"category": self.blogs.id}, format="json")
+        response = self.client.post(
+            '/api/v2/articles/read/',
+            {"ids": [a.id for a in self.articles], "read_status": False},
+            format="json")
+        self.assertEqual(response.data, {"updated": 1})
+        self.assertEqual(len(self.unread_titles()), 3)
+
+    def test_cannot_mark_another_user_articles(self):
+        """
+        Test that other users' articles are left untouched
+        """
+        client = APIClient()
+        client.force_authenticate(
+            user=User.objects.create(username="another_nerd"))
+        response = client.post(
+            '/api/v2/articles/read/',
+            {"ids": [a.id for a in self.articles]}, format="json")
+        self.assertEqual(response.data, {"updated": 0})
+        self.assertEqual(len(self.unread_titles()), 3)
+
+    def test_selection_is_required(self):
+        """
+        Test that a request without ids, category or date is refused
+        """
+        response = self.client.post('/api/v2/articles/read/', {},
+                                    format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(self.unread_titles()), 3)
@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+
+from api.authentication import TTLCache, token_cache
+
+
+class CachedTokenAuthenticationTestCase(TestCase):
+    """
+    This class defines the tests for the cached token authentication
+    """
+
+    def setUp(self):
+        """
+        Define a user and a client sending their token
+        """
+        token_cache.clear()
+        self.user = User.objects.create(username="nerd")
+        self.token = Token.objects.get_or_create(user=self.user)[0]
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Token {}".format(self.token.key))
+
+    def test_token_user_is_cached(self):
+        """
+        Test that only the first request looks the token up
+        """
+        self.client.get('/api/v2/users/{}/'.format(self.user.pk))
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v2/users/{}/'.format(
+                self.user.pk))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["username"], "nerd")
+
+    def test_deleted_token_is_rejected(self):
+        """
+        Test that a token deleted on logout stops authenticating at once
+        """
+        self.client.get('/api/v2/users/{}/'.format(self.user.pk))
+        self.token.delete()
+        response = self.client.get('/api/v2/users/{}/'.format(self.user.pk))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_revoked_by_another_process_is_rejected(self):
+        """
+        Test that a copy of a token cached before it was deleted elsewhere,
+        as another process would still hold, is not accepted
+        """
+        self.client.get('/api/v2/users/{}/'.format(self.user.pk))
+        stale = token_cache.get(self.token.key)
+        self.token.delete()
+        token_cache.set(self.token.key, stale)
+        response = self.client.get('/api/v2/users/{}/'.format(self.user.pk))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        """
+        Test that saving the user drops their cached tokens
+        """
+        self.client.get('/api/v2/users/{}/'.format(self.user.pk))
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/v2/users/{}/'.format(self.user.pk))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TTLCacheTestCase(TestCase):
+    """
+    This class defines the tests for the bounded in-process cache
+    """
+
+    def test_least_recently_used_item_is_evicted(self):
+        cache = TTLCache(maxsize=2, timeout=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")),
+                         (1, None, 3))
+
+    def test_items_expire(self):
+        cache = TTLCache(maxsize=2, timeout=60)
+        with mock.patch("api.authentication.time.monotonic",
+                        return_value=100):
+            cache.set("a", 1)
+        with mock.patch("api.authentication.time.monotonic",
+                        return_value=160):
+            self.assertIsNone(cache.get("a"))
@@ -0,0 +1,87 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+
+from api.management.commands.benchmark_api import PREFIX, ROUTES, Command
+from api.models import Entry, Category, Tombstone, DailyStats, \
+    CategoryDailyStats, QueuedTask
+
+
+@override_settings(ALLOWED_HOSTS=["localhost"])
+class BenchmarkApiTestCase(TestCase):
+    """
+    This class defines the tests for the API benchmark command
+    """
+
+    def test_every_route_succeeds(self):
+        """
+        Test that a small run reaches every route without errors, saves its
+        figures and locks its users out
+        """
+        handle, path = tempfile.mkstemp(suffix=".json")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        call_command("benchmark_api", users=2, entries=5, categories=2,
+                     articles=10, requests=2, concurrency=1, output=path,
+                     stdout=open(os.devnull, "w"))
+
+        with open(path) as output:
+            results = json.load(output)
+        self.assertEqual(sorted(results["routes"]),
+                         sorted(route.name for route in ROUTES))
+        for name, result in results["routes"].items():
+            self.assertEqual(result["errors"], 0, name)
+            self.assertEqual(result["requests"], 2, name)
+            self.assertGreater(result["queries"], 0, name)
+        users = User.objects.filter(username__startswith=PREFIX)
+        self.assertEqual(users.count(), 2)
+        for user in users:
+            self.assertFalse(user.has_usable_password())
+            self.assertFalse(hasattr(user, 'auth_token'))
+
+    @override_settings(API_TASK_BACKEND='api.tasks.DatabaseBackend')
+    def test_seeded_rows_match_the_api(self):
+        """
+        Test that the seeded rows come with the counters and statistics the
+        API would have kept, and that cleaning up leaves nothing of them
+        """
+        command = Command()
+        command.seed({'users': 1, 'entries': 5, 'categories': 2,
+                      'articles': 10})
+        user = User.objects.get(username=PREFIX + "0")
+        for category in Category.objects.owned_by(user):
+            self.assertEqual(category.article_count, 10)
+            self.assertEqual(category.unread_count, 10)
+        self.assertEqual(DailyStats.objects.get(owner=user).entries, 5)
+        self.assertEqual(CategoryDailyStats.objects.filter(
+            owner=user).count(), 2)
+        self.assertTrue(QueuedTask.objects.exists())
+
+        command.cleanup()
+        for model in (Entry, Category, Tombstone, DailyStats,
+                      CategoryDailyStats, QueuedTask):
+            self.assertFalse(model.objects.exists(), model.__name__)
+
+
+class BenchmarkRenderersTestCase(TestCase):
+    """
+    This class defines the tests for the renderer benchmark command
+    """
+
+    def test_every_renderer_is_reported(self):
+        """
+        Test that a small run reports each list in both forms, rendered
+        without compression by at least DRF's renderer
+        """
+        out = StringIO()
+        call_command("benchmark_renderers", rows=5, repeat=1, stdout=out)
+        output = out.getvalue()
+        for heading in ("Entries full", "Entries compact", "Articles full",
+                        "Articles compact"):
+            self.assertIn("{} (5 rows):".format(heading), output)
+        self.assertIn("drf json   identity", output)
@@ -0,0 +1,151 @@
+import warnings
+
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.test import TestCase
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+
+from api.models import Entry, Category, Article
+
+
+class ListCacheTestCase(TestCase):
+    """
+    This class defines the tests for the per-user list response cache
+    """
+
+    def setUp(self):
+        """
+        Start from an empty cache with a user owning a category
+        """
+        cache.clear()
+        self.user = User.objects.create(username="cached")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.category = Category.objects.create(name="Cached",
+                                                owner=self.user)
+        self.articles_url = '/api/v2/categories/{}/articles/'.format(
+            self.category.id)
+
+    def titles(self, url):
+        response = self.client.get(url)
+        return [row.get("content") or row.get("name") or row.get("title")
+                for row in response.data["results"]]
+
+    def test_repeated_reads_skip_the_database(self):
+        """
+        Test that a second read of each list runs no queries
+        """
+        for url in ('/api/v2/entries/', '/api/v2/categories/',
+                    self.articles_url):
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                self.client.get(url)
+
+    def test_query_strings_are_cached_separately(self):
+        """
+        Test that lists with different query strings do not share a cache
+        """
+        Entry.objects.create(content="One", owner=self.user)
+        Entry.objects.create(content="Two", owner=self.user)
+        self.assertEqual(self.titles('/api/v2/entries/'), ["Two", "One"])
+        self.assertEqual(self.titles('/api/v2/entries/?page_size=1'),
+                         ["Two"])
+
+    def test_long_cursors_fit_in_the_key(self):
+        """
+        Test that a list paged with a cursor holding a long title is cached
+        under a key memcached accepts
+        """
+        for i in range(3):
+            Article.objects.create(title=str(i) * 255, category=self.category,
+                                   url="http://www.dummy.com",
+                                   owner=self.user)
+        url = self.articles_url + '?ordering=title&page_size=1'
+        next_url = self.client.get(url).data["next"]
+        self.assertGreater(len(next_url), 250)
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", CacheKeyWarning)
+            self.assertEqual(self.titles(next_url), ["1" * 255])
+
+    def test_users_are_cached_separately(self):
+        """
+        Test that a user never sees another user's cached list
+        """
+        Entry.objects.create(content="Mine", owner=self.user)
+        self.assertEqual(self.titles('/api/v2/entries/'), ["Mine"])
+        client = APIClient()
+        client.force_authenticate(
+            user=User.objects.create(username="another_nerd"))
+        response = client.get('/api/v2/entries/')
+        self.assertEqual(response.data["results"], [])
+
+    def test_create_invalidates_the_list(self):
+        """
+        Test that creating an entry or category shows up on the next read
+        """
+        self.assertEqual(self.titles('/api/v2/entries/'), [])
+        self.client.post('/api/v2/entries/', {"content": "New"},
+                         format="json")
+        self.assertEqual(self.titles('/api/v2/entries/'), ["New"])
+
+        self.assertEqual(self.titles('/api/v2/categories/'), ["Cached"])
+        self.client.post('/api/v2/categories/', {"name": "Fresh"},
+                         format="json")
+        self.assertEqual(self.titles('/api/v2/categories/'),
+                         ["Fresh", "Cached"])
+
+    def test_update_and_delete_invalidate_the_list(self):
+        """
+        Test that updating and deleting an entry show up on the next read
+        """
+        entry = Entry.objects.create(content="Old", owner=self.user)
+        self.assertEqual(self.titles('/api/v2/entries/'), ["Old"])
+        self.client.put('/api/v2/entries/{}/'.format(entry.id),
+                        {"content": "Updated"}, format="json")
+        self.assertEqual(self.titles('/api/v2/entries/'), ["Updated"])
+        self.client.delete('/api/v2/entries/{}/'.format(entry.id))
+        self.assertEqual(self.titles('/api/v2/entries/'), [])
+
+    def test_bulk_writes_invalidate_the_list(self):
+        """
+        Test that the bulk article endpoints, which bypass the model signals,
+        still invalidate the articles list
+        """
+        self.assertEqual(self.titles(self.articles_url), [])
+        response = self.client.post(
+            self.articles_url + 'bulk/',
+            [{"title": "Bulk", "url": "http://www.dummy.com"}],
+            format="json")
+        self.assertEqual(self.titles(self.articles_url), ["Bulk"])
+
+        self.client.patch(self.articles_url + 'bulk/',
+                          [{"id": response.data[0]["id"], "title": "Edited"}],
+                          format="json")
+        self.assertEqual(self.titles(self.articles_url), ["Edited"])
+
+        self.client.post('/api/v2/articles/read/',
+                         {"category": self.category.id}, format="json")
+        response = self.client.get(self.articles_url)
+        self.assertTrue(response.data["results"][0]["read_status"])
+
+    def test_renaming_the_user_invalidates_the_list(self):
+        """
+        Test that the owner shown in cached lists follows a username change
+        """
+        Article.objects.create(title="Mine", url="http://www.dummy.com",
+                               category=self.category, owner=self.user)
+        self.client.get(self.articles_url)
+        self.user.username = "renamed"
+        self.user.save()
+        response = self.client.get(self.articles_url)
+        self.assertEqual(response.data["results"][0]["owner"], "renamed")
+
+    def test_cache_can_be_turned_off(self):
+        """
+        Test that a zero timeout disables list caching
+        """
+        with self.settings(API_LIST_CACHE_TIMEOUT=0):
+            self.client.get('/api/v2/entries/')
+            with self.assertNumQueries(2):
+                self.client.get('/api/v2/entries/')
@@ -0,0 +1,132 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+
+from api import renderers
+from api.models import Entry, Category, Article
+
+
+class ConditionalGetTestCase(TestCase):
+    """
+    This class defines the tests for the ETag and Last-Modified validators
+    """
+
+    def setUp(self):
+        """
+        Define the test client and one row of each kind
+        """
+        cache.clear()
+        self.user = User.objects.create(username="validated")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.entry = Entry.objects.create(content="Entry", owner=self.user)
+        self.category = Category.objects.create(name="Validated",
+                                                owner=self.user)
+        self.article = Article.objects.create(title="Article",
+                                              url="http://www.dummy.com",
+                                              category=self.category,
+                                              owner=self.user)
+        self.urls = [
+            '/api/v2/entries/',
+            '/api/v2/entries/{}/'.format(self.entry.id),
+            '/api/v2/categories/',
+            '/api/v2/categories/{}/'.format(self.category.id),
+            '/api/v2/categories/{}/articles/'.format(self.category.id),
+            '/api/v2/categories/{}/articles/{}/'.format(self.category.id,
+                                                        self.article.id),
+        ]
+
+    def test_responses_carry_validators(self):
+        """
+        Test that every list and detail response has an ETag, and every
+        detail response a Last-Modified header
+        """
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response["ETag"].startswith('"'), url)
+            self.assertEqual("Last-Modified" in response,
+                             url in self.urls[1::2], url)
+
+    def test_matching_etag_is_not_modified(self):
+        """
+        Test that sending back the ETag gets an empty 304
+        """
+        for url in self.urls:
+            etag = self.client.get(url)["ETag"]
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code,
+                             status.HTTP_304_NOT_MODIFIED, url)
+            self.assertEqual(response.content, b"")
+            self.assertEqual(response["ETag"], etag)
+
+    def test_matching_last_modified_is_not_modified(self):
+        """
+        Test that sending back Last-Modified gets a 304
+        """
+        for url in self.urls[1::2]:
+            last_modified = self.client.get(url)["Last-Modified"]
+            response = self.client.get(url,
+                                       HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(response.status_code,
+                             status.HTTP_304_NOT_MODIFIED, url)
+
+    def test_changes_alter_the_etag(self):
+        """
+        Test that updates, deletions and other pages change the ETag
+        """
+        etag = self.client.get('/api/v2/entries/')["ETag"]
+        other = Entry.objects.create(content="Another", owner=self.user)
+        updated_etag = self.client.get('/api/v2/entries/')["ETag"]
+        self.assertNotEqual(updated_etag, etag)
+
+        other.delete()
+        response = self.client.get('/api/v2/entries/',
+                                   HTTP_IF_NONE_MATCH=updated_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Last-Modified", response)
+
+        self.assertNotEqual(
+            self.client.get('/api/v2/entries/?page_size=1')["ETag"], etag)
+
+    def test_formats_have_their_own_etags(self):
+        """
+        Test that the same data rendered in another format has another
+        ETag, so a validator of one format never gets a 304 for another
+        """
+        accepts = ['application/json', 'text/html']
+        if renderers.msgpack:
+            accepts.append('application/msgpack')
+        for url in self.urls[:2]:
+            etags = [self.client.get(url, HTTP_ACCEPT=accept)["ETag"]
+                     for accept in accepts]
+            self.assertEqual(len(set(etags)), len(accepts), url)
+            response = self.client.get(url, HTTP_ACCEPT='text/html',
+                                       HTTP_IF_NONE_MATCH=etags[0])
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+
+    def test_detail_etag_follows_updates(self):
+        """
+        Test that an updated entry is served in full again
+        """
+        url = '/api/v2/entries/{}/'.format(self.entry.id)
+        etag = self.client.get(url)["ETag"]
+        self.client.patch(url, {"content": "Changed"}, format="json")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["content"], "Changed")
+
+    def test_not_modified_is_not_served_to_other_users(self):
+        """
+        Test that permissions are checked before the validators
+        """
+        client = APIClient()
+        client.force_authenticate(
+            user=User.objects.create(username="another_nerd"))
+        for url in self.urls[3:]:
+            etag = self.client.get(url)["ETag"]
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code,
+                             status.HTTP_403_FORBIDDEN, url)
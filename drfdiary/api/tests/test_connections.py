@@ -0,0 +1,36 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from api.connections import close_unusable_connections
+
+
+class ConnectionHealthCheckTestCase(TestCase):
+    """
+    This class defines the tests for the connection check run before each
+    request
+    """
+
+    def setUp(self):
+        connection.ensure_connection()
+
+    @override_settings(API_DB_HEALTH_CHECKS=True)
+    def test_unusable_connection_is_closed(self):
+        with mock.patch.object(connection, "is_usable", return_value=False), \
+                mock.patch.object(connection, "close") as close:
+            close_unusable_connections(sender=None)
+        close.assert_called_once_with()
+
+    @override_settings(API_DB_HEALTH_CHECKS=True)
+    def test_usable_connection_is_kept(self):
+        with mock.patch.object(connection, "is_usable", return_value=True), \
+                mock.patch.object(connection, "close") as close:
+            close_unusable_connections(sender=None)
+        close.assert_not_called()
+
+    @override_settings(API_DB_HEALTH_CHECKS=False)
+    def test_checks_can_be_turned_off(self):
+        with mock.patch.object(connection, "is_usable") as is_usable:
+            close_unusable_connections(sender=None)
+        is_usable.assert_not_called()
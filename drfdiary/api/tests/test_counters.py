@@ -0,0 +1,210 @@
+import json
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+
+from api.models import Category, Article
+
+
+class CategoryCounterTestCase(TestCase):
+    """
+    This class defines the tests for the article and unread counters kept on
+    categories
+    """
+
+    def setUp(self):
+        """
+        Define the test client and two categories to count articles in
+        """
+        self.user = User.objects.create(username="counting")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.news = Category.objects.create(name="News", owner=self.user)
+        self.blogs = Category.objects.create(name="Blogs", owner=self.user)
+
+    def create_article(self, category, read_status=False):
+        return Article.objects.create(title="Article",
+                                      url="http://www.dummy.com",
+                                      read_status=read_status,
+                                      category=category, owner=self.user)
+
+    def assertCounts(self, category, articles, unread):
+        category.refresh_from_db()
+        self.assertEqual((category.article_count, category.unread_count),
+                         (articles, unread))
+
+    def test_counters_follow_article_changes(self):
+        """
+        Test that creating, reading, moving and deleting an article changes
+        the counters of its category
+        """
+        article = self.create_article(self.news)
+        self.create_article(self.news, read_status=True)
+        self.assertCounts(self.news, 2, 1)
+
+        article.read_status = True
+        article.save()
+        self.assertCounts(self.news, 2, 0)
+
+        article.category = self.blogs
+        article.read_status = False
+        article.save()
+        self.assertCounts(self.news, 1, 0)
+        self.assertCounts(self.blogs, 1, 1)
+
+        Article.objects.get(pk=article.pk).delete()
+        self.assertCounts(self.blogs, 0, 0)
+
+    def test_category_serializer_exposes_counters(self):
+        """
+        Test that the category list and details show the counters, which
+        cannot be written
+        """
+        self.create_article(self.news)
+        self.create_article(self.news, read_status=True)
+        response = self.client.get('/api/v2/categories/')
+        counts = dict((item["name"],
+                       (item["article_count"], item["unread_count"]))
+                      for item in response.data["results"])
+        self.assertEqual(counts, {"News": (2, 1), "Blogs": (0, 0)})
+
+        url = '/api/v2/categories/{}/'.format(self.news.id)
+        response = self.client.put(url, {"name": "News",
+                                         "article_count": 100},
+                                   format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCounts(self.news, 2, 1)
+
+    def test_saving_a_category_keeps_newer_counts(self):
+        """
+        Test that saving a category read before articles were added does not
+        write back its old counts
+        """
+        category = Category.objects.get(pk=self.news.pk)
+        self.create_article(self.news)
+        category.description = "Renamed"
+        category.save()
+        self.assertCounts(self.news, 1, 1)
+
+    def test_article_views_update_counters(self):
+        """
+        Test that creating, updating and deleting an article through the API
+        changes the counters
+        """
+        url = '/api/v2/categories/{}/articles/'.format(self.news.id)
+        response = self.client.post(url, {"title": "New",
+                                          "url": "http://www.dummy.com"},
+                                    format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertCounts(self.news, 1, 1)
+
+        detail_url = '{}{}/'.format(url, response.data["id"])
+        response = self.client.patch(detail_url, {"read_status": True},
+                                     format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCounts(self.news, 1, 0)
+
+        response = self.client.delete(detail_url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertCounts(self.news, 0, 0)
+
+    def test_bulk_views_update_counters(self):
+        """
+        Test that bulk creates, updates and deletes change the counters
+        """
+        url = '/api/v2/categories/{}/articles/bulk/'.format(self.news.id)
+        response = self.client.post(url, [
+            {"title": "Article {}".format(i), "url": "http://www.dummy.com",
+             "read_status": i == 0} for i in range(3)], format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertCounts(self.news, 3, 2)
+        ids = [item["id"] for item in response.data]
+
+        response = self.client.patch(url, [
+            {"id": ids[0], "read_status": False},
+            {"id": ids[1], "read_status": True},
+            {"id": ids[2], "title": "Renamed"}], format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCounts(self.news, 3, 2)
+
+        response = self.client.patch(url, [{"id": ids[0],
+                                            "read_status": True}],
+                                     format="json")
+        self.assertCounts(self.news, 3, 1)
+
+        response = self.client.delete(url, ids[:2], format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCounts(self.news, 1, 1)
+
+    def test_mark_read_updates_counters(self):
+        """
+        Test that marking articles as read and unread in bulk changes the
+        unread counters of their categories
+        """
+        self.create_article(self.news)
+        self.create_article(self.news)
+        self.create_article(self.blogs, read_status=True)
+        response = self.client.post('/api/v2/articles/read/',
+                                    {"category": self.news.id},
+                                    format="json")
+        self.assertEqual(response.data, {"updated": 2})
+        self.assertCounts(self.news, 2, 0)
+
+        response = self.client.post(
+            '/api/v2/articles/read/',
+            {"category": self.blogs.id, "read_status": False}, format="json")
+        self.assertEqual(response.data, {"updated": 1})
+        self.assertCounts(self.blogs, 1, 1)
+        self.assertCounts(self.news, 2, 0)
+
+    def test_deleting_a_category_updates_once(self):
+        """
+        Test that the articles deleted along with a category do not each
+        update the category
+        """
+        for i in range(3):
+            self.create_article(self.news)
+        url = '/api/v2/categories/{}/'.format(self.news.id)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(len([
+            query for query in context.captured_queries
+            if query['sql'].startswith('UPDATE "api_category"')]), 1)
+        self.assertFalse(Category.objects.filter(pk=self.news.pk).exists())
+
+    def test_import_counts_articles(self):
+        """
+        Test that imported articles are counted in their categories
+        """
+        rows = [{"type": "article", "title": "Imported",
+                 "url": "http://www.dummy.com", "category": self.news.id,
+                 "read_status": read_status}
+                for read_status in (False, False, True)]
+        response = self.client.post('/api/v2/import/', {
+            "file": SimpleUploadedFile("diary.ndjson", "\n".join(
+                json.dumps(row) for row in rows).encode("utf-8"))},
+            format='multipart')
+        b"".join(response.streaming_content)
+        self.assertCounts(self.news, 3, 2)
+
+    def test_recount_categories_repairs_drift(self):
+        """
+        Test that the recount command puts right counters that drifted
+        """
+        self.create_article(self.news)
+        self.create_article(self.news, read_status=True)
+        Category.objects.filter(pk=self.news.pk).update(article_count=7,
+                                                        unread_count=-1)
+        out = StringIO()
+        call_command('recount_categories', stdout=out)
+        self.assertIn("Checked 2 categories, repaired 1.", out.getvalue())
+        self.assertCounts(self.news, 2, 1)
+        self.assertCounts(self.blogs, 0, 0)
@@ -1,4 +1,7 @@
+import base64
 import json
+from unittest import mock
+from urllib.parse import urlencode
 
 from django.test import TestCase
 from rest_framework import status
@@ -6,6 +9,7 @@ from rest_framework.test import APIClient
 from django.contrib.auth.models import User
 
 from api.models import Entry
+from api.pagination import DiaryCursorPagination
 
 
 class ModelTestCase(TestCase):
@@ -79,6 +83,16 @@ class ViewTestCase(TestCase):
             '/api/v2/entries/', {"content": "I cannot be created"}, format="json")
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def test_api_lists_only_own_entries(self):
+        """
+        Test that the entries list does not include other users' entries
+        """
+        new_user = User.objects.create(username="another_nerd")
+        Entry.objects.create(content="Not yours", owner=new_user)
+        response = self.client.get('/api/v2/entries/')
+        contents = [entry["content"] for entry in response.data["results"]]
+        self.assertEqual(contents, [self.entry_data["content"]])
+
     def test_api_can_list_all_users(self):
         """
         Test that the API can return a list of all users
@@ -174,3 +188,90 @@ class ViewTestCase(TestCase):
         url = "/api/v2/entries/{}/".format(entry.id)
         response = self.client.delete(url, format="json")
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class PaginationTestCase(TestCase):
+    """
+    The test suite for the cursor pagination of the entries list
+    """
+
+    def setUp(self):
+        """
+        Define the test client and create a handful of entries
+        """
+        self.user = User.objects.create(username="pager")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for i in range(5):
+            Entry.objects.create(content="Entry {}".format(i), owner=self.user)
+
+    def fetch_all_pages(self, url):
+        """
+        Follow the next links from url and collect the ids of every page
+        """
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(entry["id"] for entry in response.data["results"])
+            url = response.data["next"]
+        return ids
+
+    def test_entries_are_paginated_newest_first(self):
+        """
+        Test that walking the cursors returns every entry once, newest first
+        """
+        ids = self.fetch_all_pages('/api/v2/entries/?page_size=2')
+        expected = list(Entry.objects.order_by(
+            "-date_created", "-id").values_list("id", flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_inserts_do_not_shift_later_pages(self):
+        """
+        Test that an entry created while paging does not repeat or skip rows
+        """
+        response = self.client.get('/api/v2/entries/?page_size=2')
+        first_page = [entry["id"] for entry in response.data["results"]]
+        Entry.objects.create(content="Written while paging", owner=self.user)
+        rest = self.fetch_all_pages(response.data["next"])
+        self.assertEqual(len(first_page + rest), 5)
+        self.assertEqual(len(set(first_page + rest)), 5)
+
+    def test_page_size_is_capped(self):
+        """
+        Test that a client cannot ask for more than the maximum page size
+        """
+        with mock.patch.object(DiaryCursorPagination, "max_page_size", 3):
+            response = self.client.get('/api/v2/entries/?page_size=100')
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_entries_sharing_a_date_are_paged_by_id(self):
+        """
+        Test that entries created at the same time are told apart by id, so
+        every one comes once both ways
+        """
+        Entry.objects.update(date_created=Entry.objects.first().date_created)
+        expected = list(Entry.objects.order_by("-id").values_list(
+            "id", flat=True))
+        self.assertEqual(self.fetch_all_pages('/api/v2/entries/?page_size=2'),
+                         expected)
+
+        response = self.client.get('/api/v2/entries/?page_size=2')
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+        back = []
+        while response.data["previous"]:
+            response = self.client.get(response.data["previous"])
+            back[:0] = [entry["id"] for entry in response.data["results"]]
+        self.assertEqual(back, expected[:4])
+
+    def test_tampered_cursor_is_refused(self):
+        """
+        Test that a cursor whose position does not fit the ordering is
+        refused with a 404
+        """
+        for position in ('"Same"', '[1]', '["not a date", 1]'):
+            cursor = base64.b64encode(
+                urlencode({'p': position}).encode()).decode()
+            response = self.client.get('/api/v2/entries/?cursor=' + cursor)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
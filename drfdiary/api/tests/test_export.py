@@ -0,0 +1,85 @@
+import json
+
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+
+from api.models import Entry, Category, Article
+
+
+@override_settings(API_EXPORT_CHUNK_SIZE=2)
+class ExportViewTestCase(TestCase):
+    """
+    This class defines the tests for the streaming diary export
+    """
+
+    def setUp(self):
+        """
+        Define the test client and a diary spanning several chunks
+        """
+        self.user = User.objects.create(username="exporter")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        category = Category.objects.create(name="Exported", owner=self.user)
+        for i in range(3):
+            Entry.objects.create(content="Entry {}".format(i),
+                                 owner=self.user)
+            Article.objects.create(title="Article {}".format(i),
+                                   url="http://www.dummy.com",
+                                   category=category, owner=self.user)
+        other = User.objects.create(username="another_nerd")
+        Entry.objects.create(content="Not exported", owner=other)
+
+    def export(self, **params):
+        response = self.client.get('/api/v2/export/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode("utf-8")
+
+    def test_ndjson_export(self):
+        """
+        Test that the export has one typed line per row of the user, with
+        categories before their articles
+        """
+        response, content = self.export()
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row["type"] for row in rows],
+                         ["category"] + ["entry"] * 3 + ["article"] * 3)
+        self.assertEqual([row["content"] for row in rows[1:4]],
+                         ["Entry 0", "Entry 1", "Entry 2"])
+        self.assertEqual(rows[4]["category"], rows[0]["id"])
+        self.assertEqual(list(rows[1]),
+                         ["type", "id", "content", "owner", "date_created",
+                          "date_modified"])
+
+    def test_json_export(self):
+        """
+        Test that the JSON export is a single object of lists
+        """
+        response, content = self.export(output="json")
+        self.assertEqual(response["Content-Type"], "application/json")
+        data = json.loads(content)
+        self.assertEqual(len(data["categories"]), 1)
+        self.assertEqual(len(data["entries"]), 3)
+        self.assertEqual(len(data["articles"]), 3)
+
+    def test_empty_json_export(self):
+        """
+        Test that a user without a diary still gets valid JSON
+        """
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create(username="new"))
+        response = client.get('/api/v2/export/', {"output": "json"})
+        content = b"".join(response.streaming_content).decode("utf-8")
+        self.assertEqual(json.loads(content),
+                         {"categories": [], "entries": [], "articles": []})
+
+    def test_unknown_output(self):
+        response = self.client.get('/api/v2/export/', {"output": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_requires_auth(self):
+        response = APIClient().get('/api/v2/export/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
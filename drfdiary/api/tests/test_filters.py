@@ -0,0 +1,194 @@
+import datetime
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+
+from api.models import Entry, Category, Article
+
+
+class FilterTestCase(TestCase):
+    """
+    This class defines the tests for the date, read status and domain
+    filters and the ordering of the lists
+    """
+
+    def setUp(self):
+        """
+        Define the test client and entries, categories and articles created
+        on three consecutive days
+        """
+        self.user = User.objects.create(username="filtered")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.day = datetime.datetime(2019, 3, 1, 12, tzinfo=timezone.utc)
+        for i in range(3):
+            date = self.day + datetime.timedelta(days=i)
+            entry = Entry.objects.create(content="Entry {}".format(i),
+                                         owner=self.user)
+            category = Category.objects.create(name="Category {}".format(i),
+                                               owner=self.user)
+            Entry.objects.filter(id=entry.id).update(
+                date_created=date, date_modified=date)
+            Category.objects.filter(id=category.id).update(
+                date_created=date, date_modified=date)
+        self.category = category
+        self.articles_url = '/api/v2/categories/{}/articles/'.format(
+            category.id)
+
+    def get(self, url):
+        """
+        Return the listed data and the SQL of the query reading the page
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, context.captured_queries[-1]['sql']
+
+    def create_article(self, title, url, read_status=False):
+        return Article.objects.create(title=title, url=url,
+                                      read_status=read_status,
+                                      category=self.category,
+                                      owner=self.user)
+
+    def test_created_after_and_before(self):
+        """
+        Test that entries can be listed between two dates, compared on the
+        indexed column
+        """
+        data, sql = self.get('/api/v2/entries/?created_after=2019-03-02'
+                             '&created_before=2019-03-03T12:00:00Z')
+        self.assertEqual([item["content"] for item in data["results"]],
+                         ["Entry 1"])
+        self.assertIn('"date_created" >=', sql)
+        self.assertIn('"date_created" <', sql)
+
+    def test_modified_since(self):
+        """
+        Test that categories can be listed from a date and time on
+        """
+        data, sql = self.get(
+            '/api/v2/categories/?modified_since=2019-03-02T12:00:00%2B00:00')
+        self.assertEqual([item["name"] for item in data["results"]],
+                         ["Category 2", "Category 1"])
+        self.assertIn('"date_modified" >=', sql)
+
+    def test_invalid_values_are_refused(self):
+        """
+        Test that values that cannot be parsed are refused rather than
+        ignored
+        """
+        response = self.client.get('/api/v2/entries/?created_after=yesterday'
+                                   '&modified_since=2019-02-30')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data),
+                         {"created_after", "modified_since"})
+        response = self.client.get(self.articles_url + '?read_status=maybe')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.articles_url + '?domain=%25.com')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_read_status(self):
+        """
+        Test that the unread articles of a category can be listed
+        """
+        self.create_article("Read", "http://example.com/", read_status=True)
+        self.create_article("Unread", "http://example.com/")
+        data, sql = self.get(self.articles_url + '?read_status=false')
+        self.assertEqual([item["title"] for item in data["results"]],
+                         ["Unread"])
+        self.assertIn('"read_status" =', sql)
+        data, sql = self.get(self.articles_url + '?read_status=true')
+        self.assertEqual([item["title"] for item in data["results"]],
+                         ["Read"])
+
+    def test_domain(self):
+        """
+        Test that the articles of a domain are matched on a prefix of their
+        URL, which an index can serve, rather than on a substring
+        """
+        for url in ("http://example.com", "https://example.com/a",
+                    "http://Example.com:8080/b", "https://example.com?c",
+                    "http://example.com.evil.org/", "http://notexample.com/",
+                    "http://www.example.com/"):
+            self.create_article(url, url.lower())
+        data, sql = self.get(self.articles_url + '?domain=Example.com')
+        self.assertEqual(
+            sorted(item["title"] for item in data["results"]),
+            ["http://Example.com:8080/b", "http://example.com",
+             "https://example.com/a", "https://example.com?c"])
+        self.assertIn('LIKE', sql)
+        self.assertNotIn('%example.com', sql)
+
+    def test_ordering(self):
+        """
+        Test that lists can be ordered by the allowed fields, page after
+        page
+        """
+        for title in ("b", "c", "a"):
+            self.create_article(title, "http://example.com/")
+        data, sql = self.get(self.articles_url + '?ordering=title')
+        self.assertEqual([item["title"] for item in data["results"]],
+                         ["a", "b", "c"])
+        self.assertIn('ORDER BY', sql)
+
+        titles = []
+        url = self.articles_url + '?ordering=-title&page_size=2'
+        while url:
+            data, sql = self.get(url)
+            titles.extend(item["title"] for item in data["results"])
+            url = data["next"]
+        self.assertEqual(titles, ["c", "b", "a"])
+
+        data, sql = self.get('/api/v2/categories/?ordering=date_created')
+        self.assertEqual([item["name"] for item in data["results"]],
+                         ["Category 0", "Category 1", "Category 2"])
+
+    def test_ordering_by_repeated_and_changed_values(self):
+        """
+        Test that paging over a column whose values repeat returns every row
+        once, both ways, and that a row changed while paging comes again at
+        its new place
+        """
+        articles = [self.create_article("Same", "http://example.com/")
+                    for i in range(5)]
+        url = self.articles_url + '?ordering=title&page_size=2'
+        data, sql = self.get(url)
+        ids = [item["id"] for item in data["results"]]
+        Article.objects.filter(id=ids[0]).update(title="Zebra")
+        while data["next"]:
+            data, sql = self.get(data["next"])
+            ids.extend(item["id"] for item in data["results"])
+        expected = sorted(article.id for article in articles)
+        self.assertEqual(ids, expected + expected[:1])
+
+        back = []
+        while data["previous"]:
+            data, sql = self.get(data["previous"])
+            back[:0] = [item["id"] for item in data["results"]]
+        self.assertEqual(back, expected[1:4])
+
+    def test_unknown_ordering_is_refused(self):
+        """
+        Test that ordering by a field that is not allowed is refused
+        """
+        for ordering in ("content", "owner__password", "-date_created,id,x"):
+            response = self.client.get(
+                '/api/v2/entries/?ordering=' + ordering)
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST)
+            self.assertIn("ordering", response.data)
+
+    def test_filters_with_search(self):
+        """
+        Test that the filters narrow down search results
+        """
+        data, sql = self.get('/api/v2/entries/?q=entry'
+                             '&created_after=2019-03-02')
+        self.assertEqual(
+            sorted(item["content"] for item in data["results"]),
+            ["Entry 1", "Entry 2"])
@@ -0,0 +1,167 @@
+import json
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+
+from api.importer import DiaryImporter
+from api.models import Entry, Category, Article, DailyStats
+
+
+@override_settings(API_IMPORT_BATCH_SIZE=2)
+class ImportViewTestCase(TestCase):
+    """
+    This class defines the tests for the streaming diary import
+    """
+
+    def setUp(self):
+        """
+        Define the test client and a user to import for
+        """
+        self.user = User.objects.create(username="importer")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, content, name="diary.ndjson", **params):
+        url = '/api/v2/import/'
+        if params:
+            url += '?' + '&'.join('{}={}'.format(*item)
+                                  for item in params.items())
+        response = self.client.post(url, {
+            "file": SimpleUploadedFile(name, content.encode("utf-8"))},
+            format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return [json.loads(line) for line in b"".join(
+            response.streaming_content).decode("utf-8").splitlines()]
+
+    def test_import_ndjson_export(self):
+        """
+        Test that an export imports again, with the articles moved to the
+        ids of the new categories
+        """
+        lines = [
+            {"type": "category", "id": 41, "name": "Imported"},
+            {"type": "entry", "id": 7, "content": "First entry"},
+            {"type": "entry", "id": 8, "content": "Second entry"},
+            {"type": "article", "title": "An article", "category": 41,
+             "url": "http://www.dummy.com", "read_status": True},
+        ]
+        reports = self.upload("\n".join(json.dumps(line) for line in lines))
+        self.assertEqual(reports[-1], {"done": {
+            "rows": 4, "created": 4, "skipped": 0, "failed": 0}})
+        self.assertEqual([report["progress"]["rows"]
+                          for report in reports[:-1]], [2, 4])
+
+        category = Category.objects.get(name="Imported")
+        self.assertEqual(category.owner, self.user)
+        self.assertEqual(Entry.objects.filter(owner=self.user).count(), 2)
+        self.assertEqual(DailyStats.objects.get(owner=self.user).entries, 2)
+        article = Article.objects.get(title="An article")
+        self.assertEqual(article.category, category)
+        self.assertTrue(article.read_status)
+
+    def test_import_reports_bad_rows(self):
+        """
+        Test that invalid and duplicate rows are reported and skipped
+        without stopping the import
+        """
+        other = User.objects.create(username="another_nerd")
+        Entry.objects.create(content="Taken", owner=other)
+        Category.objects.create(name="Elsewhere", owner=other)
+        content = "\n".join([
+            '{"type": "entry", "content": "Taken"}',
+            'not json',
+            '{"type": "entry", "content": "Fresh"}',
+            '{"type": "entry", "content": "Fresh"}',
+            '{"type": "comment", "content": "?"}',
+            '{"type": "category", "id": 3, "name": "Elsewhere"}',
+            '{"type": "article", "title": "Lost", "category": 3, '
+            '"url": "http://www.dummy.com"}',
+            '{"type": "article", "title": "No url", "category": 3}',
+        ])
+        reports = self.upload(content)
+        rows = dict((report["row"], report) for report in reports
+                    if "row" in report)
+        self.assertEqual(sorted(rows), [1, 2, 4, 5, 6, 7, 8])
+        self.assertIn("skipped", rows[1])
+        self.assertIn("non_field_errors", rows[2]["errors"])
+        self.assertIn("skipped", rows[4])
+        self.assertIn("type", rows[5]["errors"])
+        self.assertIn("skipped", rows[6])
+        self.assertIn("category", rows[7]["errors"])
+        self.assertEqual(reports[-1], {"done": {
+            "rows": 8, "created": 1, "skipped": 3, "failed": 4}})
+        self.assertEqual(list(Entry.objects.filter(owner=self.user)
+                              .values_list("content", flat=True)), ["Fresh"])
+
+    def test_malformed_rows_are_reported(self):
+        """
+        Test that rows whose type or fields are of the wrong kind are
+        reported without stopping the import
+        """
+        content = "\n".join([
+            '{"type": ["entry"], "content": "Listed"}',
+            '{"type": "category", "id": 3, "name": {"a": 1}}',
+            '{"type": "article", "title": "Orphan", "category": 3, '
+            '"url": "http://www.dummy.com"}',
+            '{"type": "entry", "content": "Kept"}',
+        ])
+        reports = self.upload(content)
+        rows = dict((report["row"], report) for report in reports
+                    if "row" in report)
+        self.assertIn("type", rows[1]["errors"])
+        self.assertIn("name", rows[2]["errors"])
+        self.assertIn("category", rows[3]["errors"])
+        self.assertEqual(reports[-1], {"done": {
+            "rows": 4, "created": 1, "skipped": 0, "failed": 3}})
+        self.assertTrue(Entry.objects.filter(content="Kept").exists())
+
+    def test_rows_that_lost_a_race_are_not_counted(self):
+        """
+        Test that rows whose unique value was taken after the duplicates
+        were dropped are neither counted as created nor in the statistics
+        """
+        Entry.objects.create(content="Raced", owner=self.user)
+        Category.objects.create(name="Raced", owner=self.user)
+
+        def keep_all(importer, *args):
+            return iter(())
+
+        content = "\n".join([
+            '{"type": "entry", "content": "Raced"}',
+            '{"type": "entry", "content": "Won"}',
+            '{"type": "category", "name": "Raced"}',
+        ])
+        with mock.patch.object(DiaryImporter, 'drop_duplicates', keep_all):
+            reports = self.upload(content)
+        self.assertEqual(reports[-1]["done"]["created"], 1)
+        self.assertEqual(Entry.objects.filter(owner=self.user).count(), 2)
+        self.assertEqual(DailyStats.objects.get(owner=self.user).entries, 2)
+
+    def test_import_csv(self):
+        """
+        Test that a CSV file of articles imports into an own category
+        """
+        category = Category.objects.create(name="Reading", owner=self.user)
+        content = ("title,url,read_status,category\n"
+                   "One,http://www.dummy.com,true,{0}\n"
+                   "\"Two, quoted\",http://www.dummy.com,,{0}\n".format(
+                       category.pk))
+        reports = self.upload(content, name="articles.csv",
+                              input="csv", type="article")
+        self.assertEqual(reports[-1]["done"]["created"], 2)
+        self.assertEqual(
+            list(Article.objects.filter(category=category).order_by(
+                "title").values_list("title", "read_status")),
+            [("One", True), ("Two, quoted", False)])
+
+    def test_import_needs_a_file(self):
+        """
+        Test that a request without a file is rejected
+        """
+        response = self.client.post('/api/v2/import/', {}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
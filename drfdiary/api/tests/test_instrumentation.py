@@ -0,0 +1,99 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+
+from api.instrumentation import Histogram
+from api.models import Entry
+
+
+class InstrumentationMiddlewareTestCase(TestCase):
+    """
+    This class defines the tests for the per-request instrumentation
+    """
+
+    def setUp(self):
+        """
+        Define the test client and an entry to list
+        """
+        cache.clear()
+        self.user = User.objects.create(username="nerd")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        Entry.objects.create(content="Measured", owner=self.user)
+
+    def test_server_timing_header(self):
+        """
+        Test that a response says where its time went
+        """
+        response = self.client.get('/api/v2/entries/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = response["Server-Timing"]
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="2 queries"', timing)
+        for name in ("serialize;dur=", "render;dur=", "total;dur="):
+            self.assertIn(name, timing)
+
+    @override_settings(API_SERVER_TIMING=False)
+    def test_server_timing_can_be_turned_off(self):
+        response = self.client.get('/api/v2/entries/')
+        self.assertFalse(response.has_header("Server-Timing"))
+
+    def test_metrics_are_scraped_by_staff(self):
+        """
+        Test that the metrics endpoint serves the histograms of each view
+        to staff users only
+        """
+        self.client.get('/api/v2/entries/')
+        response = self.client.get('/api/v2/metrics/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/api/v2/metrics/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        metrics = response.content.decode("utf-8")
+        self.assertIn("# TYPE drfdiary_request_duration_seconds histogram",
+                      metrics)
+        self.assertIn('drfdiary_request_db_queries_bucket{view="create",'
+                      'method="GET",le="+Inf"}', metrics)
+        self.assertIn('drfdiary_requests_total{view="create",method="GET",'
+                      'status="200"}', metrics)
+
+    def test_unknown_methods_share_their_labels(self):
+        """
+        Test that requests with methods of the client's making are counted
+        together rather than each under labels of their own
+        """
+        for method in ('BREW', 'WHEN'):
+            self.client.generic(method, '/api/v2/entries/')
+        self.user.is_staff = True
+        self.user.save()
+        metrics = self.client.get('/api/v2/metrics/').content.decode("utf-8")
+        self.assertNotIn('method="BREW"', metrics)
+        self.assertIn('drfdiary_requests_total{view="create",method="other",'
+                      'status="405"}', metrics)
+
+    @override_settings(API_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertLogs("api.slow_requests", "WARNING") as logs:
+            self.client.get('/api/v2/entries/')
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("GET /api/v2/entries/ (create)", logs.output[0])
+        self.assertIn('FROM "api_entry"', logs.output[0])
+
+
+class HistogramTestCase(TestCase):
+    """
+    This class defines the tests for the histogram buckets
+    """
+
+    def test_cumulative_counts(self):
+        histogram = Histogram((1, 5))
+        for value in (0, 1, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(list(histogram.cumulative()),
+                         [(1, 2), (5, 3), ('+Inf', 4)])
+        self.assertEqual((histogram.sum, histogram.count), (14, 4))
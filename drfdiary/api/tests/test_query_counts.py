@@ -0,0 +1,120 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+
+from api.models import Entry, Category, Article
+
+
+class QueryCountTestCase(TestCase):
+    """
+    This class checks that every endpoint runs a fixed number of queries no
+    matter how many rows it returns.
+    """
+
+    def setUp(self):
+        """
+        Define the test client and a category to hold articles
+        """
+        self.user = User.objects.create(username="counter")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.category = Category.objects.create(name="Counted",
+                                                owner=self.user)
+
+    def create_rows(self, count):
+        """
+        Create count more entries, categories and articles for the user
+        """
+        start = Entry.objects.count()
+        for i in range(start, start + count):
+            Entry.objects.create(content="Entry {}".format(i),
+                                 owner=self.user)
+            Category.objects.create(name="Category {}".format(i),
+                                    owner=self.user)
+            Article.objects.create(title="Article {}".format(i),
+                                   url="http://www.dummy.com",
+                                   category=self.category,
+                                   owner=self.user)
+
+    def count_queries(self, url):
+        """
+        Return the number of queries a GET to url runs
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def assertFixedQueries(self, url, expected):
+        """
+        Assert url runs expected queries with both a few and many rows. A
+        list costs the query behind its ETag and the query for the page.
+        """
+        self.create_rows(1)
+        self.assertEqual(self.count_queries(url), expected)
+        self.create_rows(10)
+        self.assertEqual(self.count_queries(url), expected)
+
+    def test_entry_list_queries(self):
+        self.assertFixedQueries('/api/v2/entries/', 2)
+
+    def test_entry_detail_queries(self):
+        entry = Entry.objects.create(content="Detail", owner=self.user)
+        self.assertFixedQueries('/api/v2/entries/{}/'.format(entry.id), 1)
+
+    def test_category_list_queries(self):
+        self.assertFixedQueries('/api/v2/categories/', 2)
+
+    def test_category_detail_queries(self):
+        self.assertFixedQueries(
+            '/api/v2/categories/{}/'.format(self.category.id), 1)
+
+    def test_article_list_queries(self):
+        self.assertFixedQueries(
+            '/api/v2/categories/{}/articles/'.format(self.category.id), 2)
+
+    def test_article_create_queries(self):
+        """
+        Test that creating an article checks the category in one query, and
+        updates the counters of the category in another and the statistics
+        of the day, once the first article of the day created their rows, in
+        two more
+        """
+        url = '/api/v2/categories/{}/articles/'.format(self.category.id)
+        data = {"title": "Counted", "url": "http://www.dummy.com"}
+        self.client.post(url, data, format="json")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(context.captured_queries), 5)
+
+    def test_mark_read_queries(self):
+        """
+        Test that marking a category's articles as read takes the same
+        queries however many articles change: one UPDATE grouping the
+        articles it changed, one for the counters of the category and two
+        for the statistics of the day, within the savepoint of the
+        transaction. Other databases than Postgres group them first.
+        """
+        counts = []
+        for count in (1, 10):
+            self.create_rows(count)
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(
+                    '/api/v2/articles/read/', {"category": self.category.id},
+                    format="json")
+            self.assertEqual(response.data, {"updated": count})
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts, [6, 6] if connection.vendor == 'postgresql'
+                         else [7, 7])
+
+    def test_article_detail_queries(self):
+        article = Article.objects.create(title="Detail",
+                                         url="http://www.dummy.com",
+                                         category=self.category,
+                                         owner=self.user)
+        self.assertFixedQueries('/api/v2/categories/{}/articles/{}/'.format(
+            self.category.id, article.id), 1)
@@ -0,0 +1,177 @@
+import datetime
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth.models import User
+
+from api.filters import DATE_FILTERS, DomainFilter
+from api.models import Entry, Category, Article, Tombstone, DailyStats, \
+    CategoryDailyStats
+from api.pagination import after_position
+from api.search import PostgresSearchBackend
+from api.sync import after
+
+
+@skipUnless(connection.vendor == 'postgresql', "Query plans need Postgres")
+class QueryPlanTestCase(TestCase):
+    """
+    This class checks that the hot list queries are served by the composite
+    indexes rather than by sequential scans.
+    """
+
+    def setUp(self):
+        """
+        Create a little data and stop the planner from picking sequential
+        scans and sorts just because the tables are tiny, so that the plan
+        shows which index can serve both the filter and the ordering
+        """
+        self.user = User.objects.create(username="planner")
+        self.category = Category.objects.create(name="Plans", owner=self.user)
+        with connection.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
+            cursor.execute("SET enable_sort = off")
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute("RESET enable_seqscan")
+            cursor.execute("RESET enable_sort")
+
+    def assertUsesIndex(self, queryset, index_name):
+        """
+        Assert the plan of queryset uses index_name and no sequential scan
+        """
+        plan = queryset.explain()
+        self.assertNotIn("Seq Scan", plan)
+        self.assertIn(index_name, plan)
+
+    def test_entry_list_uses_index(self):
+        """
+        Test that a page of a user's entries is read from the owner index
+        """
+        queryset = Entry.objects.owned_by(self.user).order_by(
+            "-date_created", "-id")[:50]
+        self.assertUsesIndex(queryset, "entry_owner_created_idx")
+
+    def test_entry_page_after_cursor_uses_index(self):
+        """
+        Test that a later page starts in the owner index at the position of
+        its cursor rather than filtering every row before it
+        """
+        queryset = Entry.objects.owned_by(self.user).filter(after_position(
+            ("-date_created", "-id"), [str(timezone.now()), 1])).order_by(
+                "-date_created", "-id")[:50]
+        self.assertUsesIndex(queryset, "entry_owner_created_idx")
+        self.assertRegex(queryset.explain(),
+                         r"Index Cond: .*date_created <=")
+
+    def test_category_list_uses_index(self):
+        """
+        Test that a page of a user's categories is read from the owner index
+        """
+        queryset = Category.objects.owned_by(self.user).order_by(
+            "-date_created", "-id")[:50]
+        self.assertUsesIndex(queryset, "category_owner_created_idx")
+
+    def test_article_list_uses_index(self):
+        """
+        Test that a page of the articles in a category uses the owner index
+        """
+        queryset = Article.objects.owned_by(self.user).filter(
+            category=self.category).order_by("-date_created", "-id")[:50]
+        self.assertUsesIndex(queryset, "article_owner_cat_created_idx")
+
+    def test_sync_uses_indexes(self):
+        """
+        Test that the changes and deletions past a sync token are read from
+        the change indexes
+        """
+        position = (0, 0)
+        for model, index_name in ((Entry, "entry_owner_change_idx"),
+                                  (Category, "category_owner_change_idx"),
+                                  (Article, "article_owner_change_idx"),
+                                  (Tombstone, "tombstone_owner_change_idx")):
+            queryset = model.objects.owned_by(self.user).filter(
+                after("change_seq", position)).order_by(
+                    "change_seq", "id")[:501]
+            self.assertUsesIndex(queryset, index_name)
+
+    def test_unread_articles_use_index(self):
+        """
+        Test that counting the unread articles in a category uses the index
+        over owner, category and read status, once the user has read many
+        other articles there
+        """
+        Article.objects.bulk_create(
+            Article(title="Read", url="http://read{}.org/".format(i),
+                    read_status=True, category=self.category,
+                    owner=self.user)
+            for i in range(1000))
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE api_article")
+        queryset = Article.objects.owned_by(self.user).filter(
+            category=self.category, read_status=False)
+        self.assertUsesIndex(queryset, "article_owner_cat_read_idx")
+
+    def test_date_filters_use_indexes(self):
+        """
+        Test that the date filters are range conditions on the owner indexes
+        """
+        for param, index_name in (("created_after", "entry_owner_created_idx"),
+                                  ("modified_since",
+                                   "entry_owner_modified_idx")):
+            query_filter = DATE_FILTERS[param]
+            queryset = Entry.objects.owned_by(self.user).filter(
+                query_filter.get_condition(timezone.now())).order_by(
+                    "-" + query_filter.field, "-id")[:50]
+            self.assertUsesIndex(queryset, index_name)
+
+    def test_domain_filter_uses_index(self):
+        """
+        Test that the domain filter is served by the URL pattern index,
+        with the prefixes as index conditions, once the user has articles
+        on many other domains
+        """
+        Article.objects.bulk_create(
+            Article(title="Other", url="http://other{}.org/".format(i),
+                    category=self.category, owner=self.user)
+            for i in range(1000))
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE api_article")
+        queryset = Article.objects.owned_by(self.user).filter(
+            DomainFilter("url").get_condition("example.com"),
+            category=self.category)
+        self.assertUsesIndex(queryset, "article_owner_cat_url_idx")
+        self.assertIn("~>=~", queryset.explain())
+
+    def test_stats_use_indexes(self):
+        """
+        Test that the statistics of a period are read from the day indexes
+        of the rollups, once the user has statistics of many other days
+        """
+        today = timezone.localdate()
+        CategoryDailyStats.objects.bulk_create(
+            CategoryDailyStats(owner=self.user, category=self.category,
+                               day=today - datetime.timedelta(days=i),
+                               articles=1)
+            for i in range(1, 1001))
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE api_categorydailystats")
+        period = (today, today)
+        self.assertUsesIndex(
+            DailyStats.objects.owned_by(self.user).filter(
+                day__range=period).order_by("day"),
+            "dailystats_owner_day_uniq")
+        self.assertUsesIndex(
+            CategoryDailyStats.objects.owned_by(self.user).filter(
+                day__range=period),
+            "categorystats_owner_day_idx")
+
+    def test_entry_search_uses_index(self):
+        """
+        Test that a full-text search of entries can use the GIN index
+        """
+        queryset = PostgresSearchBackend().search(Entry.objects.all(),
+                                                  "diary")
+        self.assertUsesIndex(queryset, "entry_search_idx")
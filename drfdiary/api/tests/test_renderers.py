@@ -0,0 +1,212 @@
+import datetime
+import gzip
+import json
+import unittest
+from collections import OrderedDict
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import status
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+
+from api import compression, renderers
+from api.compression import choose_encoding
+from api.models import Entry
+from api.renderers import FastJSONRenderer
+
+
+BACKENDS = [name for name, module in (('orjson', renderers.orjson),
+                                      ('ujson', renderers.ujson),
+                                      ('json', json)) if module]
+
+
+class FastJSONRendererTestCase(TestCase):
+    """
+    This class checks that the fast JSON renderer and parser give the same
+    results as DRF's with every JSON library installed
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username="renderer")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_same_output_as_json_renderer(self):
+        """
+        Test that each library renders the same bytes as JSONRenderer
+        """
+        data = OrderedDict([
+            ("id", 1), ("content", "Caf\u00e9 \u2028 </script>"),
+            ("read", True), ("nothing", None), ("ratio", 0.5),
+            ("errors", [ErrorDetail("Bad", code="invalid")]),
+            ("lazy", gettext_lazy("This field is required.")),
+            ("date", datetime.datetime(2019, 1, 2, 3, 4, 5,
+                                       tzinfo=timezone.utc)),
+        ])
+        expected = JSONRenderer().render(data)
+        for backend in BACKENDS:
+            with self.subTest(backend=backend), \
+                    override_settings(API_JSON_BACKEND=backend):
+                self.assertEqual(FastJSONRenderer().render(data), expected)
+
+    def test_indented_output(self):
+        """
+        Test that indented output is left to JSONRenderer
+        """
+        data = {"id": 1}
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'))
+
+    def test_parse_requests(self):
+        """
+        Test that each library parses request bodies, refusing bad JSON
+        """
+        for backend in BACKENDS:
+            with self.subTest(backend=backend), \
+                    override_settings(API_JSON_BACKEND=backend):
+                response = self.client.post(
+                    '/api/v2/entries/',
+                    json.dumps({"content": "Parsed by " + backend}),
+                    content_type='application/json')
+                self.assertEqual(response.status_code,
+                                 status.HTTP_201_CREATED)
+                response = self.client.post(
+                    '/api/v2/entries/', '{"content": ',
+                    content_type='application/json')
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Entry.objects.count(), len(BACKENDS))
+
+    @override_settings(API_JSON_BACKEND='simdjson')
+    def test_missing_backend(self):
+        """
+        Test that naming a library that is not installed is refused
+        """
+        with self.assertRaises(ImproperlyConfigured):
+            FastJSONRenderer().render({"id": 1})
+
+    def test_default_backend(self):
+        """
+        Test that ujson is only used when named, even when installed
+        """
+        with mock.patch.object(renderers, 'orjson', None), \
+                mock.patch.object(renderers, 'ujson', object()):
+            self.assertEqual(renderers.get_json_backend(), 'json')
+            with override_settings(API_JSON_BACKEND='ujson'):
+                self.assertEqual(renderers.get_json_backend(), 'ujson')
+
+    @unittest.skipUnless(renderers.msgpack, "msgpack is not installed")
+    def test_messagepack(self):
+        """
+        Test that clients asking for MessagePack get the same data in it
+        """
+        Entry.objects.create(content="Packed", owner=self.user)
+        response = self.client.get('/api/v2/entries/',
+                                   HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(
+            renderers.msgpack.unpackb(response.content, raw=False),
+            json.loads(self.client.get('/api/v2/entries/').content))
+
+
+@override_settings(API_COMPRESSION_MIN_BYTES=1024)
+class CompressionTestCase(TestCase):
+    """
+    This class defines the tests for compressing responses
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username="compressed")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for i in range(30):
+            Entry.objects.create(content="Compressed entry {}".format(i),
+                                 owner=self.user)
+
+    def test_choose_encoding(self):
+        """
+        Test that the encoding follows the qualities the client gives
+        """
+        self.assertEqual(choose_encoding("gzip, deflate"), "gzip")
+        self.assertEqual(choose_encoding("gzip;q=0, deflate"), None)
+        self.assertEqual(choose_encoding("identity"), None)
+        self.assertEqual(choose_encoding("*"), compression.get_encodings()[0])
+        with override_settings(API_COMPRESSION_ENCODINGS=('gzip',)):
+            self.assertEqual(choose_encoding("br, gzip"), "gzip")
+
+    def test_gzip_list(self):
+        """
+        Test that a large list is gzipped for a client accepting gzip, with
+        a strong ETag of its own that conditional requests still match
+        """
+        plain = self.client.get('/api/v2/entries/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get('/api/v2/entries/',
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response['ETag'], plain['ETag'][:-1] + '-gzip"')
+
+        etag = response['ETag']
+        response = self.client.get('/api/v2/entries/',
+                                   HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        response = self.client.get('/api/v2/entries/',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get('/api/v2/entries/',
+                                   HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=plain['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], plain['ETag'])
+
+    @unittest.skipUnless(compression.brotli, "brotli is not installed")
+    def test_brotli_preferred(self):
+        """
+        Test that brotli is preferred to gzip when the client takes both
+        """
+        plain = self.client.get('/api/v2/entries/')
+        response = self.client.get('/api/v2/entries/',
+                                   HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content),
+                         plain.content)
+
+    def test_small_responses_are_left_alone(self):
+        """
+        Test that responses under the threshold are not compressed
+        """
+        entry = Entry.objects.first()
+        response = self.client.get('/api/v2/entries/{}/'.format(entry.id),
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(
+            response['ETag'],
+            self.client.get('/api/v2/entries/{}/'.format(entry.id))['ETag'])
+
+    def test_streamed_export(self):
+        """
+        Test that a streamed response is compressed chunk by chunk
+        """
+        plain = b"".join(self.client.get('/api/v2/export/').streaming_content)
+        response = self.client.get('/api/v2/export/',
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            gzip.decompress(b"".join(response.streaming_content)), plain)
@@ -0,0 +1,134 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+
+from api.models import Entry, Category
+
+
+class SearchTestMixin(object):
+    """
+    The search tests, run once for each search backend
+    """
+
+    def setUp(self):
+        """
+        Define the test client with a few entries and articles to search
+        """
+        cache.clear()
+        self.user = User.objects.create(username="searcher")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for content in ("Walked the dog in the park",
+                        "Rainy day, stayed inside",
+                        "The dog chased a cat"):
+            Entry.objects.create(content=content, owner=self.user)
+        self.category = Category.objects.create(name="Reading",
+                                                owner=self.user)
+        self.articles_url = '/api/v2/categories/{}/articles/'.format(
+            self.category.id)
+        self.client.post(self.articles_url + 'bulk/', [
+            {"title": "Python tips", "url": "http://example.com/a"},
+            {"title": "Cooking", "description": "Python free recipes",
+             "url": "http://example.com/b"},
+            {"title": "Gardening", "url": "http://example.com/c"},
+        ], format="json")
+
+    def search(self, url, query):
+        response = self.client.get(url, {"q": query})
+        return [row.get("content") or row.get("title")
+                for row in response.data["results"]]
+
+    def test_search_entries(self):
+        """
+        Test that ?q= returns only the matching entries
+        """
+        self.assertEqual(sorted(self.search('/api/v2/entries/', "dog")),
+                         ["The dog chased a cat",
+                          "Walked the dog in the park"])
+        self.assertEqual(self.search('/api/v2/entries/', "dog park"),
+                         ["Walked the dog in the park"])
+
+    def test_search_articles(self):
+        """
+        Test that articles are searched over title and description
+        """
+        self.assertEqual(sorted(self.search(self.articles_url, "python")),
+                         ["Cooking", "Python tips"])
+
+    def test_search_is_scoped_to_the_user(self):
+        """
+        Test that other users' entries never match
+        """
+        other = User.objects.create(username="another_nerd")
+        Entry.objects.create(content="Another dog", owner=other)
+        self.assertEqual(len(self.search('/api/v2/entries/', "dog")), 2)
+
+    def test_updates_are_searchable(self):
+        """
+        Test that an updated entry is found by its new content only
+        """
+        entry = Entry.objects.get(content="Rainy day, stayed inside")
+        self.client.put('/api/v2/entries/{}/'.format(entry.id),
+                        {"content": "Sunny day, went hiking"},
+                        format="json")
+        self.assertEqual(self.search('/api/v2/entries/', "hiking"),
+                         ["Sunny day, went hiking"])
+        self.assertEqual(self.search('/api/v2/entries/', "rainy"), [])
+
+    def test_search_results_are_paginated(self):
+        """
+        Test that the cursor pagination walks the search results
+        """
+        response = self.client.get('/api/v2/entries/',
+                                   {"q": "dog", "page_size": 1})
+        self.assertEqual(len(response.data["results"]), 1)
+        response = self.client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNone(response.data["next"])
+
+
+@skipUnless(connection.vendor == 'postgresql', "Full-text search needs "
+                                               "Postgres")
+class PostgresSearchTestCase(SearchTestMixin, TestCase):
+    """
+    This class runs the search tests against the Postgres search backend
+    """
+
+    def test_matches_are_ranked(self):
+        """
+        Test that a match in the title ranks above one in the description
+        """
+        self.assertEqual(self.search(self.articles_url, "python"),
+                         ["Python tips", "Cooking"])
+
+    def test_words_are_stemmed(self):
+        """
+        Test that searching matches other forms of the same word
+        """
+        self.assertEqual(self.search('/api/v2/entries/', "walking"),
+                         ["Walked the dog in the park"])
+
+    def test_rebuild_search_vectors(self):
+        """
+        Test that the management command restores lost search vectors
+        """
+        Entry.objects.update(search_vector=None)
+        self.assertEqual(self.search('/api/v2/entries/', "rainy"), [])
+        call_command('rebuild_search_vectors', stdout=StringIO())
+        cache.clear()
+        self.assertEqual(self.search('/api/v2/entries/', "rainy"),
+                         ["Rainy day, stayed inside"])
+
+
+@override_settings(API_SEARCH_BACKEND='api.search.SimpleSearchBackend')
+class SimpleSearchTestCase(SearchTestMixin, TestCase):
+    """
+    This class runs the search tests against the fallback search backend
+    used on databases without full-text search
+    """
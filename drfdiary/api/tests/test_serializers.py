@@ -0,0 +1,48 @@
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+from django.contrib.auth.models import User
+
+from api.models import Entry, Category, Article
+from api.serializers import EntrySerializer, CategorySerializer, \
+    ArticleSerializer, get_values_serializer
+
+
+class ValuesSerializerTestCase(TestCase):
+    """
+    This class checks that the values serializers render exactly what the
+    model serializers do
+    """
+
+    def setUp(self):
+        """
+        Create rows of each kind, including empty and null values
+        """
+        user = User.objects.create(username="values")
+        category = Category.objects.create(name="Values", owner=user)
+        Category.objects.create(name="Described", description="Some text",
+                                owner=user)
+        Entry.objects.create(content="Dear Diary", owner=user)
+        Entry.objects.create(content=u"Unicode été", owner=user)
+        Article.objects.create(title="Read", url="http://www.dummy.com",
+                               read_status=True, category=category,
+                               owner=user)
+        Article.objects.create(title="Orphan", url="http://www.dummy.com",
+                               description="No category", owner=user)
+
+    def assertSameOutput(self, serializer_class):
+        queryset = serializer_class.Meta.model.objects.order_by('id')
+        expected = JSONRenderer().render(
+            serializer_class(queryset, many=True).data)
+        values_serializer = get_values_serializer(serializer_class)
+        rows = queryset.values(*values_serializer.columns)
+        self.assertEqual(JSONRenderer().render(
+            values_serializer.to_representation(rows)), expected)
+
+    def test_entries(self):
+        self.assertSameOutput(EntrySerializer)
+
+    def test_categories(self):
+        self.assertSameOutput(CategorySerializer)
+
+    def test_articles(self):
+        self.assertSameOutput(ArticleSerializer)
@@ -0,0 +1,109 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+
+from api.models import Entry, Category, Article
+
+
+class SparseFieldsTestCase(TestCase):
+    """
+    This class defines the tests for picking the fields of the output with
+    ?fields= and ?exclude=, and for compact lists
+    """
+
+    def setUp(self):
+        """
+        Define the test client and a few entries and articles
+        """
+        self.user = User.objects.create(username="sparse")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.category = Category.objects.create(name="Sparse",
+                                                owner=self.user)
+        for i in range(3):
+            Entry.objects.create(content="Entry {}".format(i),
+                                 owner=self.user)
+            Article.objects.create(title="Article {}".format(i),
+                                   url="http://www.dummy.com",
+                                   category=self.category, owner=self.user)
+        self.articles_url = '/api/v2/categories/{}/articles/'.format(
+            self.category.id)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_list_fields_are_read_alone(self):
+        """
+        Test that a list with ?fields= outputs only those fields and does
+        not read the columns of the others
+        """
+        with CaptureQueriesContext(connection) as context:
+            data = self.get('/api/v2/entries/?fields=id,content')
+        self.assertEqual([list(item) for item in data["results"]],
+                         [["id", "content"]] * 3)
+        self.assertEqual([item["content"] for item in data["results"]],
+                         ["Entry 2", "Entry 1", "Entry 0"])
+        page_query = context.captured_queries[-1]['sql']
+        self.assertNotIn('"date_modified"', page_query)
+        self.assertNotIn('auth_user', page_query)
+
+    def test_list_exclude(self):
+        """
+        Test that ?exclude= leaves the given fields out
+        """
+        data = self.get(self.articles_url +
+                        '?exclude=description,owner,date_modified')
+        self.assertEqual(list(data["results"][0]),
+                         ["id", "title", "url", "category", "read_status",
+                          "date_created"])
+
+    def test_unknown_fields_are_refused(self):
+        """
+        Test that a field the serializer does not have is refused
+        """
+        response = self.client.get('/api/v2/entries/?fields=id,secret')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data,
+                         {"fields": ["Unknown fields: secret."]})
+
+    def test_compact_list_pages(self):
+        """
+        Test that a compact list has a header row followed by arrays, and
+        can be paged through without the ordering fields
+        """
+        url = self.articles_url + '?fields=id,title&compact=true&page_size=2'
+        data = self.get(url)
+        self.assertEqual(data["results"], [
+            ["id", "title"],
+            [self.category.category.get(title="Article 2").id, "Article 2"],
+            [self.category.category.get(title="Article 1").id, "Article 1"],
+        ])
+        data = self.get(data["next"])
+        self.assertEqual([row[1] for row in data["results"][1:]],
+                         ["Article 0"])
+
+    def test_detail_and_user_fields(self):
+        """
+        Test that detail views and the users list pick fields too
+        """
+        data = self.get('/api/v2/categories/{}/?fields=id,unread_count'
+                        .format(self.category.id))
+        self.assertEqual(data, {"id": self.category.id, "unread_count": 3})
+        data = self.get('/api/v2/users/?fields=username')
+        self.assertEqual(data, [{"username": "sparse"}])
+
+    def test_writes_use_every_field(self):
+        """
+        Test that the fields picked do not change what a write saves or
+        returns
+        """
+        response = self.client.post('/api/v2/entries/?fields=id',
+                                    {"content": "Written"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["content"], "Written")
+        self.assertIn("date_created", response.data)
@@ -0,0 +1,238 @@
+import datetime
+import json
+from io import StringIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+
+from api.models import Entry, Category, Article, DailyStats, \
+    CategoryDailyStats
+
+
+# Friday 1 March 2019, noon
+FRIDAY = datetime.datetime(2019, 3, 1, 12, tzinfo=timezone.utc)
+
+
+def on_day(days):
+    """
+    Return a patch of the clock to the given number of days after FRIDAY
+    """
+    return mock.patch('django.utils.timezone.now', return_value=FRIDAY +
+                      datetime.timedelta(days=days))
+
+
+class DailyStatsTestCase(TestCase):
+    """
+    This class defines the tests for the daily statistics and the endpoint
+    reporting them
+    """
+
+    def setUp(self):
+        """
+        Define the test client and two categories to add articles to
+        """
+        self.user = User.objects.create(username="statistician")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.news = Category.objects.create(name="News", owner=self.user)
+        self.blogs = Category.objects.create(name="Blogs", owner=self.user)
+
+    def create_entry(self, days, content):
+        with on_day(days):
+            return Entry.objects.create(content=content, owner=self.user)
+
+    def create_article(self, days, category, read_status=False):
+        with on_day(days):
+            return Article.objects.create(title="Article",
+                                          url="http://www.dummy.com",
+                                          read_status=read_status,
+                                          category=category, owner=self.user)
+
+    def day_stats(self):
+        return dict((day, (entries, articles, read))
+                    for day, entries, articles, read in
+                    DailyStats.objects.values_list(
+                        'day', 'entries', 'articles', 'read'))
+
+    def category_stats(self):
+        return dict(((category_id, day), (articles, read))
+                    for category_id, day, articles, read in
+                    CategoryDailyStats.objects.values_list(
+                        'category_id', 'day', 'articles', 'read'))
+
+    def stats(self, query):
+        response = self.client.get('/api/v2/stats/' + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return json.loads(response.content)
+
+    def test_stats_follow_changes(self):
+        """
+        Test that creating, reading, moving and deleting entries and
+        articles changes the statistics of the day they were created
+        """
+        day = FRIDAY.date()
+        entry = self.create_entry(0, "First")
+        article = self.create_article(0, self.news)
+        self.create_article(0, self.news, read_status=True)
+        self.assertEqual(self.day_stats(), {day: (1, 2, 1)})
+        self.assertEqual(self.category_stats(), {(self.news.id, day): (2, 1)})
+
+        with on_day(3):
+            article.read_status = True
+            article.category = self.blogs
+            article.save()
+            entry.delete()
+        self.assertEqual(self.day_stats(), {day: (0, 2, 2)})
+        self.assertEqual(self.category_stats(), {
+            (self.news.id, day): (1, 1), (self.blogs.id, day): (1, 1)})
+
+        article.delete()
+        self.blogs.delete()
+        self.assertEqual(self.day_stats(), {day: (0, 1, 1)})
+        self.assertEqual(self.category_stats(), {(self.news.id, day): (1, 1)})
+
+    def test_views_update_stats(self):
+        """
+        Test that the bulk views and marking articles as read update the
+        statistics
+        """
+        url = '/api/v2/categories/{}/articles/bulk/'.format(self.news.id)
+        response = self.client.post(url, [
+            {"title": "Bulk", "url": "http://www.dummy.com"}] * 3,
+            format="json")
+        ids = [item["id"] for item in response.data]
+        self.client.post('/api/v2/articles/read/', {"ids": ids[:2]},
+                         format="json")
+        self.client.patch(url, [{"id": ids[0], "read_status": False}],
+                          format="json")
+        self.client.delete(url, [{"id": ids[2]}], format="json")
+        day = timezone.localdate()
+        self.assertEqual(self.day_stats(), {day: (0, 2, 1)})
+        self.assertEqual(self.category_stats(), {(self.news.id, day): (2, 1)})
+
+    def test_mark_read_groups_by_day(self):
+        """
+        Test that marking articles of several days and categories as read
+        adds to the statistics of each day and category the articles read
+        """
+        for days, category in ((0, self.news), (0, self.news),
+                               (0, self.blogs), (3, self.news)):
+            self.create_article(days, category)
+        response = self.client.post('/api/v2/articles/read/', {
+            "ids": list(Article.objects.values_list('id', flat=True))},
+            format="json")
+        self.assertEqual(response.data, {"updated": 4})
+        day, monday = FRIDAY.date(), FRIDAY.date() + datetime.timedelta(3)
+        self.assertEqual(self.day_stats(),
+                         {day: (0, 3, 3), monday: (0, 1, 1)})
+        self.assertEqual(self.category_stats(), {
+            (self.news.id, day): (2, 2), (self.blogs.id, day): (1, 1),
+            (self.news.id, monday): (1, 1)})
+
+    def test_import_counts_entries(self):
+        """
+        Test that imported entries and articles are counted
+        """
+        rows = [{"type": "entry", "content": "Imported"},
+                {"type": "article", "title": "Imported",
+                 "url": "http://www.dummy.com", "category": self.news.id,
+                 "read_status": True}]
+        response = self.client.post('/api/v2/import/', {
+            "file": SimpleUploadedFile("diary.ndjson", "\n".join(
+                json.dumps(row) for row in rows).encode("utf-8"))},
+            format='multipart')
+        b"".join(response.streaming_content)
+        self.assertEqual(self.day_stats(), {timezone.localdate(): (1, 1, 1)})
+
+    def test_stats_endpoint(self):
+        """
+        Test that the endpoint reports the entries per day, the articles per
+        week and the top categories of the period only
+        """
+        self.create_entry(-1, "Before the period")
+        self.create_entry(0, "Friday")
+        self.create_entry(0, "Friday again")
+        self.create_entry(3, "Monday")
+        self.create_article(0, self.blogs, read_status=True)
+        self.create_article(2, self.news)
+        self.create_article(3, self.news, read_status=True)
+        self.create_article(4, self.news)
+        self.create_article(10, self.blogs)
+
+        data = self.stats('?start=2019-03-01&end=2019-03-05&top=1')
+        self.assertEqual(data["start"], "2019-03-01")
+        self.assertEqual(data["end"], "2019-03-05")
+        self.assertEqual(data["entries"], {"total": 3, "days": [
+            {"day": "2019-03-01", "entries": 2},
+            {"day": "2019-03-04", "entries": 1}]})
+        self.assertEqual(data["articles"], {"added": 4, "read": 2, "weeks": [
+            {"week": "2019-02-25", "added": 2, "read": 1},
+            {"week": "2019-03-04", "added": 2, "read": 1}]})
+        self.assertEqual(data["top_categories"], [
+            {"id": self.news.id, "name": "News", "added": 3, "read": 1}])
+
+    def test_stats_default_to_last_30_days(self):
+        """
+        Test that the period defaults to the 30 days up to today
+        """
+        self.create_article(0, self.news)
+        with on_day(29):
+            data = self.stats('')
+        self.assertEqual(data["start"], "2019-03-01")
+        self.assertEqual(data["end"], "2019-03-30")
+        self.assertEqual(data["articles"]["added"], 1)
+
+    def test_invalid_periods_are_refused(self):
+        """
+        Test that a period ending before it starts, or bad values, are
+        refused
+        """
+        for query in ('?start=2019-03-02&end=2019-03-01', '?start=March',
+                      '?top=0'):
+            response = self.client.get('/api/v2/stats/' + query)
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(API_LIST_CACHE_TIMEOUT=0)
+    def test_stats_read_rollups_only(self):
+        """
+        Test that the statistics take two queries on the rollups however
+        many entries and articles there are
+        """
+        for i in range(20):
+            self.create_entry(i, "Entry {}".format(i))
+            self.create_article(i, self.news)
+        with self.assertNumQueries(2):
+            self.stats('?start=2019-03-01&end=2019-03-31')
+
+    def test_rebuild_stats_repairs_drift(self):
+        """
+        Test that the rebuild command puts right statistics that drifted or
+        are missing
+        """
+        self.create_entry(0, "Counted")
+        self.create_article(0, self.news, read_status=True)
+        self.create_article(1, self.blogs)
+        DailyStats.objects.filter(day=FRIDAY.date()).update(entries=5)
+        CategoryDailyStats.objects.filter(category=self.blogs).delete()
+        DailyStats.objects.create(owner=self.user, day=datetime.date(
+            2019, 1, 1), entries=1)
+        expected_days = self.day_stats()
+        expected_days[FRIDAY.date()] = (1, 1, 1)
+        del expected_days[datetime.date(2019, 1, 1)]
+
+        out = StringIO()
+        call_command('rebuild_stats', stdout=out)
+        self.assertIn("Checked 2 days and 2 category days, repaired 2 and 1.",
+                      out.getvalue())
+        self.assertEqual(self.day_stats(), expected_days)
+        self.assertEqual(self.category_stats(), {
+            (self.news.id, FRIDAY.date()): (1, 1),
+            (self.blogs.id, FRIDAY.date() + datetime.timedelta(days=1)):
+                (1, 0)})
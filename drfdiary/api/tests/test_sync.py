@@ -0,0 +1,175 @@
+import datetime
+import os
+import threading
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+
+from api.models import Entry, Category, Article, Tombstone
+from api.sync import encode_token
+
+
+class SyncViewTestCase(TransactionTestCase):
+    """
+    This class defines the tests for the incremental sync endpoint. Its
+    writes are committed, as a sync holds back the rows of transactions
+    still running.
+    """
+
+    def setUp(self):
+        """
+        Define the test client and a small diary
+        """
+        self.user = User.objects.create(username="syncer")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.category = Category.objects.create(name="Synced",
+                                                owner=self.user)
+        self.entry = Entry.objects.create(content="Synced entry",
+                                          owner=self.user)
+        self.article = Article.objects.create(
+            title="Synced article", url="http://www.dummy.com",
+            category=self.category, owner=self.user)
+        other = User.objects.create(username="another_nerd")
+        Entry.objects.create(content="Not synced", owner=other)
+
+    def sync(self, since=None):
+        params = {"since": since} if since else {}
+        response = self.client.get('/api/v2/sync/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_first_sync_returns_everything(self):
+        data = self.sync()
+        self.assertEqual([row["name"] for row in data["categories"]],
+                         ["Synced"])
+        self.assertEqual([row["content"] for row in data["entries"]],
+                         ["Synced entry"])
+        self.assertEqual([row["id"] for row in data["articles"]],
+                         [self.article.pk])
+        self.assertEqual(data["deleted"],
+                         {"categories": [], "entries": [], "articles": []})
+        self.assertFalse(data["more"])
+
+    def test_sync_returns_only_changes(self):
+        """
+        Test that a sync with a token returns what changed since, and
+        nothing once caught up
+        """
+        token = self.sync()["token"]
+        self.entry.content = "Edited entry"
+        self.entry.save()
+        new_entry = Entry.objects.create(content="New entry", owner=self.user)
+
+        with self.assertNumQueries(5):
+            data = self.sync(token)
+        self.assertEqual([row["id"] for row in data["entries"]],
+                         [self.entry.pk, new_entry.pk])
+        self.assertEqual(data["categories"], [])
+        self.assertEqual(data["articles"], [])
+
+        data = self.sync(data["token"])
+        self.assertEqual((data["entries"], data["categories"],
+                          data["articles"]), ([], [], []))
+
+    def test_sync_returns_deletions(self):
+        """
+        Test that deleting a category reports it along with its articles
+        """
+        token = self.sync()["token"]
+        category_id, article_id = self.category.pk, self.article.pk
+        self.category.delete()
+        data = self.sync(token)
+        self.assertEqual(data["deleted"]["categories"], [category_id])
+        self.assertEqual(data["deleted"]["articles"], [article_id])
+        self.assertEqual(data["deleted"]["entries"], [])
+
+    @override_settings(API_SYNC_PAGE_SIZE=1)
+    def test_sync_in_pages(self):
+        """
+        Test that a long list of changes comes in pages
+        """
+        Entry.objects.create(content="Second entry", owner=self.user)
+        data = self.sync()
+        self.assertTrue(data["more"])
+        self.assertEqual([row["content"] for row in data["entries"]],
+                         ["Synced entry"])
+        data = self.sync(data["token"])
+        self.assertEqual([row["content"] for row in data["entries"]],
+                         ["Second entry"])
+        self.assertFalse(data["more"])
+
+    def test_updates_and_bulk_writes_are_synced(self):
+        """
+        Test that rows changed by queryset updates, which skip save(), come
+        in the next sync
+        """
+        token = self.sync()["token"]
+        Article.objects.filter(pk=self.article.pk).update(read_status=True)
+        data = self.sync(token)
+        self.assertEqual([row["id"] for row in data["articles"]],
+                         [self.article.pk])
+        self.assertTrue(data["articles"][0]["read_status"])
+
+    @skipUnless(connection.vendor == 'postgresql',
+                "Only Postgres runs transactions side by side")
+    def test_late_commits_are_not_skipped(self):
+        """
+        Test that rows written by a transaction that began before a sync,
+        and commits after it, come in the sync after
+        """
+        written, synced = threading.Event(), threading.Event()
+
+        def write_slowly():
+            with transaction.atomic():
+                Entry.objects.create(content="Committed late",
+                                     owner=self.user)
+                written.set()
+                synced.wait(5)
+            connection.close()
+
+        token = self.sync()["token"]
+        writer = threading.Thread(target=write_slowly)
+        writer.start()
+        self.assertTrue(written.wait(5))
+        Category.objects.create(name="Committed early", owner=self.user)
+        data = self.sync(token)
+        synced.set()
+        writer.join()
+        self.assertEqual([row["name"] for row in data["categories"]],
+                         ["Committed early"])
+        self.assertEqual(data["entries"], [])
+
+        data = self.sync(data["token"])
+        self.assertIn("Committed late",
+                      [row["content"] for row in data["entries"]])
+
+    def test_invalid_token(self):
+        response = self.client.get('/api/v2/sync/', {"since": "nonsense"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expired_token(self):
+        """
+        Test that a token older than the kept tombstones is refused
+        """
+        old = timezone.now() - datetime.timedelta(days=31)
+        token = encode_token(dict((key, (0, 0)) for key in (
+            "categories", "entries", "articles", "deleted")), old)
+        response = self.client.get('/api/v2/sync/', {"since": token})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    def test_purge_tombstones(self):
+        self.entry.delete()
+        Tombstone.objects.update(
+            date_deleted=timezone.now() - datetime.timedelta(days=31))
+        self.article.delete()
+        call_command("purge_tombstones", stdout=open(os.devnull, "w"))
+        self.assertEqual(list(Tombstone.objects.values_list("kind",
+                                                            flat=True)),
+                         ["article"])
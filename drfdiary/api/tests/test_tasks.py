@@ -0,0 +1,185 @@
+import datetime
+import threading
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from django.contrib.auth.models import User
+
+from api.models import QueuedTask
+from api.tasks import DatabaseBackend, ThreadPoolBackend, get_task_backend, \
+    task
+
+
+# What the test tasks were called with, and how often they should fail
+calls = []
+failures = {'count': 0}
+done = threading.Event()
+
+
+@task
+def record(*args):
+    calls.append(args)
+    done.set()
+
+
+@task
+def record_thread(*args):
+    calls.append(threading.current_thread().name)
+    done.set()
+
+
+@task(max_attempts=3)
+def flaky(*args):
+    calls.append(args)
+    if failures['count'] > 0:
+        failures['count'] -= 1
+        raise ValueError("Failed on purpose")
+    done.set()
+
+
+class TaskTestCase(TestCase):
+    """
+    This class defines the tests for the background tasks and their
+    backends
+    """
+
+    def setUp(self):
+        del calls[:]
+        failures['count'] = 0
+        done.clear()
+
+    def test_immediate_backend(self):
+        """
+        Test that the tests' backend runs tasks right away, with their
+        arguments as they would be stored
+        """
+        record.delay(1, "two", (3, 4))
+        self.assertEqual(calls, [(1, "two", [3, 4])])
+
+    def test_arguments_must_be_serializable(self):
+        """
+        Test that a task cannot be queued with arguments that could not be
+        stored
+        """
+        with self.assertRaises(TypeError):
+            record.delay(object())
+
+    def test_new_users_get_a_token(self):
+        """
+        Test that the token of a new user is created by a task
+        """
+        user = User.objects.create(username="tokened")
+        self.assertTrue(Token.objects.filter(user=user).exists())
+
+    @override_settings(API_TASK_RETRY_DELAY=0)
+    def test_thread_pool_retries(self):
+        """
+        Test that the thread pool runs tasks off the calling thread and tries
+        failed ones again
+        """
+        failures['count'] = 2
+        backend = ThreadPoolBackend()
+        with self.assertLogs('api.tasks', 'WARNING') as logs:
+            backend.submit(flaky, ["pooled"])
+            self.assertTrue(done.wait(5))
+            backend.executor.shutdown()
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(calls, [("pooled",)] * 3)
+
+    @override_settings(API_TASK_WORKERS=1, API_TASK_QUEUE_SIZE=0)
+    def test_full_thread_pool_runs_in_caller(self):
+        """
+        Test that a task finding the pool full runs in the caller
+        """
+        backend = ThreadPoolBackend()
+        release = threading.Event()
+        backend.submit(task(lambda: release.wait(5)), [])
+        backend.submit(record, ["caller"])
+        self.assertEqual(calls, [("caller",)])
+        release.set()
+        backend.executor.shutdown()
+
+    @override_settings(API_TASK_WORKERS=1, API_TASK_QUEUE_SIZE=0)
+    def test_retries_wait_for_the_pool(self):
+        """
+        Test that a retry finding the pool full waits to run in it rather
+        than on the timer's thread
+        """
+        backend = ThreadPoolBackend()
+        release = threading.Event()
+        backend.submit(task(lambda: release.wait(5)), [])
+        timer = threading.Thread(target=backend.retry,
+                                 args=(record_thread, [], 2))
+        timer.start()
+        self.assertFalse(done.wait(0.1))
+        release.set()
+        self.assertTrue(done.wait(5))
+        timer.join()
+        backend.executor.shutdown()
+        self.assertTrue(calls[0].startswith('api-task'))
+
+    @override_settings(API_TASK_BACKEND='api.tasks.DatabaseBackend')
+    def test_database_backend(self):
+        """
+        Test that tasks queued in the database are run, and deleted, by the
+        worker command
+        """
+        self.assertIsInstance(get_task_backend(), DatabaseBackend)
+        record.delay("stored")
+        self.assertEqual(calls, [])
+        queued = QueuedTask.objects.get()
+        self.assertEqual(queued.name, record.name)
+
+        out = StringIO()
+        call_command('run_tasks', '--once', stdout=out)
+        self.assertEqual(calls, [("stored",)])
+        self.assertIn("Ran 1 tasks, 0 failed.", out.getvalue())
+        self.assertFalse(QueuedTask.objects.exists())
+
+    @override_settings(API_TASK_BACKEND='api.tasks.DatabaseBackend',
+                       API_TASK_RETRY_DELAY=60)
+    def test_database_retries(self):
+        """
+        Test that a failed task is scheduled again after a delay, and marked
+        failed after its last attempt
+        """
+        failures['count'] = 5
+        flaky.delay("stored")
+        backend = DatabaseBackend()
+        for attempt in range(1, 4):
+            QueuedTask.objects.update(run_at=timezone.now())
+            before = timezone.now()
+            queued = backend.claim(10)[0]
+            with self.assertLogs('api.tasks', 'WARNING'):
+                self.assertFalse(backend.run(queued))
+            queued.refresh_from_db()
+            self.assertEqual(queued.attempts, attempt)
+            self.assertIn("Failed on purpose", queued.last_error)
+            if attempt < 3:
+                self.assertEqual(queued.status, QueuedTask.PENDING)
+                self.assertGreaterEqual(
+                    queued.run_at, before + datetime.timedelta(
+                        seconds=60 * 2 ** (attempt - 1)))
+        self.assertEqual(queued.status, QueuedTask.FAILED)
+        self.assertEqual(backend.claim(10), [])
+
+    @override_settings(API_TASK_BACKEND='api.tasks.DatabaseBackend',
+                       API_TASK_LEASE_SECONDS=60)
+    def test_crashed_worker_tasks_run_again(self):
+        """
+        Test that a task claimed by a worker that never finished it is
+        claimed again once the lease runs out
+        """
+        record.delay("leased")
+        backend = DatabaseBackend()
+        self.assertEqual(len(backend.claim(10)), 1)
+        self.assertEqual(backend.claim(10), [])
+        QueuedTask.objects.update(
+            run_at=timezone.now() - datetime.timedelta(seconds=1))
+        queued = backend.claim(10)[0]
+        self.assertEqual(queued.attempts, 2)
+        self.assertTrue(backend.run(queued))
+        self.assertEqual(calls, [("leased",)])
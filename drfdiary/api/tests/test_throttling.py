@@ -0,0 +1,172 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+
+from api.throttling import SlidingWindowThrottle, check_throttle_cache
+
+
+RATES = {
+    'user_read': '3/min',
+    'user_write': '2/min',
+    'anon_read': '2/min',
+    'anon_write': '2/min',
+    'login': '2/min',
+}
+
+
+@override_settings(API_THROTTLE_RATES=RATES)
+class ThrottleTestCase(TestCase):
+    """
+    This class defines the tests for the per-user, per-address and login
+    throttles
+    """
+
+    def setUp(self):
+        """
+        Define the test client, a user and a clock starting at the beginning
+        of a period
+        """
+        cache.clear()
+        self.user = User.objects.create(username="throttled")
+        self.user.set_password("secret")
+        self.user.save()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.now = 6000.0
+        patcher = mock.patch.object(SlidingWindowThrottle, 'timer',
+                                    mock.Mock(side_effect=lambda: self.now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, client=None):
+        return (client or self.client).get('/api/v2/entries/')
+
+    def test_reads_are_throttled_with_retry_after(self):
+        """
+        Test that reads past the rate are refused with a Retry-After header
+        until the period is over
+        """
+        for i in range(3):
+            self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+        response = self.get()
+        self.assertEqual(response.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '80')
+
+        self.now += 80
+        self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+
+    def test_reads_and_writes_count_separately(self):
+        """
+        Test that writes have their own, smaller, allowance
+        """
+        for i in range(3):
+            self.get()
+        for i in range(2):
+            response = self.client.post('/api/v2/entries/',
+                                        {"content": "Entry {}".format(i)},
+                                        format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post('/api/v2/entries/', {"content": "More"},
+                                    format="json")
+        self.assertEqual(response.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_users_are_throttled_apart(self):
+        """
+        Test that a throttled user does not hold back another one
+        """
+        for i in range(4):
+            self.get()
+        other = APIClient()
+        other.force_authenticate(
+            user=User.objects.create(username="unthrottled"))
+        self.assertEqual(self.get(other).status_code, status.HTTP_200_OK)
+
+    def test_window_slides(self):
+        """
+        Test that the requests of the previous period count for the part of
+        it the window still covers, and that refused requests do not count
+        """
+        for i in range(3):
+            self.get()
+        # Half way through the next period, half of the previous requests
+        # are still in the window
+        self.now += 90
+        self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+        response = self.get()
+        self.assertEqual(response.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '10')
+        self.assertEqual(self.get().status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+
+        self.now += 10
+        self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+
+    @override_settings(API_THROTTLE_RATES=dict(RATES, login=None))
+    def test_anonymous_requests_are_throttled_per_address(self):
+        """
+        Test that anonymous requests are throttled by their IP address
+        """
+        credentials = {"username": "throttled", "password": "wrong"}
+
+        def login(address):
+            return APIClient(REMOTE_ADDR=address).post(
+                '/api/v2/accounts/login/', credentials, format="json")
+
+        for i in range(2):
+            self.assertEqual(login('10.0.0.1').status_code,
+                             status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(login('10.0.0.1').status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(login('10.0.0.2').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_logins_are_throttled(self):
+        """
+        Test that the token and login views allow fewer attempts than other
+        requests, and count them together
+        """
+        client = APIClient(REMOTE_ADDR='10.0.0.3')
+        credentials = {"username": "throttled", "password": "wrong"}
+        response = client.post('/api/v2/get-token/', credentials,
+                               format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = client.post('/api/v2/accounts/login/', credentials,
+                               format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        credentials["password"] = "secret"
+        for url in ('/api/v2/get-token/', '/api/v2/accounts/login/'):
+            response = client.post(url, credentials, format="json")
+            self.assertEqual(response.status_code,
+                             status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertIn('Retry-After', response)
+
+        response = APIClient(REMOTE_ADDR='10.0.0.4').post(
+            '/api/v2/get-token/', credentials, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(API_THROTTLE_ATOMIC_CACHE=True)
+    def test_inexact_caches_are_refused(self):
+        """
+        Test that throttling with a cache only the process sees, or one that
+        does not count atomically, is refused and reported by the checks
+        when the settings ask for an atomic one
+        """
+        for backend in ('django.core.cache.backends.locmem.LocMemCache',
+                        'django.core.cache.backends.db.DatabaseCache'):
+            with self.subTest(backend=backend), override_settings(CACHES={
+                    'default': {'BACKEND': backend,
+                                'LOCATION': 'api_throttle_cache'}}):
+                with self.assertRaises(ImproperlyConfigured):
+                    self.get()
+                self.assertEqual(
+                    [error.id for error in check_throttle_cache(None)],
+                    ['api.E001'])
@@ -0,0 +1,187 @@
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import SimpleRateThrottle
+
+
+# Caches that cannot count requests exactly across processes: each process
+# keeps the first two to itself, so would allow the full rate, and the
+# others implement incr() as a get and a set that concurrent requests
+# interleave, losing counts. The database cache also culls keys once it
+# holds MAX_ENTRIES, resetting the counters of the clients it drops.
+INEXACT_CACHES = (LocMemCache, DummyCache, DatabaseCache, FileBasedCache)
+
+
+def get_throttle_cache_error():
+    """
+    Return why the API_THROTTLE_CACHE cache cannot hold the throttle
+    counters, when API_THROTTLE_ATOMIC_CACHE asks for one shared by every
+    process and counting atomically, or None if it can
+    """
+    name = getattr(settings, 'API_THROTTLE_CACHE', 'default')
+    if isinstance(caches[name], INEXACT_CACHES) and getattr(
+            settings, 'API_THROTTLE_ATOMIC_CACHE', False):
+        return ("The throttles need API_THROTTLE_CACHE to name a cache every "
+                "process shares and increments atomically, such as "
+                "memcached, but the {!r} cache is a {}.".format(
+                    name, type(caches[name]).__name__))
+    return None
+
+
+def get_throttle_cache():
+    """
+    Return the API_THROTTLE_CACHE cache, refusing one that cannot count
+    exactly across processes unless API_THROTTLE_ATOMIC_CACHE is off
+    """
+    error = get_throttle_cache_error()
+    if error is not None:
+        raise ImproperlyConfigured(error)
+    return caches[getattr(settings, 'API_THROTTLE_CACHE', 'default')]
+
+
+@checks.register(checks.Tags.caches)
+def check_throttle_cache(app_configs, **kwargs):
+    """
+    Report a throttle cache that every request would refuse when the
+    server is checked, before it serves any
+    """
+    error = get_throttle_cache_error()
+    if error is None:
+        return []
+    return [checks.Error(error, id='api.E001')]
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Throttle allowing a number of requests per period over a sliding window.
+    The window is approximated from the counts of the current and previous
+    fixed periods, weighing the previous count by how much of the period it
+    still overlaps. Counts are kept in the API_THROTTLE_CACHE cache with
+    add() and incr(), which memcached applies atomically, so every worker
+    sharing the cache counts every request in two keys per client.
+
+    Reads and writes are counted separately, under read_scope and
+    write_scope, whose rates are looked up in API_THROTTLE_RATES; a scope
+    without a rate is not throttled.
+    """
+    read_scope = None
+    write_scope = None
+
+    def __init__(self):
+        # The scope, and so the rate, depends on the request
+        self.scope = self.rate = None
+        self.wait_seconds = None
+
+    def get_scope(self, request):
+        if request.method in SAFE_METHODS:
+            return self.read_scope
+        return self.write_scope
+
+    def get_rate(self):
+        return getattr(settings, 'API_THROTTLE_RATES', {}).get(self.scope)
+
+    def allow_request(self, request, view):
+        self.scope = self.get_scope(request)
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        cache = get_throttle_cache()
+        now = self.timer()
+        period = int(now // self.duration)
+        key = '{}:{}'.format(self.key, period)
+        cache.add(key, 0, self.duration * 2)
+        try:
+            current = cache.incr(key)
+        except ValueError:
+            # Evicted since it was added
+            cache.set(key, 1, self.duration * 2)
+            current = 1
+        previous = cache.get('{}:{}'.format(self.key, period - 1), 0)
+        # Compared multiplied through by the duration, to keep to exact
+        # arithmetic on whole seconds
+        elapsed = now - period * self.duration
+        remaining = self.duration - elapsed
+        if (previous * remaining + current * self.duration <=
+                self.num_requests * self.duration):
+            return True
+
+        # Refused requests are not counted, so a client that waits as told
+        # by Retry-After gets through
+        try:
+            cache.decr(key)
+        except ValueError:
+            pass
+        self.wait_seconds = self.get_wait(previous, current - 1, elapsed)
+        return False
+
+    def get_wait(self, previous, current, elapsed):
+        """
+        Return the seconds until one more request fits in the window, given
+        the counts of the previous and current periods and the seconds
+        elapsed in the current one
+        """
+        if self.num_requests < 1:
+            return None
+        spare = self.num_requests - 1 - current
+        if spare >= 0:
+            # Wait for enough of the previous period to slide out
+            needed = self.duration * (previous - spare) / previous
+            return max(needed - elapsed, 0)
+        # Wait for the next period, and for enough of this one to slide out
+        needed = self.duration * -spare / current
+        return self.duration - elapsed + needed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class UserThrottle(SlidingWindowThrottle):
+    """
+    Throttle the requests of each authenticated user. A user has a single
+    token, so this also throttles each token.
+    """
+    read_scope = 'user_read'
+    write_scope = 'user_write'
+
+    def get_cache_key(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return None
+        return self.cache_format % {'scope': self.scope,
+                                    'ident': request.user.pk}
+
+
+class AnonThrottle(SlidingWindowThrottle):
+    """
+    Throttle the anonymous requests coming from each IP address
+    """
+    read_scope = 'anon_read'
+    write_scope = 'anon_write'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.cache_format % {'scope': self.scope,
+                                    'ident': self.get_ident(request)}
+
+
+class LoginThrottle(SlidingWindowThrottle):
+    """
+    Stricter throttle of the requests to the login views coming from each IP
+    address, authenticated or not, to slow down password guessing
+    """
+    read_scope = write_scope = 'login'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope,
+                                    'ident': self.get_ident(request)}
@@ -1,14 +1,22 @@
 from django.conf.urls import url, include
 from rest_framework.urlpatterns import format_suffix_patterns
-from rest_framework.authtoken.views import obtain_auth_token
-import rest_auth
+import rest_auth.urls
 
 from .views import CreateView, DetailsView, UserDetailsView, UserView, \
-    CategoryView, CategoryDetailsView, ArticleView, ArticleDetailsView
+    CategoryView, CategoryDetailsView, ArticleView, ArticleDetailsView, \
+    ArticleBulkView, ArticleReadView, ExportView, ImportView, \
+    MetricsView, StatsView, SyncView, TokenView, LoginView
+
+
+# The login view of rest_auth, swapped for one that is throttled harder
+accounts_urlpatterns = [
+    url(r'^login/$', LoginView.as_view(), name='rest_login'),
+] + [pattern for pattern in rest_auth.urls.urlpatterns
+     if pattern.name != 'rest_login']
 
 
 urlpatterns = {
-    url(r'^accounts/', include('rest_auth.urls')),
+    url(r'^accounts/', include(accounts_urlpatterns)),
     url(r'^accounts/registration/', include('rest_auth.registration.urls')),
     # Categories
     url(r'^categories/$', CategoryView.as_view(), name="category_view"),
@@ -19,11 +27,25 @@ urlpatterns = {
         ArticleView.as_view(), name="article_view"),
     url(r'^categories/(?P<pk>[0-9]+)/articles/(?P<id>[0-9]+)/$',
         ArticleDetailsView.as_view(), name="article_details_view"),
+    url(r'^categories/(?P<pk>[0-9]+)/articles/bulk/$',
+        ArticleBulkView.as_view(), name="article_bulk_view"),
+    url(r'^articles/read/$', ArticleReadView.as_view(),
+        name="article_read_view"),
     # Entries
     url(r'^entries/$', CreateView.as_view(), name="create"),
     url(r'^entries/(?P<pk>[0-9]+)/$', DetailsView.as_view(), name="details"),
+    # Export
+    url(r'^export/$', ExportView.as_view(), name="export_view"),
+    # Sync
+    url(r'^sync/$', SyncView.as_view(), name="sync_view"),
+    # Statistics
+    url(r'^stats/$', StatsView.as_view(), name="stats_view"),
+    # Import
+    url(r'^import/$', ImportView.as_view(), name="import_view"),
+    # Metrics
+    url(r'^metrics/$', MetricsView.as_view(), name="metrics_view"),
     # Obtain Token
-    url(r'^get-token/$', obtain_auth_token),
+    url(r'^get-token/$', TokenView.as_view()),
     # User endpoints
     url(r'^users/$', UserView.as_view(), name="users"),
     url(r'^users/(?P<pk>[0-9]+)/$',
@@ -1,24 +1,93 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
 from rest_framework import generics
+from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework import permissions
-from rest_framework.exceptions import PermissionDenied
+from rest_framework import status
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
+from rest_auth.views import LoginView as RestAuthLoginView
 
+from .cache import CachedListMixin, cache_for_user, invalidate_lists
+from .conditional import ConditionalListMixin, ConditionalDetailMixin
+from .export import dumps, export_json, export_ndjson
+from .filters import DATE_FILTERS, BooleanFilter, DomainFilter, \
+    OrderingFilter, QueryFilterBackend
+from .importer import DiaryImporter, READERS
+from .instrumentation import registry
+from .pagination import DiaryCursorPagination
+from .search import FullTextSearchFilter
+from .stats import get_stats
+from .sync import sync
+from .throttling import LoginThrottle
 from .permissions import IsOwner
 from .serializers import EntrySerializer, UserSerializer, CategorySerializer, \
-    ArticleSerializer
-from .models import Entry, Category, Article
+    ArticleSerializer, MarkReadSerializer, StatsQuerySerializer, \
+    get_values_serializer, select_field_names
+from .models import Entry, Category, Article, count_article_change, \
+    deferred_article_counts, mark_articles_read
+
+
+class ValuesListMixin(object):
+    """
+    Mixin for list views that reads the rows with .values() and serializes
+    them with the ValuesSerializer of serializer_class, which gives the same
+    output without building a model instance per row.
+
+    Only the columns of the fields picked with ?fields= and ?exclude= are
+    read, and ?compact=true lists the rows as arrays after a header row of
+    field names.
+    """
+
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        serializer = get_values_serializer(
+            serializer_class, select_field_names(serializer_class, request))
+        queryset = self.filter_queryset(self.get_queryset())
+        # Annotations such as the search rank may be what the page is
+        # ordered on, and the paginator reads its position from the
+        # ordering columns, so the rows need them whatever the fields
+        columns = OrderedDict.fromkeys(serializer.columns)
+        columns.update(OrderedDict.fromkeys(queryset.query.annotations))
+        if self.paginator is not None:
+            columns.update(OrderedDict.fromkeys(
+                field.lstrip('-') for field in
+                self.paginator.get_ordering(request, queryset, self)))
+        rows = queryset.values(*columns)
+
+        if request.query_params.get('compact', '').lower() in ('1', 'true'):
+            represent = serializer.to_compact
+        else:
+            represent = serializer.to_representation
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(represent(page))
+        return Response(represent(rows))
 
 
 # Create your views here.
-class CreateView(generics.ListCreateAPIView):
+class CreateView(ConditionalListMixin, CachedListMixin, ValuesListMixin,
+                 generics.ListCreateAPIView):
     """
     View to handle the creation and listing of entries.
     """
     permission_classes = (permissions.IsAuthenticated, IsOwner)
     serializer_class = EntrySerializer
-    queryset = Entry.objects.all()
+    queryset = Entry.objects.select_related('owner')
+    pagination_class = DiaryCursorPagination
+    filter_backends = (QueryFilterBackend, OrderingFilter,
+                       FullTextSearchFilter)
+    query_filters = DATE_FILTERS
+    ordering_fields = ('date_created', 'date_modified')
 
     def perform_create(self, serializer):
         """
@@ -26,16 +95,43 @@ class CreateView(generics.ListCreateAPIView):
         """
         serializer.save(owner=self.request.user)
 
+    def get_queryset(self):
+        queryset = Entry.objects.owned_by(
+            self.request.user).select_related('owner')
+        return queryset
+
 
-class DetailsView(generics.RetrieveUpdateDestroyAPIView):
+class DetailsView(ConditionalDetailMixin,
+                  generics.RetrieveUpdateDestroyAPIView):
     """
     This class handles the management of individual entries.
     """
     serializer_class = EntrySerializer
-    queryset = Entry.objects.all()
+    queryset = Entry.objects.select_related('owner')
     permission_classes = (permissions.IsAuthenticated, IsOwner)
 
 
+class LoginThrottleMixin(object):
+    """
+    Mixin adding the stricter login throttle to the throttles of a view
+    """
+
+    def get_throttles(self):
+        return super().get_throttles() + [LoginThrottle()]
+
+
+class TokenView(LoginThrottleMixin, ObtainAuthToken):
+    """
+    View to obtain the token of a user from their username and password
+    """
+
+
+class LoginView(LoginThrottleMixin, RestAuthLoginView):
+    """
+    View to log a user in, returning their token
+    """
+
+
 class UserView(generics.ListAPIView):
     """
     View to list the users
@@ -52,13 +148,18 @@ class UserDetailsView(generics.RetrieveAPIView):
     serializer_class = UserSerializer
 
 
-class CategoryView(generics.ListCreateAPIView):
+class CategoryView(ConditionalListMixin, CachedListMixin, ValuesListMixin,
+                   generics.ListCreateAPIView):
     """
     View to handle listing of categories
     """
-    queryset = Category.objects.all()
+    queryset = Category.objects.select_related('owner')
     serializer_class = CategorySerializer
     permission_classes = (permissions.IsAuthenticated, IsOwner)
+    pagination_class = DiaryCursorPagination
+    filter_backends = (QueryFilterBackend, OrderingFilter)
+    query_filters = DATE_FILTERS
+    ordering_fields = ('date_created', 'date_modified', 'name')
 
     def perform_create(self, serializer):
         """
@@ -67,56 +168,373 @@ class CategoryView(generics.ListCreateAPIView):
         serializer.save(owner=self.request.user)
 
     def get_queryset(self):
-        queryset = Category.objects.filter(owner=self.request.user)
+        queryset = Category.objects.owned_by(
+            self.request.user).select_related('owner')
         return queryset
 
 
-class CategoryDetailsView(generics.RetrieveUpdateDestroyAPIView):
+class CategoryDetailsView(ConditionalDetailMixin,
+                          generics.RetrieveUpdateDestroyAPIView):
     """
     This class handles the http GET, PUT and DELETE requests fro categories.
     """
-    queryset = Category.objects.all()
+    queryset = Category.objects.select_related('owner')
     serializer_class = CategorySerializer
     permission_classes = (permissions.IsAuthenticated, IsOwner)
 
+    def perform_destroy(self, instance):
+        # Uncount the articles deleted along with the category at once
+        # rather than with an UPDATE each
+        with transaction.atomic(), deferred_article_counts():
+            instance.delete()
+
 
-class ArticleView(generics.ListCreateAPIView):
+class CategoryArticlesMixin(object):
+    """
+    Mixin for the views that work on the articles of the category in the URL
+    """
+
+    def get_category_id(self):
+        """
+        Return the id of the category in the URL, checking in a single query
+        that it belongs to the requesting user.
+        """
+        category_id = int(self.kwargs['pk'])
+        if not Category.objects.owned_by(
+                self.request.user).filter(id=category_id).exists():
+            raise PermissionDenied(
+                "You do not have permission to perform this action.")
+        return category_id
+
+
+class ArticleView(ConditionalListMixin, CachedListMixin, ValuesListMixin,
+                  CategoryArticlesMixin, generics.ListCreateAPIView):
     """
     This class defines the create behaviour of the articles
     """
-    queryset = Article.objects.all()
+    queryset = Article.objects.select_related('owner')
     serializer_class = ArticleSerializer
     permission_classes = (permissions.IsAuthenticated, IsOwner)
+    pagination_class = DiaryCursorPagination
+    filter_backends = (QueryFilterBackend, OrderingFilter,
+                       FullTextSearchFilter)
+    query_filters = dict(DATE_FILTERS,
+                         read_status=BooleanFilter('read_status'),
+                         domain=DomainFilter('url'))
+    ordering_fields = ('date_created', 'date_modified', 'title')
 
     def perform_create(self, serializer):
         """Save the post data when creating a new article."""
-        categories = Category.objects.filter(
-            owner=self.request.user).filter(id=self.kwargs['pk'])
-        if categories.count() == 0:
-            raise PermissionDenied(
-                "You do not have permission to perform this action.")
-        else:
-            serializer.save(owner=self.request.user, category=categories[0])
+        serializer.save(owner=self.request.user,
+                        category_id=self.get_category_id())
 
     def get_queryset(self):
-        queryset = Article.objects.filter(owner=self.request.user)
-        categories = Category.objects.filter(owner=self.request.user)
-        if categories.count() == 0:
-            raise PermissionDenied(
-                "You do not have permission to perform this action.")
-        else:
-            category = categories.filter(id=self.kwargs['pk'])
-            queryset = queryset.filter(category__in=category)
-        return queryset
+        """
+        Join on the category owner so a page of articles proves ownership of
+        the category without a separate lookup.
+        """
+        queryset = Article.objects.owned_by(
+            self.request.user).select_related('owner')
+        return queryset.filter(category_id=self.kwargs['pk'],
+                               category__owner=self.request.user)
+
+    def paginate_queryset(self, queryset):
+        """
+        An empty page may mean the category is not the user's, so only then
+        check ownership explicitly.
+        """
+        page = super().paginate_queryset(queryset)
+        if not page:
+            self.get_category_id()
+        return page
+
+    def get_list_state(self):
+        """
+        As with an empty page, no articles may mean the category is not the
+        user's, which must still be refused.
+        """
+        state = super().get_list_state()
+        if not state['count']:
+            self.get_category_id()
+        return state
 
 
-class ArticleDetailsView(generics.RetrieveUpdateDestroyAPIView):
+class ArticleDetailsView(ConditionalDetailMixin,
+                         generics.RetrieveUpdateDestroyAPIView):
     """
     This class handles the http GET, PUT and DELETE requests for articles.
     """
-    queryset = Article.objects.all()
+    queryset = Article.objects.select_related('owner')
     serializer_class = ArticleSerializer
     permission_classes = (
         permissions.IsAuthenticated,
         IsOwner)
     lookup_field = 'id'
+
+    def get_queryset(self):
+        """
+        Lock the article being updated, so that concurrent updates of its
+        read status change the counters of its category once
+        """
+        queryset = super().get_queryset()
+        if self.request.method in ('PUT', 'PATCH'):
+            queryset = queryset.select_for_update(of=('self',))
+        return queryset
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().update(request, *args, **kwargs)
+
+
+def get_item_id(item):
+    """
+    Return the article id of a bulk item, which is either an id or an object
+    with an id, or None if it has no usable id.
+    """
+    if isinstance(item, dict):
+        item = item.get('id')
+    try:
+        return int(item)
+    except (TypeError, ValueError):
+        return None
+
+
+class ArticleBulkView(CategoryArticlesMixin, generics.GenericAPIView):
+    """
+    This class handles batches of articles in a category. POST creates,
+    PATCH updates and DELETE removes a list of articles in one transaction.
+    """
+    serializer_class = ArticleSerializer
+    permission_classes = (permissions.IsAuthenticated, IsOwner)
+
+    def get_queryset(self):
+        queryset = Article.objects.owned_by(
+            self.request.user).select_related('owner')
+        return queryset.filter(category_id=self.kwargs['pk'])
+
+    def get_items(self):
+        """
+        Return the list of items sent in the request body, refusing anything
+        else or more than API_MAX_BULK_ARTICLES items.
+        """
+        items = self.request.data
+        if not isinstance(items, list):
+            raise ValidationError("Expected a list of items.")
+        limit = getattr(settings, 'API_MAX_BULK_ARTICLES', 500)
+        if len(items) > limit:
+            raise ValidationError(
+                "Expected at most {} items.".format(limit))
+        return items
+
+    def post(self, request, *args, **kwargs):
+        """
+        Create all the articles sent or, if any is invalid, none of them
+        """
+        category_id = self.get_category_id()
+        serializer = self.get_serializer(data=self.get_items(), many=True)
+        serializer.is_valid(raise_exception=True)
+        articles = [Article(owner=request.user, category_id=category_id,
+                            **data) for data in serializer.validated_data]
+        for article in articles:
+            article.set_search_vector()
+        with transaction.atomic(), deferred_article_counts():
+            if connection.features.can_return_ids_from_bulk_insert:
+                Article.objects.bulk_create(articles)
+                for article in articles:
+                    count_article_change(article, created=True)
+            else:
+                # The ids are needed for the response, and databases such
+                # as SQLite do not return them from a bulk insert
+                for article in articles:
+                    article.save()
+            invalidate_lists(request.user.pk)
+        return Response(self.get_serializer(articles, many=True).data,
+                        status=status.HTTP_201_CREATED)
+
+    def patch(self, request, *args, **kwargs):
+        """
+        Partially update the articles sent, each identified by its id, or
+        none of them if any is invalid or missing
+        """
+        self.get_category_id()
+        items = self.get_items()
+        ids = [get_item_id(item) for item in items]
+        with transaction.atomic(), deferred_article_counts():
+            # Locked so that concurrent updates of the read status of an
+            # article change the counters once
+            articles = self.get_queryset().select_for_update(
+                of=('self',)).in_bulk(
+                [article_id for article_id in ids if article_id is not None])
+            errors, updated, fields = [], [], {'date_modified'}
+            for item, article_id in zip(items, ids):
+                if article_id not in articles:
+                    errors.append(
+                        {"id": ["No such article in this category."]})
+                    continue
+                serializer = self.get_serializer(
+                    articles[article_id], data=item, partial=True)
+                if not serializer.is_valid():
+                    errors.append(serializer.errors)
+                    continue
+                errors.append({})
+                for field, value in serializer.validated_data.items():
+                    setattr(serializer.instance, field, value)
+                    fields.add(field)
+                updated.append(serializer.instance)
+            if any(errors):
+                raise ValidationError(errors)
+
+            # bulk_update skips save(), so stamp the articles and refresh
+            # their search vectors ourselves
+            now = timezone.now()
+            for article in updated:
+                article.date_modified = now
+                article.set_search_vector()
+            fields.add('search_vector')
+            Article.objects.bulk_update(updated, fields)
+            for article in updated:
+                count_article_change(article)
+            invalidate_lists(request.user.pk)
+        return Response(self.get_serializer(updated, many=True).data)
+
+    def delete(self, request, *args, **kwargs):
+        """
+        Delete the articles whose ids are sent and report, for each id,
+        whether it was deleted
+        """
+        self.get_category_id()
+        ids = [get_item_id(item) for item in self.get_items()]
+        with transaction.atomic(), deferred_article_counts():
+            queryset = self.get_queryset().filter(id__in=ids)
+            existing = set(queryset.values_list('id', flat=True))
+            queryset.delete()
+        return Response([{"id": article_id, "deleted": article_id in existing}
+                         for article_id in ids])
+
+
+class ArticleReadView(generics.GenericAPIView):
+    """
+    This class marks a selection of the user's articles as read, or unread,
+    with a single UPDATE statement, plus one per category for its counters
+    and one per day and category for the statistics.
+    """
+    serializer_class = MarkReadSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        """
+        Flip the read status of the articles selected by ids, category and
+        before date and return how many articles changed
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        queryset = Article.objects.owned_by(request.user)
+        if 'ids' in data:
+            queryset = queryset.filter(id__in=data['ids'])
+        if 'category' in data:
+            queryset = queryset.filter(category_id=data['category'])
+        if 'before' in data:
+            queryset = queryset.filter(date_created__lt=data['before'])
+        with transaction.atomic(), deferred_article_counts():
+            updated = mark_articles_read(queryset, data['read_status'])
+        if updated:
+            invalidate_lists(request.user.pk)
+        return Response({"updated": updated})
+
+
+class ExportView(APIView):
+    """
+    This class streams the whole diary of the user, as newline-delimited
+    JSON or, with ?output=json, as one JSON object.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+    outputs = {
+        'ndjson': (export_ndjson, 'application/x-ndjson'),
+        'json': (export_json, 'application/json'),
+    }
+
+    def get(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in self.outputs:
+            raise ValidationError(
+                {"output": ["Expected one of: {}.".format(
+                    ", ".join(sorted(self.outputs)))]})
+        export, content_type = self.outputs[output]
+        chunk_size = getattr(settings, 'API_EXPORT_CHUNK_SIZE', 2000)
+        response = StreamingHttpResponse(
+            export(request.user, chunk_size), content_type=content_type)
+        response['Content-Disposition'] = \
+            'attachment; filename="diary.{}"'.format(output)
+        return response
+
+
+class ImportView(APIView):
+    """
+    This class imports entries, categories and articles from an uploaded
+    newline-delimited JSON file, such as an export, or a CSV file with
+    ?input=csv. The response streams a line for each row that is skipped or
+    fails, the progress after each batch and the totals at the end.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+    parser_classes = (MultiPartParser,)
+
+    def post(self, request, *args, **kwargs):
+        upload = request.data.get('file')
+        if upload is None or isinstance(upload, str):
+            raise ValidationError({"file": ["No file was submitted."]})
+        reader = READERS.get(request.query_params.get('input', 'ndjson'))
+        if reader is None:
+            raise ValidationError({"input": ["Expected one of: {}.".format(
+                ", ".join(sorted(READERS)))]})
+        importer = DiaryImporter(
+            request.user,
+            batch_size=getattr(settings, 'API_IMPORT_BATCH_SIZE', 1000),
+            default_type=request.query_params.get('type'))
+        lines = (dumps(report) + '\n'
+                 for report in importer.run(reader(upload)))
+        return StreamingHttpResponse(lines,
+                                     content_type='application/x-ndjson')
+
+
+class MetricsView(APIView):
+    """
+    This class serves the request metrics of this process in the Prometheus
+    text format. Only staff users may read them.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(registry.render(),
+                            content_type='text/plain; version=0.0.4')
+
+
+class SyncView(APIView):
+    """
+    This class returns what changed in the diary of the user since the sync
+    that gave the ?since= token: the entries, categories and articles
+    created or updated, the ids of those deleted, and the token for the
+    next sync. Without a token it returns everything.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request, *args, **kwargs):
+        return Response(sync(request.user, request.query_params.get('since')))
+
+
+class StatsView(APIView):
+    """
+    This class returns the statistics of the diary of the user over the
+    period from ?start= to ?end=, by default the last 30 days, with the ?top=
+    categories most articles were added to.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request, *args, **kwargs):
+        serializer = StatsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        return Response(cache_for_user(
+            request, 'stats', lambda: get_stats(
+                request.user, data['start'], data['end'], data['top'])))
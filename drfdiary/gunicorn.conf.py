@@ -0,0 +1,53 @@
+"""
+Gunicorn configuration for serving drfdiary in production:
+
+    gunicorn -c gunicorn.conf.py wsgi
+
+run from this directory. Every setting can be overridden from the
+environment, e.g. GUNICORN_WORKERS=4 or GUNICORN_WORKER_CLASS=gevent.
+"""
+
+import multiprocessing
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings.production')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Requests spend much of their time waiting on Postgres, so each worker
+# process runs several threads. gevent workers instead run up to
+# worker_connections requests per process as greenlets that yield while
+# waiting on the database, which suits many slow requests. They need gevent
+# and psycogreen, from requirements-gevent.txt.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+if worker_class == 'gevent':
+    # Patch before the application is preloaded: Django keeps a connection
+    # per thread in a threading.local created at import time, which must be
+    # per greenlet instead, and psycopg2 must wait on sockets through gevent
+    from gevent import monkey
+    monkey.patch_all()
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+workers = int(os.environ.get('GUNICORN_WORKERS',
+                             multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Recycle workers now and then so slow leaks cannot build up, staggered so
+# they do not all restart at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 500))
+
+# Import the application once in the master, which starts workers faster.
+# Database connections are only opened on the first request of a worker, so
+# none are shared across the fork.
+preload_app = True
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
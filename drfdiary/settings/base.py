@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
 import os
+from importlib.util import find_spec
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -52,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.instrumentation.InstrumentationMiddleware',
+    'api.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -141,10 +144,134 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.BasicAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttling.UserThrottle',
+        'api.throttling.AnonThrottle',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
+
+# Clients asking for application/msgpack get MessagePack when msgpack is
+# installed
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] += (
+        'api.renderers.MessagePackRenderer',
     )
+
+# JSON library rendering and parsing requests: 'orjson', 'ujson' or 'json'.
+# None picks orjson when it is installed and json if not
+API_JSON_BACKEND = None
+
+# Responses at least this many bytes long, and streamed ones, are compressed
+# with the first of these encodings the client accepts; None turns
+# compression off. Brotli is only offered with brotli installed. The levels
+# trade CPU for size: 1-9 for gzip and 0-11 for brotli
+API_COMPRESSION_MIN_BYTES = 1024
+API_COMPRESSION_ENCODINGS = ('br', 'gzip')
+API_GZIP_LEVEL = 6
+API_BROTLI_QUALITY = 4
+
+# Tokens whose user is kept in memory by each process, and for how many
+# seconds; 0 turns the cache off. Revoking a token reaches the other
+# processes through the default cache, which they must share
+API_TOKEN_CACHE_SIZE = 1000
+API_TOKEN_CACHE_TIMEOUT = 60
+
+# Page size of the entries, categories and articles lists, and the upper
+# bound a client may ask for with ?page_size=
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+
+# Cache used for the per-user list responses. Every process serving the API
+# must share it, so point it at memcached or redis when running more than one
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
 }
 
+# Seconds a list response stays cached; 0 turns list caching off
+API_LIST_CACHE_TIMEOUT = 300
+
+# Text search configuration of the ?q= searches on Postgres, and the search
+# backend to use instead of the one picked from the database engine
+API_SEARCH_CONFIG = 'english'
+API_SEARCH_BACKEND = None
+
+# Rows read from the database at a time while streaming an export
+API_EXPORT_CHUNK_SIZE = 2000
+
+# Rows validated and written together while importing
+API_IMPORT_BATCH_SIZE = 1000
+
+# Most rows of each kind a sync returns at once
+API_SYNC_PAGE_SIZE = 500
+
+# Days tombstones of deleted rows are kept for syncing clients; a client
+# with an older token must sync from scratch
+API_SYNC_TOMBSTONE_DAYS = 30
+
+# Send the database, serialization, rendering and total time of each request
+# in a Server-Timing header
+API_SERVER_TIMING = True
+
+# Log requests taking at least this many milliseconds along with their SQL,
+# to the api.slow_requests logger; None turns the log off
+API_SLOW_REQUEST_MS = None
+
+# Requests allowed per second, minute, hour or day in each throttle scope:
+# reads and writes of each user, anonymous reads and writes from each IP
+# address, and logins from each IP address. A scope set to None is not
+# throttled
+API_THROTTLE_RATES = {
+    'user_read': '600/min',
+    'user_write': '120/min',
+    'anon_read': '60/min',
+    'anon_write': '30/min',
+    'login': '10/min',
+}
+
+# Cache holding the throttle counters. Every process serving the API must
+# share it, and increment its counters atomically, for the rates to hold
+# exactly; API_THROTTLE_ATOMIC_CACHE refuses any other cache
+API_THROTTLE_CACHE = 'default'
+API_THROTTLE_ATOMIC_CACHE = False
+
+# Backend running background tasks: 'api.tasks.ThreadPoolBackend' runs them
+# in threads of each process after the request's transaction commits,
+# 'api.tasks.DatabaseBackend' stores them in the database, surviving crashes,
+# for `./manage.py run_tasks` workers, and 'api.tasks.ImmediateBackend' runs
+# them right away in the caller
+API_TASK_BACKEND = 'api.tasks.ThreadPoolBackend'
+
+# Threads of the thread pool backend, and tasks that may wait for one before
+# callers run them themselves
+API_TASK_WORKERS = 4
+API_TASK_QUEUE_SIZE = 100
+
+# Times a task is tried before giving up, and seconds before the first retry,
+# doubling with each one. A task whose worker runs for longer than the lease
+# is taken to have crashed and is run again
+API_TASK_MAX_ATTEMPTS = 5
+API_TASK_RETRY_DELAY = 10
+API_TASK_LEASE_SECONDS = 300
+
+# Seconds run_tasks workers wait for new tasks when none are due
+API_TASK_POLL_SECONDS = 1
+
+# Most articles a single request to the bulk articles endpoint may carry
+API_MAX_BULK_ARTICLES = 500
+
 SITE_ID = 1
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 ACCOUNT_EMAIL_REQUIRED = False
@@ -1,12 +1,77 @@
 from .base import *
 
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
+
+# Debug mode keeps every query of a request in memory and serves tracebacks
+DEBUG = False
+
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost').split(',')
+
+# Connections are kept open for CONN_MAX_AGE seconds rather than opened on
+# every request, and checked before each request reuses them. Each gunicorn
+# thread holds its own connection, so keep workers * threads below the
+# server's max_connections, or point DATABASE_HOST at PgBouncer. gevent
+# workers serve every request from a new greenlet that could never reuse
+# its connection, so they close them after each request instead, and
+# workers * worker_connections bounds the connections they open.
+GEVENT = os.environ.get('GUNICORN_WORKER_CLASS') == 'gevent'
+
 DATABASES = {
     'default': {
         'ENGINE':   'django.db.backends.postgresql_psycopg2',
-        'NAME':     'drfdiary_prod',
-        'USER':     'postgres',
-        'PASSWORD': '',
-        'HOST':     'localhost',
-        'PORT':     '',
+        'NAME':     os.environ.get('DATABASE_NAME', 'drfdiary_prod'),
+        'USER':     os.environ.get('DATABASE_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+        'HOST':     os.environ.get('DATABASE_HOST', 'localhost'),
+        'PORT':     os.environ.get('DATABASE_PORT', ''),
+        'CONN_MAX_AGE': int(os.environ.get(
+            'DATABASE_CONN_MAX_AGE', 0 if GEVENT else 600)),
+        # PgBouncer in transaction pooling mode may hand each transaction to
+        # a different server connection, which named cursors cannot survive
+        'DISABLE_SERVER_SIDE_CURSORS':
+            os.environ.get('DATABASE_PGBOUNCER', '') == '1',
     }
 }
+
+API_DB_HEALTH_CHECKS = True
+
+API_SLOW_REQUEST_MS = int(os.environ.get('API_SLOW_REQUEST_MS', 1000))
+
+# The cached lists are only invalidated in the cache of the process that
+# made the change, so they need a cache every worker shares. Without one,
+# list caching and the token cache are turned off.
+if os.environ.get('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': os.environ['MEMCACHED_LOCATION'],
+        }
+    }
+else:
+    API_LIST_CACHE_TIMEOUT = 0
+    # Nor could a token revoked by one worker be forgotten by the others
+    API_TOKEN_CACHE_TIMEOUT = 0
+
+# The throttle counters must be shared by every worker too, and counted
+# atomically, which needs memcached: without MEMCACHED_LOCATION the throttles
+# refuse to run, and `./manage.py check` reports it
+API_THROTTLE_ATOMIC_CACHE = True
+
+# Basic authentication hashes the password on every request, which costs
+# more CPU than the request itself. Production clients log in once for a
+# token with /api/v2/get-token/ and send that instead.
+# Anonymous and login requests are throttled per client address, which is
+# read from X-Forwarded-For when DJANGO_NUM_PROXIES reverse proxies stand in
+# front of the server, and from the connection otherwise
+REST_FRAMEWORK = dict(
+    REST_FRAMEWORK,
+    DEFAULT_AUTHENTICATION_CLASSES=(
+        'api.authentication.CachedTokenAuthentication',
+    ),
+    NUM_PROXIES=int(os.environ.get('DJANGO_NUM_PROXIES', 0)),
+)
+
+# Background tasks survive crashes and restarts when DJANGO_TASK_BACKEND is
+# api.tasks.DatabaseBackend, as long as `./manage.py run_tasks` workers run
+API_TASK_BACKEND = os.environ.get('DJANGO_TASK_BACKEND', API_TASK_BACKEND)
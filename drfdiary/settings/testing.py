@@ -10,3 +10,10 @@ DATABASES = {
         'PORT':     '',
     }
 }
+
+# Tests send requests far faster than any client should, so only the
+# throttling tests turn the throttles on, with the rates they need
+API_THROTTLE_RATES = {}
+
+# Background tasks run in the test itself, whose transaction never commits
+API_TASK_BACKEND = 'api.tasks.ImmediateBackend'